@@ -0,0 +1,55 @@
+"""Add unique index on accession_locations (accession_id, location_id)
+
+Revision ID: 1957478aa0b8
+Revises: 1d4f8fc4dfd8
+Create Date: 2026-10-18 09:12:41.382017
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1957478aa0b8'
+down_revision = '1d4f8fc4dfd8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # Remove any duplicate accession/location pairs, which would otherwise
+    # prevent the unique index from being created.
+    duplicates = conn.execute(sa.text(
+        '''
+        SELECT COUNT(*) FROM (
+            SELECT accession_id, location_id FROM accession_locations
+            GROUP BY accession_id, location_id HAVING COUNT(*) > 1
+        ) AS duplicates
+        '''
+    )).scalar()
+
+    if duplicates:
+        op.execute(
+            '''
+            CREATE TEMPORARY TABLE accession_locations_distinct AS
+            SELECT DISTINCT accession_id, location_id FROM accession_locations
+            '''
+        )
+        op.execute("DELETE FROM accession_locations")
+        op.execute(
+            '''
+            INSERT INTO accession_locations (accession_id, location_id)
+            SELECT accession_id, location_id FROM accession_locations_distinct
+            '''
+        )
+        op.execute("DROP TABLE accession_locations_distinct")
+
+    with op.batch_alter_table('accession_locations', schema=None) as batch_op:
+        batch_op.create_index('accession_locations_accession_location', ['accession_id', 'location_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('accession_locations', schema=None) as batch_op:
+        batch_op.drop_index('accession_locations_accession_location')
@@ -0,0 +1,35 @@
+"""Add load_fingerprints table
+
+Revision ID: 351831109fd0
+Revises: 1957478aa0b8
+Create Date: 2026-10-18 10:04:27.519843
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '351831109fd0'
+down_revision = '1957478aa0b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('load_fingerprints',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('scope', sa.String(), nullable=False),
+                    sa.Column('name', sa.String(), nullable=False),
+                    sa.Column('sha256', sa.String(), nullable=False),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_load_fingerprints'))
+                    )
+    with op.batch_alter_table('load_fingerprints', schema=None) as batch_op:
+        batch_op.create_index('load_fingerprint_scope_name', ['scope', 'name'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('load_fingerprints', schema=None) as batch_op:
+        batch_op.drop_index('load_fingerprint_scope_name')
+
+    op.drop_table('load_fingerprints')
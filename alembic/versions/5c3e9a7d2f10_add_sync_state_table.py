@@ -0,0 +1,36 @@
+"""Add sync_state table
+
+Revision ID: 5c3e9a7d2f10
+Revises: db1c8b4b4595
+Create Date: 2026-10-18 13:42:10.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c3e9a7d2f10'
+down_revision = 'db1c8b4b4595'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('sync_state',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('provider', sa.String(), nullable=False),
+                    sa.Column('last_created_at', sa.DateTime(), nullable=True),
+                    sa.Column('last_updated_at', sa.DateTime(), nullable=True),
+                    sa.Column('cursor', sa.String(), nullable=True),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_sync_state'))
+                    )
+    with op.batch_alter_table('sync_state', schema=None) as batch_op:
+        batch_op.create_index('sync_state_provider', ['provider'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sync_state', schema=None) as batch_op:
+        batch_op.drop_index('sync_state_provider')
+
+    op.drop_table('sync_state')
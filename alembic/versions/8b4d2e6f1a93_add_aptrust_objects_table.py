@@ -0,0 +1,38 @@
+"""Add aptrust_objects table
+
+Revision ID: 8b4d2e6f1a93
+Revises: 5c3e9a7d2f10
+Create Date: 2026-10-18 14:21:37.604215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4d2e6f1a93'
+down_revision = '5c3e9a7d2f10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('aptrust_objects',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('object_id', sa.Integer(), nullable=False),
+                    sa.Column('batch_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(
+                        ['batch_id'], ['batches.id'], name=op.f('fk_aptrust_objects_batch_id_batches'),
+                        ondelete='CASCADE'
+                    ),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_aptrust_objects'))
+                    )
+    with op.batch_alter_table('aptrust_objects', schema=None) as batch_op:
+        batch_op.create_index('aptrust_object_object_id', ['object_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('aptrust_objects', schema=None) as batch_op:
+        batch_op.drop_index('aptrust_object_object_id')
+
+    op.drop_table('aptrust_objects')
@@ -0,0 +1,112 @@
+"""Add created_at and updated_at columns, and export_watermarks table
+
+Revision ID: a2ac0739877f
+Revises: 351831109fd0
+Create Date: 2026-10-18 11:26:03.914562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from patsy.alembic.helpers.replaceable_objects import ReplaceableObject
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2ac0739877f'
+down_revision = '351831109fd0'
+branch_labels = None
+depends_on = None
+
+# The tables given "created_at" and "updated_at" columns, and the name of
+# the index on the "updated_at" column of each table
+timestamped_tables = {
+    'accessions': 'accession_updated_at',
+    'locations': 'location_updated_at',
+    'accession_locations': 'accession_locations_updated_at'
+}
+
+patsy_records_view = ReplaceableObject(
+    "patsy_records",
+    '''
+    SELECT
+        batches.id as "batch_id",
+        batches.name as "batch_name",
+        accessions.id as "accession_id",
+        accessions.relpath,
+        accessions.filename,
+        accessions.extension,
+        accessions.bytes,
+        accessions.timestamp,
+        accessions.md5,
+        accessions.sha1,
+        accessions.sha256,
+        locations.id as "location_id",
+        storage_providers.name as "storage_provider",
+        locations.storage_location,
+        accessions.updated_at as "accession_updated_at",
+        locations.updated_at as "location_updated_at",
+        accession_locations.updated_at as "accession_location_updated_at"
+        FROM batches
+        LEFT JOIN accessions ON batches.id = accessions.batch_id
+        LEFT JOIN accession_locations ON accessions.id = accession_locations.accession_id
+        LEFT JOIN locations ON accession_locations.location_id = locations.id
+        LEFT JOIN storage_providers ON locations.storage_provider_id = storage_providers.id
+        ORDER BY batches.id
+    '''
+)
+
+
+def upgrade() -> None:
+    dialect_name = op.get_bind().dialect.name
+
+    # The current UTC time. SQLite "CURRENT_TIMESTAMP" is in UTC.
+    if dialect_name == 'postgresql':
+        utcnow = sa.text("TIMEZONE('utc', CURRENT_TIMESTAMP)")
+    else:
+        utcnow = sa.text('CURRENT_TIMESTAMP')
+
+    # SQLite cannot add a column with a non-constant default using
+    # "ALTER TABLE", so the tables are recreated, which sets the timestamps
+    # of the existing rows to the current time.
+    recreate = 'always' if dialect_name == 'sqlite' else 'auto'
+
+    # Drop the "patsy_records" view.
+    op.execute("DROP VIEW IF EXISTS patsy_records")
+
+    for table_name, index_name in timestamped_tables.items():
+        with op.batch_alter_table(table_name, schema=None, recreate=recreate) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), server_default=utcnow, nullable=False))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=utcnow, nullable=False))
+            batch_op.create_index(index_name, ['updated_at'], unique=False)
+
+    op.create_table('export_watermarks',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(), nullable=False),
+                    sa.Column('exported_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id', name=op.f('pk_export_watermarks'))
+                    )
+    with op.batch_alter_table('export_watermarks', schema=None) as batch_op:
+        batch_op.create_index('export_watermark_name', ['name'], unique=True)
+
+    # Create the updated view
+    op.create_view(patsy_records_view)
+
+
+def downgrade() -> None:
+    # Drop the "patsy_records" view.
+    op.execute("DROP VIEW IF EXISTS patsy_records")
+
+    with op.batch_alter_table('export_watermarks', schema=None) as batch_op:
+        batch_op.drop_index('export_watermark_name')
+
+    op.drop_table('export_watermarks')
+
+    for table_name, index_name in timestamped_tables.items():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_index(index_name)
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
+
+    # Restore to the prior view
+    prior_view_module = op.get_context().script.get_revision('1d4f8fc4dfd8').module
+    obj = getattr(prior_view_module, 'patsy_records_view')
+    op.create_view(obj)
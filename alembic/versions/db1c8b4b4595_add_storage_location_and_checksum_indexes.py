@@ -0,0 +1,36 @@
+"""Add indexes on locations.storage_location and accessions checksums
+
+Revision ID: db1c8b4b4595
+Revises: a2ac0739877f
+Create Date: 2026-10-18 12:08:45.206731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'db1c8b4b4595'
+down_revision = 'a2ac0739877f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.create_index('location_storage_location', ['storage_location'], unique=False)
+
+    with op.batch_alter_table('accessions', schema=None) as batch_op:
+        batch_op.create_index('accession_md5', ['md5'], unique=False)
+        batch_op.create_index('accession_sha1', ['sha1'], unique=False)
+        batch_op.create_index('accession_sha256', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('accessions', schema=None) as batch_op:
+        batch_op.drop_index('accession_sha256')
+        batch_op.drop_index('accession_sha1')
+        batch_op.drop_index('accession_md5')
+
+    with op.batch_alter_table('locations', schema=None) as batch_op:
+        batch_op.drop_index('location_storage_location')
@@ -35,8 +35,23 @@ def db_gateway(addr):
     Sets up the database using Alembic migrations and returns the
     "DbGateway" object to use to connect to the database.
     """
+    yield from migrated_db_gateway(addr)
+
+
+@pytest.fixture
+def shared_db_gateway(addr, tmpdir):
+    """
+    Same as "db_gateway", but for tests where other processes connect to the
+    database. A temporary SQLite database file is used instead of an
+    in-memory SQLite database.
+    """
+    database = str(tmpdir.join('patsy-test.sqlite')) if addr == ':memory:' else addr
+    yield from migrated_db_gateway(database)
+
+
+def migrated_db_gateway(database):
     args = Namespace()
-    args.database = addr
+    args.database = database
     gateway = DbGateway(args)
 
     try:
@@ -49,5 +64,9 @@ def db_gateway(addr):
             # will update the database
             gateway.session.execute("DROP TABLE IF EXISTS alembic_version;")
             gateway.session.commit()
+        gateway.session.close()
+
+        # Each test creates a new engine, so release its pooled connections
+        engine.dispose()
     except OperationalError:
         pytest.exit(reason=f"ERROR - Cannot connect to database.", returncode=5)
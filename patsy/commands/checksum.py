@@ -4,8 +4,12 @@ import logging
 import csv
 import sys
 
-from typing import Dict, Iterable, Mapping, Optional, Tuple
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple, Union
 from patsy.core.db_gateway import DbGateway
+from patsy.core.file_utils import open_text_argument
+from patsy.core.snapshot import Checksums, ChecksumSnapshot, InvalidSnapshotError
+from patsy.model import Accession
 
 
 def configure_cli(subparsers) -> None:  # type: ignore
@@ -18,9 +22,10 @@ def configure_cli(subparsers) -> None:  # type: ignore
     )
     parser.add_argument(
         '-f', '--file',
-        type=argparse.FileType(),
+        type=open_text_argument,
         dest='locations_file',
-        help='CSV file containing locations to look up'
+        help='CSV file containing locations to look up. Files ending in ".gz", ".bz2", ".xz" or ".zst" are '
+             'decompressed as they are read. Use "-" to read from STDIN'
     )
     parser.add_argument(
         '-o', '--output-file',
@@ -50,6 +55,13 @@ def configure_cli(subparsers) -> None:  # type: ignore
         const='sha256',
         help='retrieve SHA256 checksum'
     )
+    parser.add_argument(
+        '--snapshot',
+        action='store',
+        default=None,
+        help='Look up the checksums in the given snapshot file (see "snapshot build"), instead of the database. '
+             'No database connection is needed'
+    )
     parser.add_argument(
         'location',
         nargs='*',
@@ -59,8 +71,19 @@ def configure_cli(subparsers) -> None:  # type: ignore
 
 
 def get_checksum(gateway: DbGateway, row: Mapping[str, str], checksum_type: str) -> Optional[Tuple[str, str]]:
+    accession = gateway.get_accession_by_location(row['location'])
+    return accession_checksum(accession, row, checksum_type)
+
+
+def accession_checksum(accession: Union[Accession, Checksums, None], row: Mapping[str, str],
+                       checksum_type: str) -> Optional[Tuple[str, str]]:
+    """
+    Returns a tuple of the checksum of the given type from the given
+    accession (or snapshot Checksums), and the destination for the given row,
+    or None (logging a warning) if there is no accession, or no checksum of
+    that type.
+    """
     location = row['location']
-    accession = gateway.get_accession_by_location(location)
     # default to using the location in the output if there is no separate destination value
     destination = row.get('destination', location)
     if accession is not None:
@@ -87,7 +110,28 @@ class Command(patsy.core.command.Command):
             locations: Iterable[Dict[str, str]] = csv.DictReader(args.locations_file)
         else:
             locations = [{'location': location} for location in args.location]
-        for row in locations:
-            checksum_and_path = get_checksum(gateway=gateway, row=row, checksum_type=args.output_type)
-            if checksum_and_path:
-                print('  '.join(checksum_and_path), file=args.output_file)
+
+        snapshot = None
+        lookup: Callable[[Sequence[str]], Mapping[str, Any]] = gateway.get_accessions_by_locations
+        if getattr(args, 'snapshot', None) is not None:
+            try:
+                snapshot = ChecksumSnapshot(args.snapshot)
+            except InvalidSnapshotError as err:
+                logging.error(str(err))
+                return
+            lookup = snapshot.get_checksums
+
+        try:
+            # Look up the accessions for a chunk of locations at a time, using
+            # one query per chunk, and write the checksums in the same order as
+            # the locations
+            iterator = iter(locations)
+            while rows := list(islice(iterator, DbGateway.IN_CLAUSE_SIZE)):
+                accessions = lookup([row['location'] for row in rows])
+                for row in rows:
+                    checksum_and_path = accession_checksum(accessions.get(row['location']), row, args.output_type)
+                    if checksum_and_path:
+                        print('  '.join(checksum_and_path), file=args.output_file)
+        finally:
+            if snapshot is not None:
+                snapshot.close()
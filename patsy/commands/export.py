@@ -2,8 +2,11 @@ import patsy.core.command
 import argparse
 import logging
 
+from datetime import datetime, timezone
+from patsy.core.command import positive_int
 from patsy.core.db_gateway import DbGateway
 from patsy.core.export import Export
+from typing import Union
 
 
 def configure_cli(subparsers) -> None:  # type: ignore
@@ -23,25 +26,109 @@ def configure_cli(subparsers) -> None:  # type: ignore
         help='Optional batch name to query. Defaults to exporting all batches'
     )
 
-    parser.add_argument(
+    output_parser = parser.add_mutually_exclusive_group()
+    output_parser.add_argument(
         '-o', '--output',
         action='store',
         default=None,
         help='The (optional) file to write output to. Defaults to standard out'
     )
 
+    output_parser.add_argument(
+        '--output-dir',
+        action='store',
+        default=None,
+        help='Export all batches to "shard" CSV files in the given directory, with a "manifest.csv" file '
+             'listing the shards and their row counts. Cannot be used with "--batch".'
+    )
+
+    parser.add_argument(
+        '--format',
+        action='store',
+        choices=Export.FORMATS,
+        default=Export.CSV_FORMAT,
+        dest='output_format',
+        help='The output format. "parquet" writes a Parquet file with typed columns (requires the "pyarrow" '
+             'package), and requires "--output" or "--output-dir". Defaults to "csv"'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=positive_int,
+        default=1,
+        help='The number of processes (each with its own database connection) used to write the shards, '
+             'when using "--output-dir". Requires a PostgreSQL or SQLite file database. Defaults to 1'
+    )
+
+    parser.add_argument(
+        '--since',
+        action='store',
+        type=since_argument,
+        default=None,
+        help='Only export the rows created or updated at or after the given ISO 8601 timestamp (in UTC, unless '
+             'it includes a UTC offset), or "last" to export the rows changed since the last "--since last" '
+             'export (all rows, the first time). Deleted rows are not included'
+    )
+
+
+def since_argument(value: str) -> Union[datetime, str]:
+    """
+    Argparse "type" function for the "--since" argument, returning either
+    "last", or the given ISO 8601 timestamp as a UTC datetime without a time
+    zone (as stored in the database).
+    """
+    if value == Export.SINCE_LAST:
+        return value
+
+    try:
+        since = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid timestamp: '{value}'")
+
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
 
 class Command(patsy.core.command.Command):
     def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
         batch = args.batch
         output = args.output
+        output_dir = getattr(args, 'output_dir', None)
+        jobs = getattr(args, 'jobs', 1)
+        output_format = getattr(args, 'output_format', Export.CSV_FORMAT)
+        since = getattr(args, 'since', None)
 
-        inputs = {"Batch": batch, "Output": output}
+        inputs = {
+            "Batch": batch, "Output": output, "Output directory": output_dir, "Jobs": jobs,
+            "Format": output_format, "Since": since
+        }
 
         logging.info(f'Running export command with the following options. {inputs}')
 
+        if output_dir is not None and batch is not None:
+            logging.error('"--output-dir" can only be used when exporting all batches')
+            return
+
+        if jobs != 1 and output_dir is None:
+            logging.error('"--jobs" can only be used with "--output-dir"')
+            return
+
+        if output_format == Export.PARQUET_FORMAT and output is None and output_dir is None:
+            logging.error('Parquet output requires "--output" or "--output-dir"')
+            return
+
         export_impl = Export(gateway)
-        export_result = export_impl.export(batch, output)
+        try:
+            if output_dir is not None:
+                export_result = export_impl.export_shards(output_dir, jobs, output_format, since)
+            else:
+                export_result = export_impl.export(batch, output, output_format, since)
+        except ValueError as err:
+            # Raised for values that cannot be written in Parquet format
+            logging.error(f'Export failed: {err}')
+            return
 
         logging.info(f"Total (non-empty) Batches exported: {export_result.batches_exported}")
         logging.info(f"Total rows exported: {export_result.rows_exported}")
@@ -0,0 +1,119 @@
+import patsy.core.command
+import argparse
+import logging
+import os
+
+from patsy.core.command import positive_int
+from patsy.core.db_gateway import DbGateway
+from patsy.core.inventory import Inventory, InvalidInventoryError
+from patsy.core.load import Load
+
+
+def configure_cli(subparsers) -> None:  # type: ignore
+    """
+    Configures the CLI arguments for this command
+    """
+    parser = subparsers.add_parser(
+        name='inventory',
+        description='Create an inventory CSV file, in the format used by the "load" command, of the files in a '
+                    'local directory'
+    )
+    parser.set_defaults(cmd_name='inventory')
+
+    parser.add_argument(
+        "directory", action='store',
+        help="The local directory to inventory. Relpaths are relative to this directory"
+    )
+
+    parser.add_argument(
+        '-b', '--batch',
+        action='store',
+        required=True,
+        help='The name of the batch of the inventoried files'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        action='store',
+        default=None,
+        help='The (optional) inventory CSV file to write. Defaults to standard out'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=positive_int,
+        default=1,
+        help='The number of processes used to hash the files. Defaults to 1'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted inventory, appending to the "--output" file, without hashing the files '
+             'already in it again'
+    )
+
+    parser.add_argument(
+        '--load',
+        action='store_true',
+        help='Also add the inventoried files to the database, as with "load --bulk"'
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        action='store',
+        type=positive_int,
+        default=Load.DEFAULT_CHUNK_SIZE,
+        help='The number of rows added to (and committed to) the database at once when using "--load". '
+             f'Defaults to {Load.DEFAULT_CHUNK_SIZE}'
+    )
+
+
+class Command(patsy.core.command.Command):
+    def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
+        batch = args.batch
+        directory = args.directory
+        output = getattr(args, 'output', None)
+        jobs = getattr(args, 'jobs', 1)
+        resume = getattr(args, 'resume', False)
+        load = getattr(args, 'load', False)
+        chunk_size = getattr(args, 'chunk_size', Load.DEFAULT_CHUNK_SIZE)
+
+        inputs = {
+            "Batch": batch, "Directory": directory, "Output": output, "Jobs": jobs, "Resume": resume,
+            "Load": load, "Chunk size": chunk_size
+        }
+
+        logging.info(f'Running inventory command with the following options. {inputs}')
+
+        if not os.path.isdir(directory):
+            logging.error(f'"{directory}" is not a local directory')
+            return
+
+        if resume and output is None:
+            logging.error('"--resume" requires an "--output" file')
+            return
+
+        load_impl = Load(gateway, bulk=True, chunk_size=chunk_size) if load else None
+        try:
+            inventory_result = Inventory().inventory(batch, directory, output, jobs, resume, load_impl)
+        except InvalidInventoryError as err:
+            logging.error(f'Cannot resume inventory: {err}')
+            return
+
+        logging.info(f"Total files inventoried: {inventory_result.files_inventoried}")
+        if resume:
+            logging.info(f"Total files already inventoried (resumed): {inventory_result.files_resumed}")
+        logging.info(f"Total bytes read: {inventory_result.bytes_read}")
+        if load_impl is not None:
+            logging.info(f"Accessions added: {load_impl.load_result.accessions_added}")
+            for error in load_impl.load_result.errors:
+                logging.warning(f"Invalid row: {error}")
+
+        if inventory_result.errors:
+            for error in inventory_result.errors:
+                logging.warning(f"Unreadable file: {error}")
+            logging.warning("INVENTORY COMPLETE WITH ERRORS")
+        else:
+            logging.info("INVENTORY COMPLETE")
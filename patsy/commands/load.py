@@ -2,8 +2,11 @@ import patsy.core.command
 import argparse
 import logging
 
+from patsy.core.command import positive_int
 from patsy.core.db_gateway import DbGateway
 from patsy.core.load import Load
+from patsy.core.lookup_cache import LookupCache
+from typing import Any, Dict, List
 
 
 def configure_cli(subparsers) -> None:  # type: ignore
@@ -12,35 +15,144 @@ def configure_cli(subparsers) -> None:  # type: ignore
     """
     parser = subparsers.add_parser(
         name='load',
-        description='Load an inventory CSV file into the database.'
+        description='Load inventory CSV files into the database.'
     )
     parser.set_defaults(cmd_name='load')
 
     parser.add_argument(
-        "file", action='store', help="The inventory CSV file to load"
+        "files", action='store', nargs='+', metavar='file',
+        help="The inventory CSV files to load. Glob patterns such as 'inventories/*.csv' are expanded. "
+             "Files ending in '.gz', '.bz2', '.xz' or '.zst' are decompressed as they are read. "
+             "Files ending in '.parquet' are read as Parquet files (requires the 'pyarrow' package). "
+             "Use '-' to read from STDIN."
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=positive_int,
+        default=1,
+        help='The number of processes used to parse and validate the files, when loading multiple files. '
+             'Defaults to 1'
+    )
+
+    # "--bulk" and "--copy" are alternative ways of adding the rows
+    load_mode = parser.add_mutually_exclusive_group()
+
+    load_mode.add_argument(
+        '--bulk',
+        action='store_true',
+        help='Add rows to the database in chunks, using multi-row statements. Recommended for large files.'
+    )
+
+    parser.add_argument(
+        '--chunk-size',
+        action='store',
+        type=positive_int,
+        default=Load.DEFAULT_CHUNK_SIZE,
+        help=f'The number of rows in each chunk when using "--bulk". Defaults to {Load.DEFAULT_CHUNK_SIZE}'
+    )
+
+    load_mode.add_argument(
+        '--copy',
+        action='store_true',
+        help='PostgreSQL only. Stream the file into a staging table using "COPY", and merge it into the database '
+             'with a single statement per table. Recommended for very large files.'
+    )
+
+    parser.add_argument(
+        '--commit-every',
+        action='store',
+        type=int,
+        default=0,
+        metavar='ROWS',
+        help='Commit to the database after every ROWS rows, instead of once at the end of the load. '
+             'Rows that have been committed are retained if the load later fails.'
+    )
+
+    parser.add_argument(
+        '--cache-size',
+        action='store',
+        type=positive_int,
+        default=DbGateway.DEFAULT_CACHE_SIZE,
+        help='The maximum number of entries in each of the storage provider, location and accession lookup '
+             f'caches. Defaults to {DbGateway.DEFAULT_CACHE_SIZE}'
+    )
+
+    parser.add_argument(
+        '--prefetch',
+        action='store_true',
+        help='Load the existing accessions and locations of each batch into the lookup caches when the batch '
+             'is first encountered. Recommended when reloading inventories that overlap existing batches.'
+    )
+
+    parser.add_argument(
+        '--skip-unchanged',
+        action='store_true',
+        help='Skip files, and batches within files, whose contents have not changed since they were last loaded '
+             'with this option, based on a fingerprint of their rows.'
     )
 
 
 class Command(patsy.core.command.Command):
     def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
-        file = args.file
-        inputs = {"file": file}
+        unmatched_patterns: List[str] = []
+        files = Load.expand_files(args.files, unmatched_patterns)
+        jobs = getattr(args, 'jobs', 1)
+        bulk = getattr(args, 'bulk', False)
+        chunk_size = getattr(args, 'chunk_size', Load.DEFAULT_CHUNK_SIZE)
+        copy = getattr(args, 'copy', False)
+        commit_every = getattr(args, 'commit_every', 0)
+        cache_size = getattr(args, 'cache_size', DbGateway.DEFAULT_CACHE_SIZE)
+        prefetch = getattr(args, 'prefetch', False)
+        skip_unchanged = getattr(args, 'skip_unchanged', False)
+        inputs = {
+            "files": files, "jobs": jobs, "bulk": bulk, "chunk_size": chunk_size, "copy": copy,
+            "commit_every": commit_every, "cache_size": cache_size, "prefetch": prefetch,
+            "skip_unchanged": skip_unchanged
+        }
         # Display batch configuration information to the user
         logging.info(f'Running load command with the following options: {inputs}')
 
-        load_impl = Load(gateway)
-        load_result = load_impl.process_file(file)
+        for pattern in unmatched_patterns:
+            logging.error(f'No files match "{pattern}"')
+
+        gateway.configure_lookup_caches(cache_size, prefetch)
+        load_impl = Load(gateway, bulk=bulk, chunk_size=chunk_size, copy=copy, commit_every=commit_every,
+                         skip_unchanged=skip_unchanged)
+        load_result = load_impl.process_files(files, jobs)
+
+        if len(files) > 1:
+            for file, file_result in load_impl.file_results.items():
+                logging.info(
+                    f"{file}: {file_result.rows_processed} rows processed, "
+                    f"{file_result.accessions_added} accessions added, "
+                    f"{file_result.locations_added} locations added, "
+                    f"{len(file_result.errors)} invalid rows"
+                )
 
         logging.info(f"Total rows processed: {load_result.rows_processed}")
         logging.info(f"Batches added: {load_result.batches_added}")
         logging.info(f"Accessions added: {load_result.accessions_added}")
         logging.info(f"Locations added: {load_result.locations_added}")
+        if skip_unchanged:
+            logging.info(f"Unchanged files skipped: {load_result.files_skipped}")
+            logging.info(f"Unchanged batches skipped: {load_result.batches_skipped}")
+
+        lookup_caches: Dict[str, LookupCache[Any, int]] = {
+            'Storage provider': gateway.storage_provider_ids,
+            'Location': gateway.location_ids,
+            'Accession': gateway.accession_ids
+        }
+        for cache_name, cache in lookup_caches.items():
+            logging.debug(f"{cache_name} lookup cache: {cache.hits} hits, {cache.misses} misses")
 
         errors = load_result.errors
         error_amount = len(errors)
 
-        if error_amount > 0:
-            logging.warning(f"Amount of invalid rows: {error_amount}")
+        if error_amount > 0 or unmatched_patterns:
+            if error_amount > 0:
+                logging.warning(f"Amount of invalid rows: {error_amount}")
             for error in errors:
                 logging.warning(f"Invalid row: {error}")
 
@@ -0,0 +1,103 @@
+import patsy.core.command
+import argparse
+import logging
+import csv
+import sys
+
+from itertools import islice
+from typing import Iterator, Tuple
+from patsy.core.db_gateway import DbGateway
+from patsy.core.file_utils import open_text_argument
+
+# The fields of the CSV output
+LOCATE_CSV_FIELDS = ['checksum_type', 'checksum', 'batch', 'relpath', 'storage_provider', 'storage_location']
+
+
+def configure_cli(subparsers) -> None:  # type: ignore
+    """
+    Configures the CLI arguments for this command
+    """
+    parser = subparsers.add_parser(
+        name='locate',
+        description='Look up the batches, relpaths and storage locations of accessions by checksum'
+    )
+    for checksum_type in DbGateway.CHECKSUM_TYPES:
+        parser.add_argument(
+            f'--{checksum_type}',
+            action='append',
+            default=[],
+            metavar='HASH',
+            help=f'{checksum_type.upper()} checksum to look up. May be repeated'
+        )
+    parser.add_argument(
+        '-f', '--file',
+        type=open_text_argument,
+        dest='checksums_file',
+        help='CSV file with one or more of the columns "md5", "sha1" and "sha256", containing the checksums to '
+             'look up. Files ending in ".gz", ".bz2", ".xz" or ".zst" are decompressed as they are read. '
+             'Use "-" to read from STDIN'
+    )
+    parser.add_argument(
+        '-o', '--output-file',
+        type=argparse.FileType(mode='w'),
+        default=sys.stdout,
+        help='CSV file to write the locations to; defaults to STDOUT'
+    )
+    parser.set_defaults(cmd_name='locate')
+
+
+def get_checksums(args: argparse.Namespace) -> Iterator[Tuple[str, str]]:
+    """
+    Generator returning the (checksum type, checksum) tuples from the
+    command-line arguments, followed by those from the checksums file (if
+    provided), in the order given.
+    """
+    for checksum_type in DbGateway.CHECKSUM_TYPES:
+        for checksum in getattr(args, checksum_type, []):
+            yield checksum_type, checksum
+
+    if getattr(args, 'checksums_file', None) is not None:
+        for row in csv.DictReader(args.checksums_file):
+            for checksum_type in DbGateway.CHECKSUM_TYPES:
+                checksum = (row.get(checksum_type) or '').strip()
+                if checksum:
+                    yield checksum_type, checksum
+
+
+class Command(patsy.core.command.Command):
+    def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
+        writer = csv.DictWriter(args.output_file, fieldnames=LOCATE_CSV_FIELDS)
+        writer.writeheader()
+
+        # Look up a chunk of checksums at a time, using one (index-backed)
+        # query per checksum type in the chunk, and write the locations in
+        # the same order as the checksums
+        iterator = get_checksums(args)
+        checksums_processed = 0
+        while checksums := list(islice(iterator, DbGateway.IN_CLAUSE_SIZE)):
+            checksums_processed += len(checksums)
+            records_by_type = {
+                checksum_type: gateway.get_records_by_checksums(
+                    checksum_type, [checksum for (t, checksum) in checksums if t == checksum_type]
+                )
+                for checksum_type in {t for (t, _) in checksums}
+            }
+
+            for checksum_type, checksum in checksums:
+                patsy_records = records_by_type[checksum_type].get(checksum)
+                if not patsy_records:
+                    logging.warning(f'No accession record found with {checksum_type.upper()} checksum "{checksum}"')
+                    continue
+
+                for patsy_record in patsy_records:
+                    writer.writerow({
+                        'checksum_type': checksum_type,
+                        'checksum': checksum,
+                        'batch': patsy_record.batch,
+                        'relpath': patsy_record.relpath,
+                        'storage_provider': patsy_record.storage_provider or '',
+                        'storage_location': patsy_record.storage_location or ''
+                    })
+
+        if checksums_processed == 0:
+            logging.error('No checksums provided. Use "--md5", "--sha1", "--sha256" or "--file"')
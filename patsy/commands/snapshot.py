@@ -0,0 +1,39 @@
+import patsy.core.command
+import argparse
+import logging
+
+from patsy.core.db_gateway import DbGateway
+from patsy.core.snapshot import ChecksumSnapshot
+
+
+def configure_cli(subparsers) -> None:  # type: ignore
+    """
+    Configures the CLI arguments for this command
+    """
+    parser = subparsers.add_parser(
+        name='snapshot',
+        description='Manage read-only snapshot files of the accession checksums, used by "checksum --snapshot"'
+    )
+    parser.set_defaults(cmd_name='snapshot')
+
+    snapshot_subparsers = parser.add_subparsers(title='snapshot commands', dest='snapshot_command', required=True)
+
+    build_parser = snapshot_subparsers.add_parser(
+        name='build',
+        description='Build a snapshot file of the storage location to checksum mapping of all accessions'
+    )
+    build_parser.add_argument(
+        '-o', '--output',
+        action='store',
+        required=True,
+        help='The snapshot file to write. An existing file is replaced once the new snapshot is complete'
+    )
+
+
+class Command(patsy.core.command.Command):
+    def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
+        if args.snapshot_command == 'build':
+            logging.info(f'Building checksum snapshot "{args.output}"')
+            locations = ChecksumSnapshot.build(args.output, gateway.iter_location_checksums())
+            logging.info(f"Total storage locations in snapshot: {locations}")
+            logging.info("SNAPSHOT BUILD COMPLETE")
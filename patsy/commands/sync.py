@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 
 import patsy.core.command
 from patsy.core.db_gateway import DbGateway
+from patsy.core.response_cache import ResponseCache
 from patsy.core.sync import Sync, MissingHeadersError, InvalidTimeError
 
 
@@ -46,6 +47,54 @@ def configure_cli(subparsers) -> None:  # type: ignore
         help='Checks for bags created after the given timestamp.'
     )
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only check the bags updated since the last bag checked by the previous incremental sync '
+             '(all bags, for the first incremental sync). Cannot be combined with the timestamp arguments.'
+    )
+
+    parser.add_argument(
+        '-w', '--workers',
+        action='store',
+        type=int,
+        default=Sync.DEFAULT_WORKERS,
+        help='The number of bags whose files are retrieved from APTrust concurrently. '
+             f'Defaults to {Sync.DEFAULT_WORKERS}'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        action='store',
+        type=float,
+        default=Sync.DEFAULT_TIMEOUT,
+        help='The number of seconds to wait to connect to APTrust, and for each response. '
+             f'Defaults to {Sync.DEFAULT_TIMEOUT:g}'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        action='store',
+        default=None,
+        help='The (optional) directory in which the APTrust responses are cached, and reused by later syncs'
+    )
+
+    parser.add_argument(
+        '--cache-ttl',
+        action='store',
+        type=float,
+        default=ResponseCache.DEFAULT_TTL,
+        metavar='SECONDS',
+        help='The number of seconds a cached response is used without checking with APTrust whether it has '
+             f'changed. Defaults to {ResponseCache.DEFAULT_TTL:g}'
+    )
+
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Only use the responses in the "--cache-dir" directory, without connecting to APTrust'
+    )
+
 
 class Command(patsy.core.command.Command):
     def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
@@ -53,6 +102,21 @@ class Command(patsy.core.command.Command):
         x_pharos_key = args.key
         timebefore = args.timebefore
         timeafter = args.timeafter
+        workers = getattr(args, 'workers', Sync.DEFAULT_WORKERS)
+        timeout = getattr(args, 'timeout', Sync.DEFAULT_TIMEOUT)
+        incremental = getattr(args, 'incremental', False)
+        cache_dir = getattr(args, 'cache_dir', None)
+        cache_ttl = getattr(args, 'cache_ttl', ResponseCache.DEFAULT_TTL)
+        offline = getattr(args, 'offline', False)
+
+        if offline and cache_dir is None:
+            logging.error('"--offline" requires a "--cache-dir" directory')
+            return
+
+        if offline:
+            # The API is not used, so the headers are not needed
+            x_pharos_name = x_pharos_name or ''
+            x_pharos_key = x_pharos_key or ''
 
         if x_pharos_name is None or x_pharos_key is None:
             x_pharos_name = os.getenv('X_PHAROS_NAME')
@@ -66,9 +130,19 @@ class Command(patsy.core.command.Command):
             'X-Pharos-API-Key': x_pharos_key
         }
 
-        sync = Sync(gateway=gateway, headers=headers)
+        response_cache = ResponseCache(cache_dir, cache_ttl) if cache_dir is not None else None
+        sync = Sync(gateway=gateway, headers=headers, workers=workers, timeout=timeout,
+                    response_cache=response_cache, offline=offline)
+
+        if incremental:
+            if timebefore or timeafter:
+                logging.error('"--incremental" cannot be combined with "--timebefore" or "--timeafter"')
+                return
+
+            logging.info("Dates: since the previous incremental sync")
+            sync_result = sync.process(incremental=True)
 
-        if timebefore and timeafter:
+        elif timebefore and timeafter:
             tb = datetime.strptime(timebefore, '%Y-%m-%d').date()
             ta = datetime.strptime(timeafter, '%Y-%m-%d').date()
 
@@ -104,7 +178,12 @@ class Command(patsy.core.command.Command):
             logging.warning(f"FILE NOT FOUND: {f}")
 
         for b in skipped_batches:
-            logging.warning(f"APTrust object {b} could not be matched to a batch in PATSy")
+            candidates = sync_result.batch_candidates.get(b)
+            if candidates:
+                logging.warning(f"APTrust object {b} could not be matched to a batch in PATSy "
+                                f"(similar batches: {', '.join(candidates)})")
+            else:
+                logging.warning(f"APTrust object {b} could not be matched to a batch in PATSy")
 
         logging.info(
             f'APTrust objects analyzed: {batches_processed} '
@@ -70,7 +70,9 @@ def configure_cli(subparsers) -> None:  # type: ignore
     )
 
     parser.add_argument(
-        'file', action='store', help="The CSV file containing the updates"
+        'file', action='store',
+        help="The CSV file containing the updates. Files ending in '.gz', '.bz2', '.xz' or '.zst' are "
+             "decompressed as they are read. Use '-' to read from STDIN."
     )
 
 
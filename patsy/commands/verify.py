@@ -0,0 +1,90 @@
+import patsy.core.command
+import argparse
+import logging
+import os
+
+from patsy.core.command import positive_int
+from patsy.core.db_gateway import DbGateway
+from patsy.core.verify import Verify
+
+
+def configure_cli(subparsers) -> None:  # type: ignore
+    """
+    Configures the CLI arguments for this command
+    """
+    parser = subparsers.add_parser(
+        name='verify',
+        description='Verify the files of a batch in a local directory against the stored sizes and checksums'
+    )
+    parser.set_defaults(cmd_name='verify')
+
+    parser.add_argument(
+        '-b', '--batch',
+        action='store',
+        required=True,
+        help='The name of the batch to verify'
+    )
+
+    parser.add_argument(
+        '-r', '--root',
+        action='store',
+        required=True,
+        help='The local directory containing the files of the batch, at their relpaths'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        action='store',
+        default=None,
+        help='The (optional) CSV file to write the report of mismatched, missing and unreadable files to. '
+             'Defaults to standard out'
+    )
+
+    parser.add_argument(
+        '-j', '--jobs',
+        action='store',
+        type=positive_int,
+        default=1,
+        help='The number of processes used to hash the files. Defaults to 1'
+    )
+
+    parser.add_argument(
+        '--max-rate',
+        action='store',
+        type=float,
+        default=None,
+        help='The maximum total rate, in megabytes per second, at which the files are read. Defaults to no limit'
+    )
+
+
+class Command(patsy.core.command.Command):
+    def __call__(self, args: argparse.Namespace, gateway: DbGateway) -> None:
+        batch_name = args.batch
+        root = args.root
+        output = getattr(args, 'output', None)
+        jobs = getattr(args, 'jobs', 1)
+        max_rate = getattr(args, 'max_rate', None)
+
+        inputs = {"Batch": batch_name, "Root": root, "Output": output, "Jobs": jobs, "Max rate (MB/s)": max_rate}
+
+        logging.info(f'Running verify command with the following options. {inputs}')
+
+        if not os.path.isdir(root):
+            logging.error(f'"{root}" is not a local directory')
+            return
+
+        batch = gateway.get_batch_by_name(batch_name)
+        if batch is None:
+            logging.error(f'Batch "{batch_name}" not found')
+            return
+
+        verify_result = Verify(gateway).verify(batch, root, output, jobs, max_rate)
+
+        logging.info(f"Total files processed: {verify_result.files_processed}")
+        logging.info(f"Total files matched: {verify_result.files_matched}")
+        logging.info(f"Total files mismatched: {verify_result.files_mismatched}")
+        logging.info(f"Total files missing: {verify_result.files_missing}")
+        logging.info(f"Total files without checksums (skipped): {verify_result.files_skipped}")
+        logging.info(f"Total files with errors: {verify_result.files_with_errors}")
+        logging.info(f"Total bytes read: {verify_result.bytes_read}")
+        logging.info("VERIFY COMPLETE")
@@ -0,0 +1,65 @@
+import difflib
+import re
+from typing import Dict, Iterable, List
+
+
+def normalize_name(name: str) -> str:
+    """
+    Returns the given batch (or bag) name in lowercase, without punctuation,
+    whitespace, or leading zeros in numbers, so that "Archive149",
+    "archive0149" and "ARCHIVE-149" have the same normalized name.
+    """
+    alphanumeric = re.sub(r'[^0-9a-z]', '', name.lower())
+    return re.sub(r'(?<!\d)0+(?=\d)', '', alphanumeric)
+
+
+def name_number(normalized_name: str) -> str:
+    """
+    Returns the first number in the given normalized name (such as "149" for
+    "archive149"), or an empty string if it has no numbers.
+    """
+    match = re.search(r'\d+', normalized_name)
+    return match.group() if match else ''
+
+
+class BatchNameIndex():
+    """
+    Index of batch names by normalized name, used to suggest the batches that
+    an unmatched APTrust bag name may correspond to.
+
+    The normalized names are grouped by their first number, so that a name is
+    only compared (using "difflib") with the names with the same number, and
+    (for example) "archive148" is not a candidate for "archive149".
+    """
+    # The maximum number of candidates returned for a name
+    MAX_CANDIDATES = 3
+
+    # The minimum "difflib" similarity ratio of a candidate
+    CUTOFF = 0.85
+
+    def __init__(self, names: Iterable[str]) -> None:
+        # Batch names, by normalized name
+        self.names: Dict[str, List[str]] = {}
+        # Normalized names, by first number
+        self.groups: Dict[str, List[str]] = {}
+        for name in names:
+            normalized_name = normalize_name(name)
+            if normalized_name not in self.names:
+                self.names[normalized_name] = []
+                self.groups.setdefault(name_number(normalized_name), []).append(normalized_name)
+            self.names[normalized_name].append(name)
+
+    def candidates(self, name: str, limit: int = MAX_CANDIDATES) -> List[str]:
+        """
+        Returns the (at most "limit") batch names similar to the given name:
+        the names with the same normalized name, or otherwise those whose
+        normalized names are closest to the normalized name.
+        """
+        normalized_name = normalize_name(name)
+        if normalized_name in self.names:
+            return self.names[normalized_name][:limit]
+
+        close_names = difflib.get_close_matches(
+            normalized_name, self.groups.get(name_number(normalized_name), []), n=limit, cutoff=BatchNameIndex.CUTOFF
+        )
+        return [batch_name for close_name in close_names for batch_name in self.names[close_name]][:limit]
@@ -3,6 +3,20 @@ import argparse
 from patsy.core.db_gateway import DbGateway
 
 
+def positive_int(value: str) -> int:
+    """
+    Argparse "type" function for arguments that must be a positive integer,
+    such as sizes and numbers of processes.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: '{value}'")
+    return number
+
+
 class Command(metaclass=abc.ABCMeta):
     """
     Interface for commands run via the CLI
@@ -1,11 +1,19 @@
+import csv
+import io
 from argparse import Namespace
+from datetime import datetime
+from sqlalchemy import and_, bindparam, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import text
+from sqlalchemy.sql.expression import Insert
 from patsy.database import Session
+from patsy.core.lookup_cache import LookupCache
 from patsy.core.patsy_record import PatsyRecord
-from patsy.model import Batch, Accession, Location, StorageProvider
+from patsy.model import AptrustObject, Batch, Accession, ExportWatermark, LoadFingerprint, Location, \
+    StorageProvider, SyncState, accession_locations_table, utcnow
 from patsy.database import use_database_file
-from typing import cast, Dict, List, Optional
+from typing import cast, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
 
 class AddResult():
@@ -16,11 +24,230 @@ class AddResult():
         self.locations_added = 0
 
 
+class CsvRecordStream():
+    """
+    Read-only file-like object that provides the given PatsyRecords as CSV
+    text, generating the CSV lines only as they are read.
+
+    Used to stream records into a PostgreSQL "COPY FROM STDIN" statement
+    without holding the entire CSV file in memory.
+    """
+    def __init__(self, patsy_records: Iterable[PatsyRecord]) -> None:
+        self.lines = self.csv_lines(patsy_records)
+        self.buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.buffer) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.buffer += line
+
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> str:
+        return self.read(size)
+
+    @staticmethod
+    def csv_lines(patsy_records: Iterable[PatsyRecord]) -> Iterator[str]:
+        line = io.StringIO()
+        writer = csv.writer(line)
+        for line_number, r in enumerate(patsy_records):
+            writer.writerow([
+                line_number, r.batch, r.relpath, r.filename, r.extension, r.bytes, r.moddate,
+                r.md5, r.sha1, r.sha256, r.storage_provider or '', r.storage_location or ''
+            ])
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+
+
 class DbGateway():
+    # Maximum number of values bound in a single "IN" clause. Kept below the
+    # SQLite default limit of 999 bound parameters per statement.
+    IN_CLAUSE_SIZE = 500
+
+    # Maximum number of (accession id, location id) pairs written by a single
+    # multi-row "INSERT" statement (two bound parameters per pair).
+    LINK_INSERT_SIZE = IN_CLAUSE_SIZE // 2
+
+    # SQL statements used by "copy_all" to load records into PostgreSQL.
+    #
+    # Empty CSV values are loaded into the "load_staging" table as empty
+    # strings, not NULLs (see FORCE_NOT_NULL), to match the values stored by
+    # the "add" method.
+    SQL_COPY_STAGING_SETUP = [
+        "DROP TABLE IF EXISTS load_staging",
+        """
+        CREATE TEMPORARY TABLE load_staging (
+            line_number BIGINT,
+            batch TEXT,
+            relpath TEXT,
+            filename TEXT,
+            extension TEXT,
+            bytes TEXT,
+            moddate TEXT,
+            md5 TEXT,
+            sha1 TEXT,
+            sha256 TEXT,
+            storage_provider TEXT,
+            storage_location TEXT
+        )
+        """
+    ]
+
+    SQL_COPY_STAGING = """
+        COPY load_staging FROM STDIN WITH (
+            FORMAT csv,
+            FORCE_NOT_NULL (
+                batch, relpath, filename, extension, moddate, md5, sha1, sha256, storage_provider, storage_location
+            )
+        )
+    """
+
+    # "batches.name" does not have a unique index, so "ON CONFLICT" cannot be
+    # used. When there are multiple batches with the same name, the lowest
+    # id is used.
+    SQL_MERGE_BATCHES = """
+        INSERT INTO batches (name)
+        SELECT DISTINCT s.batch FROM load_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM batches b WHERE b.name = s.batch)
+    """
+
+    SQL_STAGING_BATCH_IDS = """
+        (SELECT name, MIN(id) AS id FROM batches GROUP BY name) b
+    """
+
+    # Uses the "accession_batch_relpath" unique index. The first row in the
+    # CSV file for a relpath is used to create the accession.
+    SQL_MERGE_ACCESSIONS = f"""
+        INSERT INTO accessions (batch_id, relpath, filename, extension, bytes, timestamp, md5, sha1, sha256)
+        SELECT DISTINCT ON (b.id, s.relpath)
+            b.id, s.relpath, s.filename, s.extension, CAST(s.bytes AS BIGINT), s.moddate, s.md5, s.sha1, s.sha256
+        FROM load_staging s
+        JOIN {SQL_STAGING_BATCH_IDS} ON b.name = s.batch
+        ORDER BY b.id, s.relpath, s.line_number
+        ON CONFLICT (batch_id, relpath) DO NOTHING
+    """
+
+    SQL_MERGE_STORAGE_PROVIDERS = """
+        INSERT INTO storage_providers (name)
+        SELECT DISTINCT s.storage_provider FROM load_staging s
+        WHERE s.storage_provider <> '' AND s.storage_location <> ''
+        ON CONFLICT (name) DO NOTHING
+    """
+
+    # Uses the "location_storage" unique index
+    SQL_MERGE_LOCATIONS = """
+        INSERT INTO locations (storage_provider_id, storage_location)
+        SELECT DISTINCT p.id, s.storage_location FROM load_staging s
+        JOIN storage_providers p ON p.name = s.storage_provider
+        WHERE s.storage_location <> ''
+        ON CONFLICT (storage_provider_id, storage_location) DO NOTHING
+    """
+
+    SQL_MERGE_ACCESSION_LOCATIONS = f"""
+        INSERT INTO accession_locations (accession_id, location_id)
+        SELECT DISTINCT a.id, l.id FROM load_staging s
+        JOIN {SQL_STAGING_BATCH_IDS} ON b.name = s.batch
+        JOIN accessions a ON a.batch_id = b.id AND a.relpath = s.relpath
+        JOIN storage_providers p ON p.name = s.storage_provider
+        JOIN locations l ON l.storage_provider_id = p.id AND l.storage_location = s.storage_location
+        ON CONFLICT (accession_id, location_id) DO NOTHING
+    """
+
+    # The accession checksum types (and "accessions" columns)
+    CHECKSUM_TYPES = ['md5', 'sha1', 'sha256']
+
+    # The default maximum number of entries in each lookup cache
+    DEFAULT_CACHE_SIZE = 100000
+
+    # The number of rows fetched from the database at a time when streaming
+    # query results
+    FETCH_SIZE = 1000
+
     def __init__(self, args: Namespace) -> None:
-        use_database_file(args.database)
-        self.session = Session()
+        # Retained so that worker processes can open their own connections
+        self.database = args.database
+        self._session: Any = None
+        self.configure_lookup_caches(DbGateway.DEFAULT_CACHE_SIZE)
+        self.pending_accession_locations: Set[Tuple[int, int]] = set()
+
+    @property
+    def session(self) -> Any:
+        """
+        The SQLAlchemy session, which is created (connecting to the database)
+        when it is first used, so that commands that do not use the database,
+        such as "checksum --snapshot", do not require one.
+        """
+        if self._session is None:
+            use_database_file(self.database)
+            self._session = Session()
+        return self._session
+
+    def configure_lookup_caches(self, cache_size: int, prefetch: bool = False) -> None:
+        """
+        (Re)creates the caches used to look up the ids of existing storage
+        providers, locations and accessions when adding records, each holding
+        at most "cache_size" entries. Batch ids are always cached, without
+        a limit, as there are relatively few batches.
+
+        When "prefetch" is True, the accessions and locations of each batch
+        are loaded into the caches when the batch is first encountered, so
+        that records for accessions that already exist do not need any
+        queries, and new accessions can be created without first checking
+        whether they exist.
+        """
+        self.prefetch = prefetch
         self.batch_ids: Dict[str, int] = {}
+        self.storage_provider_ids: LookupCache[str, int] = LookupCache(cache_size)
+        self.location_ids: LookupCache[Tuple[int, str], int] = LookupCache(cache_size)
+        self.accession_ids: LookupCache[Tuple[int, str], int] = LookupCache(cache_size)
+        self.prefetched_batch_ids: Set[int] = set()
+
+    def clear_lookup_caches(self) -> None:
+        """
+        Removes all entries from the lookup caches. Needed when the ids in
+        the caches may no longer be valid, such as after a rollback.
+        """
+        self.batch_ids.clear()
+        self.storage_provider_ids.clear()
+        self.location_ids.clear()
+        self.accession_ids.clear()
+        self.prefetched_batch_ids.clear()
+
+    def prefetch_batch(self, batch_id: int) -> None:
+        """
+        Loads all the storage providers, and the accessions and locations
+        of the given batch, into the lookup caches.
+        """
+        if not self.storage_provider_ids:
+            for name, storage_provider_id in self.session.execute(select([StorageProvider.name, StorageProvider.id])):
+                self.storage_provider_ids.put(name, storage_provider_id)
+
+        accessions = select([Accession.relpath, Accession.id]).where(Accession.batch_id == batch_id)
+        for relpath, accession_id in self.session.execute(accessions):
+            self.accession_ids.put((batch_id, relpath), accession_id)
+
+        locations = select([Location.storage_provider_id, Location.storage_location, Location.id]) \
+            .select_from(Location.__table__.join(accession_locations_table).join(Accession.__table__)) \
+            .where(Accession.batch_id == batch_id)
+        for storage_provider_id, storage_location, location_id in self.session.execute(locations):
+            self.location_ids.put((storage_provider_id, storage_location), location_id)
+
+        self.prefetched_batch_ids.add(batch_id)
+
+    def is_prefetched(self, batch_id: int) -> bool:
+        """
+        Returns True if all the accessions of the given batch are known to be
+        in the accession cache, i.e., an accession that is not in the cache
+        does not exist. Never True for a cache that cannot hold any entries.
+        """
+        return batch_id in self.prefetched_batch_ids and self.accession_ids.max_size > 0 \
+            and self.accession_ids.evictions == 0
 
     def add(self, patsy_record: PatsyRecord) -> AddResult:
         self.add_result = AddResult()
@@ -31,13 +258,286 @@ class DbGateway():
             batch = self.find_or_create_batch(patsy_record)
             batch_id = batch.id
             self.batch_ids[batch_name] = batch_id
+            if self.prefetch:
+                self.prefetch_batch(batch_id)
+
+        accession_id = self.find_or_create_accession_id(batch_id, patsy_record)
+        location_id = self.find_or_create_location_id(patsy_record)
+        if location_id is not None:
+            # Links are buffered and written in batches by
+            # "flush_accession_locations", instead of appending to
+            # "accession.locations", which would load the whole collection.
+            self.pending_accession_locations.add((accession_id, location_id))
+            if len(self.pending_accession_locations) >= DbGateway.LINK_INSERT_SIZE:
+                self.flush_accession_locations()
+        return self.add_result
+
+    def flush_accession_locations(self) -> None:
+        """
+        Writes the accession/location links buffered by "add" to the
+        database.
+        """
+        if self.pending_accession_locations:
+            self.add_accession_locations(self.pending_accession_locations)
+            self.pending_accession_locations = set()
+
+    def add_all(self, patsy_records: Sequence[PatsyRecord]) -> AddResult:
+        """
+        Adds the given PatsyRecords to the database, returning an AddResult
+        with the totals for all the records.
+
+        The end result is the same as calling "add" for each record, but the
+        batches, accessions, storage providers, locations and accession
+        locations for all the records are resolved using a few multi-row
+        statements, instead of several queries for each record.
+        """
+        self.add_result = AddResult()
+
+        # Core statements are not autoflushed, so write out any pending ORM
+        # changes first to ensure they are visible
+        self.session.flush()
+        self.flush_accession_locations()
+
+        batch_ids = self.find_or_create_batch_ids({r.batch for r in patsy_records})
+        accession_ids = self.find_or_create_accession_ids(batch_ids, patsy_records)
+
+        located_records = [r for r in patsy_records if r.storage_location and r.storage_provider]
+        storage_provider_ids = self.find_or_create_storage_provider_ids(
+            {cast(str, r.storage_provider) for r in located_records}
+        )
+        location_ids = self.find_or_create_location_ids(storage_provider_ids, located_records)
+
+        accession_location_ids = set()
+        for r in located_records:
+            accession_id = accession_ids[(batch_ids[r.batch], r.relpath)]
+            location_id = location_ids[(storage_provider_ids[cast(str, r.storage_provider)], r.storage_location)]
+            accession_location_ids.add((accession_id, location_id))
+        self.add_accession_locations(accession_location_ids)
+
+        return self.add_result
+
+    def copy_all(self, patsy_records: Iterable[PatsyRecord]) -> AddResult:
+        """
+        Adds the given PatsyRecords to a PostgreSQL database, returning an
+        AddResult with the totals for all the records.
+
+        The records are streamed into a temporary staging table using
+        "COPY FROM STDIN", and then merged into the batches, accessions,
+        storage_providers, locations and accession_locations tables with a
+        single "INSERT ... SELECT" statement per table. The end result is
+        the same as calling "add" for each record.
+
+        This method is only supported for PostgreSQL databases.
+        """
+        self.add_result = AddResult()
+        self.session.flush()
+        self.flush_accession_locations()
+
+        for stmt in DbGateway.SQL_COPY_STAGING_SETUP:
+            self.session.execute(text(stmt))
+
+        dbapi_connection = self.session.connection().connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(DbGateway.SQL_COPY_STAGING, CsvRecordStream(patsy_records))
+
+        self.session.execute(text("ANALYZE load_staging"))
+        self.add_result.batches_added = self.session.execute(text(DbGateway.SQL_MERGE_BATCHES)).rowcount
+        self.add_result.accessions_added = self.session.execute(text(DbGateway.SQL_MERGE_ACCESSIONS)).rowcount
+        self.add_result.storage_providers_added = \
+            self.session.execute(text(DbGateway.SQL_MERGE_STORAGE_PROVIDERS)).rowcount
+        self.add_result.locations_added = self.session.execute(text(DbGateway.SQL_MERGE_LOCATIONS)).rowcount
+        self.session.execute(text(DbGateway.SQL_MERGE_ACCESSION_LOCATIONS))
+
+        self.session.execute(text("DROP TABLE load_staging"))
+
+        # Batch ids may have been added by the merge
+        self.batch_ids.clear()
 
-        accession = self.find_or_create_accession(batch_id, patsy_record)
-        location = self.find_or_create_location(patsy_record)
-        if location:
-            accession.locations.append(location)
         return self.add_result
 
+    def find_or_create_batch_ids(self, batch_names: Set[str]) -> Dict[str, int]:
+        """
+        Returns a Dictionary of batch name to batch id for the given batch
+        names, creating any batches that do not exist.
+        """
+        missing_names = sorted(name for name in batch_names if name not in self.batch_ids)
+        if missing_names:
+            self.batch_ids.update(self.select_in([Batch.name, Batch.id], Batch.name, missing_names))
+
+            new_names = [name for name in missing_names if name not in self.batch_ids]
+            if self.prefetch:
+                for name in missing_names:
+                    if name not in new_names:
+                        self.prefetch_batch(self.batch_ids[name])
+
+            if new_names:
+                self.session.execute(Batch.__table__.insert(), [{'name': name} for name in new_names])
+                self.batch_ids.update(self.select_in([Batch.name, Batch.id], Batch.name, new_names))
+                self.add_result.batches_added += len(new_names)
+                if self.prefetch:
+                    # New batches do not have any accessions to prefetch
+                    self.prefetched_batch_ids.update(self.batch_ids[name] for name in new_names)
+
+        return {name: self.batch_ids[name] for name in batch_names}
+
+    def find_or_create_accession_ids(
+          self, batch_ids: Dict[str, int], patsy_records: Sequence[PatsyRecord]) -> Dict[Tuple[int, str], int]:
+        """
+        Returns a Dictionary of (batch id, relpath) to accession id for the
+        given records, creating any accessions that do not exist.
+
+        Existing accessions are not modified. If a relpath appears more than
+        once for a batch, only the first record is used to create the
+        accession.
+        """
+        records_by_batch: Dict[int, Dict[str, PatsyRecord]] = {}
+        for r in patsy_records:
+            records_by_batch.setdefault(batch_ids[r.batch], {}).setdefault(r.relpath, r)
+
+        accession_ids: Dict[Tuple[int, str], int] = {}
+        for batch_id, records in records_by_batch.items():
+            found, relpaths = DbGateway.split_cached(
+                self.accession_ids, list(records.keys()), lambda relpath: (batch_id, relpath)
+            )
+            if not self.is_prefetched(batch_id):
+                found.update(self.select_in(
+                    [Accession.relpath, Accession.id], Accession.relpath, relpaths, Accession.batch_id == batch_id
+                ))
+
+            new_relpaths = [relpath for relpath in relpaths if relpath not in found]
+            if new_relpaths:
+                self.session.execute(
+                    Accession.__table__.insert(),
+                    [DbGateway.patsy_record_to_accession_values(batch_id, records[relpath])
+                     for relpath in new_relpaths]
+                )
+                found.update(self.select_in(
+                    [Accession.relpath, Accession.id], Accession.relpath, new_relpaths, Accession.batch_id == batch_id
+                ))
+                self.add_result.accessions_added += len(new_relpaths)
+
+            for relpath, accession_id in found.items():
+                accession_ids[(batch_id, relpath)] = accession_id
+                self.accession_ids.put((batch_id, relpath), accession_id)
+
+        return accession_ids
+
+    def find_or_create_storage_provider_ids(self, storage_provider_names: Set[str]) -> Dict[str, int]:
+        """
+        Returns a Dictionary of storage provider name to storage provider id
+        for the given names, creating any storage providers that do not exist.
+        """
+        found, names = DbGateway.split_cached(self.storage_provider_ids, sorted(storage_provider_names))
+        found.update(self.select_in([StorageProvider.name, StorageProvider.id], StorageProvider.name, names))
+
+        new_names = [name for name in names if name not in found]
+        if new_names:
+            self.session.execute(StorageProvider.__table__.insert(), [{'name': name} for name in new_names])
+            found.update(self.select_in([StorageProvider.name, StorageProvider.id], StorageProvider.name, new_names))
+            self.add_result.storage_providers_added += len(new_names)
+
+        for name, storage_provider_id in found.items():
+            self.storage_provider_ids.put(name, storage_provider_id)
+        return found
+
+    def find_or_create_location_ids(
+          self, storage_provider_ids: Dict[str, int],
+          patsy_records: Sequence[PatsyRecord]) -> Dict[Tuple[int, Optional[str]], int]:
+        """
+        Returns a Dictionary of (storage provider id, storage location) to
+        location id for the given records, creating any locations that do not
+        exist.
+        """
+        storage_locations_by_provider: Dict[int, Set[str]] = {}
+        for r in patsy_records:
+            storage_provider_id = storage_provider_ids[cast(str, r.storage_provider)]
+            storage_locations_by_provider.setdefault(storage_provider_id, set()).add(cast(str, r.storage_location))
+
+        location_ids: Dict[Tuple[int, Optional[str]], int] = {}
+        for storage_provider_id, storage_locations in storage_locations_by_provider.items():
+            found, uncached_locations = DbGateway.split_cached(
+                self.location_ids, sorted(storage_locations), lambda location: (storage_provider_id, location)
+            )
+            criteria = Location.storage_provider_id == storage_provider_id
+            found.update(self.select_in(
+                [Location.storage_location, Location.id], Location.storage_location, uncached_locations, criteria
+            ))
+
+            new_locations = [location for location in uncached_locations if location not in found]
+            if new_locations:
+                self.session.execute(
+                    Location.__table__.insert(),
+                    [{'storage_provider_id': storage_provider_id, 'storage_location': location}
+                     for location in new_locations]
+                )
+                found.update(self.select_in(
+                    [Location.storage_location, Location.id], Location.storage_location, new_locations, criteria
+                ))
+                self.add_result.locations_added += len(new_locations)
+
+            for storage_location, location_id in found.items():
+                location_ids[(storage_provider_id, storage_location)] = location_id
+                self.location_ids.put((storage_provider_id, storage_location), location_id)
+
+        return location_ids
+
+    def add_accession_locations(self, accession_location_ids: Set[Tuple[int, int]]) -> None:
+        """
+        Links the given (accession id, location id) pairs, skipping any pairs
+        that are already linked (using the
+        "accession_locations_accession_location" unique index).
+
+        The pairs are written using one multi-row "INSERT" statement for
+        each LINK_INSERT_SIZE pairs.
+        """
+        links = [
+            {'accession_id': accession_id, 'location_id': location_id}
+            for (accession_id, location_id) in sorted(accession_location_ids)
+        ]
+        for i in range(0, len(links), DbGateway.LINK_INSERT_SIZE):
+            stmt = self.insert_ignoring_duplicates(accession_locations_table)
+            self.session.execute(stmt.values(links[i:i + DbGateway.LINK_INSERT_SIZE]))
+
+    def insert_ignoring_duplicates(self, table: Any) -> Insert:
+        """
+        Returns an "INSERT" statement for the given table that silently skips
+        rows that would violate a unique constraint.
+        """
+        if self.dialect_name() == 'postgresql':
+            return postgresql.insert(table).on_conflict_do_nothing()
+        return table.insert().prefix_with('OR IGNORE')
+
+    @staticmethod
+    def split_cached(cache: LookupCache[Any, int], values: List[Any],
+                     cache_key: Callable[[Any], Any] = lambda value: value) -> Tuple[Dict[Any, int], List[Any]]:
+        """
+        Looks up the given values in the given cache, returning a Dictionary
+        of the values found in the cache to their ids, and a list of the
+        values not found in the cache.
+        """
+        found: Dict[Any, int] = {}
+        uncached: List[Any] = []
+        for value in values:
+            cached_id = cache.get(cache_key(value))
+            if cached_id is None:
+                uncached.append(value)
+            else:
+                found[value] = cached_id
+        return found, uncached
+
+    def select_in(self, columns: List[Any], in_column: Any, values: Sequence[Any], *criteria: Any) -> List[Any]:
+        """
+        Returns the rows of the given columns where "in_column" is one of the
+        given values (and matching any additional criteria), splitting the
+        values into chunks of at most IN_CLAUSE_SIZE.
+        """
+        rows: List[Any] = []
+        for i in range(0, len(values), DbGateway.IN_CLAUSE_SIZE):
+            chunk = values[i:i + DbGateway.IN_CLAUSE_SIZE]
+            stmt = select(columns).where(and_(in_column.in_(chunk), *criteria))
+            rows.extend(tuple(row) for row in self.session.execute(stmt))
+        return rows
+
     def find_or_create_batch(self, patsy_record: PatsyRecord) -> Batch:
         batch_name = patsy_record.batch
         batch: Batch = self.session.query(Batch).filter(Batch.name == batch_name).first()
@@ -51,69 +551,141 @@ class DbGateway():
         return batch
 
     def find_or_create_accession(self, batch_id: int, patsy_record: PatsyRecord) -> Accession:
-        accession: Accession = self.session.query(Accession).filter(
-            Accession.batch_id == batch_id,
-            Accession.relpath == patsy_record.relpath
-        ).first()
-
-        if accession is None:
-            accession = Accession(
-                relpath=patsy_record.relpath,
-                filename=patsy_record.filename,
-                extension=patsy_record.extension,
-                bytes=patsy_record.bytes,
-                timestamp=patsy_record.moddate,
-                md5=patsy_record.md5,
-                sha1=patsy_record.sha1,
-                sha256=patsy_record.sha256
-            )
-            accession.batch_id = batch_id
-            self.session.add(accession)
+        accession_id = self.find_or_create_accession_id(batch_id, patsy_record)
+        return cast(Accession, self.session.query(Accession).get(accession_id))
+
+    def find_or_create_accession_id(self, batch_id: int, patsy_record: PatsyRecord) -> int:
+        """
+        Returns the id of the accession of the given batch with the relpath
+        of the given record, creating the accession if it does not exist.
+
+        Only ids are queried (and cached), without loading ORM instances, so
+        that cached accessions need no queries.
+        """
+        key = (batch_id, patsy_record.relpath)
+        accession_id = self.accession_ids.get(key)
+        if accession_id is not None:
+            return accession_id
+
+        if not self.is_prefetched(batch_id):
+            accession_id = self.session.execute(
+                select([Accession.id]).where(and_(
+                    Accession.batch_id == batch_id,
+                    Accession.relpath == patsy_record.relpath
+                )).limit(1)
+            ).scalar()
+
+        if accession_id is None:
+            accession_id = self.session.execute(
+                Accession.__table__.insert().values(
+                    DbGateway.patsy_record_to_accession_values(batch_id, patsy_record)
+                )
+            ).inserted_primary_key[0]
             self.add_result.accessions_added += 1
 
-        return accession
+        self.accession_ids.put(key, accession_id)
+        return cast(int, accession_id)
 
     def find_or_create_storage_provider(self, patsy_record: PatsyRecord) -> Optional[StorageProvider]:
+        storage_provider_id = self.find_or_create_storage_provider_id(patsy_record)
+        if storage_provider_id is None:
+            return None
+        return cast(StorageProvider, self.session.query(StorageProvider).get(storage_provider_id))
+
+    def find_or_create_storage_provider_id(self, patsy_record: PatsyRecord) -> Optional[int]:
+        """
+        Returns the id of the storage provider of the given record, creating
+        the storage provider if it does not exist, or None if the record has
+        no storage provider.
+        """
         if not patsy_record.storage_provider:
             return None
 
-        storage_provider: StorageProvider = self.session.query(StorageProvider).filter(
-            StorageProvider.name == patsy_record.storage_provider
-        ).first()
+        storage_provider_id = self.storage_provider_ids.get(patsy_record.storage_provider)
+        if storage_provider_id is not None:
+            return storage_provider_id
 
-        if storage_provider is None:
-            storage_provider = StorageProvider(
-                name=patsy_record.storage_provider
-            )
-            self.session.add(storage_provider)
+        storage_provider_id = self.session.execute(
+            select([StorageProvider.id]).where(StorageProvider.name == patsy_record.storage_provider).limit(1)
+        ).scalar()
+
+        if storage_provider_id is None:
+            storage_provider_id = self.session.execute(
+                StorageProvider.__table__.insert().values(name=patsy_record.storage_provider)
+            ).inserted_primary_key[0]
             self.add_result.storage_providers_added += 1
 
-        return storage_provider
+        self.storage_provider_ids.put(patsy_record.storage_provider, storage_provider_id)
+        return cast(int, storage_provider_id)
 
     def find_or_create_location(
           self, patsy_record: PatsyRecord) -> Optional[Location]:
+        location_id = self.find_or_create_location_id(patsy_record)
+        if location_id is None:
+            return None
+        return cast(Location, self.session.query(Location).get(location_id))
+
+    def find_or_create_location_id(self, patsy_record: PatsyRecord) -> Optional[int]:
+        """
+        Returns the id of the location of the given record, creating the
+        location (and its storage provider) if it does not exist, or None if
+        the record has no storage location or provider.
+        """
         storage_location = patsy_record.storage_location
         if not storage_location:
             return None
 
-        storage_provider = self.find_or_create_storage_provider(patsy_record)
-        if not storage_provider:
+        storage_provider_id = self.find_or_create_storage_provider_id(patsy_record)
+        if storage_provider_id is None:
             return None
 
-        location: Location = self.session.query(Location).filter(
-            Location.storage_location == patsy_record.storage_location,
-            Location.storage_provider_id == storage_provider.id
-        ).first()
+        key = (storage_provider_id, storage_location)
+        location_id = self.location_ids.get(key)
+        if location_id is not None:
+            return location_id
 
-        if location is None:
-            location = Location(
-                storage_location=patsy_record.storage_location,
-                storage_provider=storage_provider
-            )
-            self.session.add(location)
+        location_id = self.session.execute(
+            select([Location.id]).where(and_(
+                Location.storage_location == storage_location,
+                Location.storage_provider_id == storage_provider_id
+            )).limit(1)
+        ).scalar()
+
+        if location_id is None:
+            location_id = self.session.execute(
+                Location.__table__.insert().values(
+                    storage_provider_id=storage_provider_id, storage_location=storage_location
+                )
+            ).inserted_primary_key[0]
             self.add_result.locations_added += 1
 
-        return location
+        self.location_ids.put(key, location_id)
+        return cast(int, location_id)
+
+    def get_load_fingerprints(self) -> Dict[Tuple[str, str], str]:
+        """
+        Returns a Dictionary of (scope, name) to SHA-256 fingerprint for all
+        the stored load fingerprints.
+        """
+        stmt = select([LoadFingerprint.scope, LoadFingerprint.name, LoadFingerprint.sha256])
+        return {(scope, name): sha256 for scope, name, sha256 in self.session.execute(stmt)}
+
+    def set_load_fingerprints(self, fingerprints: Dict[Tuple[str, str], str]) -> None:
+        """
+        Stores the given Dictionary of (scope, name) to SHA-256 fingerprint,
+        replacing any existing fingerprints with the same scope and name.
+        """
+        for (scope, name), sha256 in fingerprints.items():
+            fingerprint = self.session.query(LoadFingerprint).filter(
+                LoadFingerprint.scope == scope,
+                LoadFingerprint.name == name
+            ).first()
+
+            if fingerprint is None:
+                self.session.add(LoadFingerprint(scope=scope, name=name, sha256=sha256))
+            else:
+                fingerprint.sha256 = sha256
+        self.session.flush()
 
     def get_accession_by_location(self, location: str) -> Optional[Accession]:
         """
@@ -122,6 +694,129 @@ class DbGateway():
         result = self.session.query(Accession).join(Location.accessions).filter(Location.storage_location == location)
         return cast(Optional[Accession], result.first())
 
+    def get_accessions_by_locations(self, locations: Sequence[str]) -> Dict[str, Accession]:
+        """
+        Returns a Dictionary of storage location to Accession for the given
+        storage locations, using one joined query for each IN_CLAUSE_SIZE
+        locations, instead of a query per location (see
+        "get_accession_by_location").
+
+        Locations without an accession are not included. If a location has
+        more than one accession, the accession with the lowest id is used.
+        """
+        accessions: Dict[str, Accession] = {}
+        unique_locations = list(dict.fromkeys(locations))
+        for i in range(0, len(unique_locations), DbGateway.IN_CLAUSE_SIZE):
+            chunk = unique_locations[i:i + DbGateway.IN_CLAUSE_SIZE]
+            query = self.session.query(Location.storage_location, Accession) \
+                .select_from(Location).join(Location.accessions) \
+                .filter(Location.storage_location.in_(chunk)) \
+                .order_by(Accession.id)
+            for storage_location, accession in query:
+                accessions.setdefault(storage_location, accession)
+        return accessions
+
+    def get_batch_storage_locations(self, batch_id: int, storage_provider_id: int) -> Set[str]:
+        """
+        Returns the storage locations, for the given storage provider, that
+        are linked to the accessions of the given batch, using one query.
+        """
+        stmt = select([Location.storage_location]).select_from(
+            Location.__table__
+            .join(accession_locations_table, accession_locations_table.c.location_id == Location.id)
+            .join(Accession.__table__, Accession.id == accession_locations_table.c.accession_id)
+        ).where(and_(Accession.batch_id == batch_id, Location.storage_provider_id == storage_provider_id))
+        return {storage_location for storage_location, in self.session.execute(stmt)}
+
+    def get_storage_locations(self, storage_provider_id: int, storage_locations: Sequence[str]) -> Set[str]:
+        """
+        Returns the given storage locations that exist for the given storage
+        provider, using one query for each IN_CLAUSE_SIZE locations.
+        """
+        rows = self.select_in(
+            [Location.storage_location], Location.storage_location, list(dict.fromkeys(storage_locations)),
+            Location.storage_provider_id == storage_provider_id
+        )
+        return {storage_location for storage_location, in rows}
+
+    def add_linked_locations(self, storage_provider_id: int, accession_ids: Dict[str, int]) -> None:
+        """
+        Creates a location for the given storage provider for each of the
+        storage locations in the given Dictionary of (new) storage location
+        to accession id, linked to the accession.
+
+        The locations are inserted with a single (multiple parameter set)
+        statement, and linked using "add_accession_locations".
+        """
+        storage_locations = sorted(accession_ids)
+        if not storage_locations:
+            return
+
+        self.session.execute(
+            Location.__table__.insert(),
+            [{'storage_provider_id': storage_provider_id, 'storage_location': storage_location}
+             for storage_location in storage_locations]
+        )
+        location_ids = dict(self.select_in(
+            [Location.storage_location, Location.id], Location.storage_location, storage_locations,
+            Location.storage_provider_id == storage_provider_id
+        ))
+        self.add_accession_locations({
+            (accession_ids[storage_location], location_ids[storage_location])
+            for storage_location in storage_locations
+        })
+
+    def get_records_by_checksums(self, checksum_type: str, checksums: Sequence[str]) -> Dict[str, List[PatsyRecord]]:
+        """
+        Returns a Dictionary of checksum to the List of PatsyRecords (one for
+        each location, ordered by batch name, relpath, storage provider and
+        storage location) of the accessions with the given checksums, of the
+        given type ("md5", "sha1" or "sha256").
+
+        Accessions without any locations are returned as a single PatsyRecord
+        without a storage provider or location. Checksums without any
+        accessions are not included.
+
+        The checksums are looked up IN_CLAUSE_SIZE at a time, using the
+        accession checksum indexes. The query starts from the "accessions"
+        table, instead of using the "patsy_records" View, as the View's outer
+        joins from "batches" prevent the indexes from being used.
+        """
+        if checksum_type not in DbGateway.CHECKSUM_TYPES:
+            raise ValueError(f"Unknown checksum type: '{checksum_type}'")
+
+        SQL_PATSY_RECORDS_BY_CHECKSUM = f"""
+            SELECT
+                batches.name AS batch_name,
+                accessions.relpath,
+                accessions.filename,
+                accessions.extension,
+                accessions.bytes,
+                accessions.timestamp,
+                accessions.md5,
+                accessions.sha1,
+                accessions.sha256,
+                storage_providers.name AS storage_provider,
+                locations.storage_location
+            FROM accessions
+            JOIN batches ON batches.id = accessions.batch_id
+            LEFT JOIN accession_locations ON accessions.id = accession_locations.accession_id
+            LEFT JOIN locations ON accession_locations.location_id = locations.id
+            LEFT JOIN storage_providers ON locations.storage_provider_id = storage_providers.id
+            WHERE accessions.{checksum_type} IN :checksums
+            ORDER BY batches.name, accessions.relpath, storage_providers.name, locations.storage_location
+        """
+        sql_stmt = text(SQL_PATSY_RECORDS_BY_CHECKSUM).bindparams(bindparam('checksums', expanding=True))
+
+        records: Dict[str, List[PatsyRecord]] = {}
+        unique_checksums = list(dict.fromkeys(checksums))
+        for i in range(0, len(unique_checksums), DbGateway.IN_CLAUSE_SIZE):
+            chunk = unique_checksums[i:i + DbGateway.IN_CLAUSE_SIZE]
+            for row in self.session.execute(sql_stmt, {'checksums': chunk}):
+                db_values = {field: value for (field, value) in row.items()}
+                records.setdefault(db_values[checksum_type], []).append(DbGateway.db_view_to_patsy_record(db_values))
+        return records
+
     def get_all_batches(self) -> List[Batch]:
         """
         Returns a list of all the batches in the database.
@@ -136,6 +831,38 @@ class DbGateway():
         """
         return cast(Optional[Batch], self.session.query(Batch).filter(Batch.name == name).first())
 
+    def get_batch_names(self) -> Dict[int, str]:
+        """
+        Returns a Dictionary of batch id to batch name for all the batches in
+        the database, using one query.
+        """
+        return {batch_id: name for batch_id, name in self.session.execute(select([Batch.id, Batch.name]))}
+
+    def get_aptrust_object_batch_ids(self) -> Dict[int, int]:
+        """
+        Returns a Dictionary of APTrust object id to the id of the batch the
+        object was matched to, using one query.
+        """
+        stmt = select([AptrustObject.object_id, AptrustObject.batch_id])
+        return {object_id: batch_id for object_id, batch_id in self.session.execute(stmt)}
+
+    def add_aptrust_objects(self, batch_ids: Dict[int, int]) -> None:
+        """
+        Records the given Dictionary of APTrust object id to batch id,
+        skipping any objects that are already recorded (using the
+        "aptrust_object_object_id" unique index).
+
+        The objects are written using one multi-row "INSERT" statement for
+        each LINK_INSERT_SIZE objects.
+        """
+        objects = [
+            {'object_id': object_id, 'batch_id': batch_id}
+            for object_id, batch_id in sorted(batch_ids.items())
+        ]
+        for i in range(0, len(objects), DbGateway.LINK_INSERT_SIZE):
+            stmt = self.insert_ignoring_duplicates(AptrustObject.__table__)
+            self.session.execute(stmt.values(objects[i:i + DbGateway.LINK_INSERT_SIZE]))
+
     def get_batch_records(self, batch_name: str) -> List[PatsyRecord]:
         """
         Returns a (possibly empty) List of PatsyRecord objects representing the
@@ -143,36 +870,252 @@ class DbGateway():
 
         If a batch does not exist with the given batch_name, an empty list is
         returned.
+
+        The whole batch is held in memory, so "iter_batch_records" should be
+        used for large batches.
+        """
+        return list(self.iter_batch_records(batch_name))
+
+    def iter_batch_records(self, batch_name: str, since: Optional[datetime] = None) -> Iterator[PatsyRecord]:
+        """
+        Generator returning a PatsyRecord object for each row of the data from
+        the given batch, as the rows are fetched from the database.
+
+        If "since" is provided, only rows whose accession, location or
+        accession/location link was created or updated at or after that (UTC)
+        time are returned.
+
+        Rows are fetched FETCH_SIZE at a time. On PostgreSQL, a server-side
+        cursor is used, so that memory use does not depend on the size of the
+        batch.
         """
+        if not batch_name:
+            return
+
+        criteria, params = DbGateway.since_criteria(since)
+        criteria.insert(0, "batch_name=:batch_name")
         SQL_PATSY_RECORD_BY_NAME = \
-            "SELECT * FROM patsy_records WHERE batch_name=:batch_name"
+            f"SELECT * FROM patsy_records WHERE {' AND '.join(criteria)}"
         sql_stmt = text(SQL_PATSY_RECORD_BY_NAME)
-        sql_stmt = sql_stmt.bindparams(batch_name=batch_name)
+        sql_stmt = sql_stmt.bindparams(*params, batch_name=batch_name)
 
-        patsy_records: List[PatsyRecord] = []
+        yield from self.stream_patsy_records(sql_stmt)
 
-        if not batch_name:
-            return patsy_records
+    def iter_all_records(self, start_batch: Optional[str] = None, end_batch: Optional[str] = None,
+                         since: Optional[datetime] = None) -> Iterator[PatsyRecord]:
+        """
+        Generator returning a PatsyRecord object for each row of the data from
+        all the batches, ordered by batch name and relpath, using a single
+        streamed query (see "iter_batch_records").
+
+        If provided, only batches whose names are greater than or equal to
+        "start_batch", and less than "end_batch", and only rows changed at or
+        after "since" (see "iter_batch_records"), are returned.
+        """
+        criteria, params = DbGateway.since_criteria(since)
+        if start_batch is not None:
+            criteria.append("batch_name >= :start_batch")
+            params.append(bindparam('start_batch', start_batch))
+        if end_batch is not None:
+            criteria.append("batch_name < :end_batch")
+            params.append(bindparam('end_batch', end_batch))
+
+        where_clause = f"WHERE {' AND '.join(criteria)} " if criteria else ""
+        SQL_ALL_PATSY_RECORDS = \
+            f"SELECT * FROM patsy_records {where_clause}ORDER BY batch_name, relpath"
+
+        yield from self.stream_patsy_records(text(SQL_ALL_PATSY_RECORDS).bindparams(*params))
+
+    def get_batch_row_counts(self, since: Optional[datetime] = None) -> List[Tuple[str, int]]:
+        """
+        Returns a list of (batch name, number of "patsy_records" rows) for all
+        the batches, ordered by batch name, optionally only counting the rows
+        changed at or after "since" (see "iter_batch_records").
+        """
+        criteria, params = DbGateway.since_criteria(since)
+        where_clause = f"WHERE {' AND '.join(criteria)} " if criteria else ""
+        SQL_BATCH_ROW_COUNTS = \
+            f"SELECT batch_name, COUNT(*) FROM patsy_records {where_clause}GROUP BY batch_name ORDER BY batch_name"
+
+        sql_stmt = text(SQL_BATCH_ROW_COUNTS).bindparams(*params)
+        return [(name, count) for name, count in self.session.execute(sql_stmt)]
+
+    @staticmethod
+    def since_criteria(since: Optional[datetime]) -> Tuple[List[str], List[Any]]:
+        """
+        Returns the "patsy_records" View WHERE criteria, and their bound
+        parameters, for the rows whose accession, location or
+        accession/location link was created or updated at or after the given
+        (UTC) time, or empty lists if "since" is None.
+
+        SQLite timestamps are stored as text, with a resolution of one
+        second, so "since" is truncated to the second, and bound in the same
+        "YYYY-MM-DD HH:MM:SS" form, to compare correctly. The comparison is
+        inclusive, so rows changed in that second are always returned.
+        """
+        if since is None:
+            return [], []
+
+        criteria = [
+            "(accession_updated_at >= :since OR location_updated_at >= :since "
+            "OR accession_location_updated_at >= :since)"
+        ]
+        return criteria, [bindparam('since', since.strftime('%Y-%m-%d %H:%M:%S'))]
+
+    def current_timestamp(self) -> datetime:
+        """
+        Returns the current (UTC) time according to the database, in the same
+        form as the "created_at" and "updated_at" columns.
+        """
+        return cast(datetime, self.session.execute(select([utcnow()])).scalar())
+
+    def oldest_transaction_timestamp(self) -> datetime:
+        """
+        Returns the (UTC) time at or after which all the rows not yet
+        committed will be timestamped, in the same form as the "created_at"
+        and "updated_at" columns.
+
+        PostgreSQL timestamps rows with the start time of their transaction,
+        so this is the start time of the oldest transaction open in the
+        database (including this one), as listed in "pg_stat_activity". The
+        transactions of other database roles are only listed for roles with
+        the "pg_read_all_stats" privilege. For other databases, this is the
+        current time.
+        """
+        if self.dialect_name() != 'postgresql':
+            return self.current_timestamp()
+
+        SQL_OLDEST_TRANSACTION = """
+            SELECT TIMEZONE('utc', LEAST(CURRENT_TIMESTAMP, MIN(xact_start)))
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND backend_type = 'client backend'
+        """
+        return cast(datetime, self.session.execute(text(SQL_OLDEST_TRANSACTION)).scalar())
+
+    def get_export_watermark(self, name: str) -> Optional[datetime]:
+        """
+        Returns the (UTC) time stored for the export watermark with the given
+        name, or None if there is no such watermark.
+        """
+        watermark = self.session.query(ExportWatermark).filter(ExportWatermark.name == name).first()
+        return None if watermark is None else cast(datetime, watermark.exported_at)
+
+    def set_export_watermark(self, name: str, exported_at: datetime) -> None:
+        """
+        Stores the given (UTC) time as the export watermark with the given
+        name, replacing any existing time.
+        """
+        watermark = self.session.query(ExportWatermark).filter(ExportWatermark.name == name).first()
+        if watermark is None:
+            self.session.add(ExportWatermark(name=name, exported_at=exported_at))
+        else:
+            watermark.exported_at = exported_at
+        self.session.flush()
 
+    def get_sync_state(self, provider: str) -> Optional[SyncState]:
+        """
+        Returns the SyncState of the given storage provider, or None if the
+        provider has not been synced incrementally.
+        """
+        return cast(Optional[SyncState], self.session.query(SyncState).filter(SyncState.provider == provider).first())
+
+    def set_sync_state(self, provider: str, last_created_at: Optional[datetime], last_updated_at: Optional[datetime],
+                       cursor: Optional[str]) -> None:
+        """
+        Stores the given (UTC) times and cursor as the SyncState of the given
+        storage provider, replacing any existing state.
+        """
+        sync_state = self.get_sync_state(provider)
+        if sync_state is None:
+            sync_state = SyncState(provider=provider)
+            self.session.add(sync_state)
+        sync_state.last_created_at = last_created_at
+        sync_state.last_updated_at = last_updated_at
+        sync_state.cursor = cursor
+        self.session.flush()
+
+    def stream_patsy_records(self, sql_stmt: Any) -> Iterator[PatsyRecord]:
+        """
+        Generator returning a PatsyRecord for each row returned by the given
+        "patsy_records" View query, fetching FETCH_SIZE rows at a time.
+        """
         engine = self.session.get_bind()
         with engine.connect() as con:
-            rs = con.execute(sql_stmt).fetchall()
+            rs = con.execution_options(stream_results=True).execute(sql_stmt)
 
-            for row in rs:
-                item = row.items()
-                db_values = {}
-                for (field, value) in item:
-                    db_values[field] = value
-                patsy_record = DbGateway.db_view_to_patsy_record(db_values)
-                patsy_records.append(patsy_record)
+            while rows := rs.fetchmany(DbGateway.FETCH_SIZE):
+                for row in rows:
+                    db_values = {field: value for (field, value) in row.items()}
+                    yield DbGateway.db_view_to_patsy_record(db_values)
 
-        return patsy_records
+    def iter_location_checksums(self) -> Iterator[Tuple[str, str, str, str]]:
+        """
+        Generator returning a (storage location, md5, sha1, sha256) tuple for
+        each location linked to an accession, ordered by storage location and
+        then accession id, fetching FETCH_SIZE rows at a time (see
+        "iter_batch_records").
+        """
+        SQL_LOCATION_CHECKSUMS = """
+            SELECT locations.storage_location, accessions.md5, accessions.sha1, accessions.sha256
+            FROM locations
+            JOIN accession_locations ON accession_locations.location_id = locations.id
+            JOIN accessions ON accessions.id = accession_locations.accession_id
+            ORDER BY locations.storage_location, accessions.id
+        """
+        engine = self.session.get_bind()
+        with engine.connect() as con:
+            rs = con.execution_options(stream_results=True).execute(text(SQL_LOCATION_CHECKSUMS))
+
+            while rows := rs.fetchmany(DbGateway.FETCH_SIZE):
+                for storage_location, md5, sha1, sha256 in rows:
+                    yield storage_location, md5, sha1, sha256
+
+    def dialect_name(self) -> str:
+        """
+        Returns the name of the SQLAlchemy dialect of the database, i.e.
+        "sqlite" or "postgresql".
+        """
+        return cast(str, self.session.get_bind().dialect.name)
+
+    def commit(self) -> None:
+        """
+        Commits the current transaction, and then removes all objects from
+        the session, so that memory use does not grow with the number of
+        records added.
+        """
+        self.flush_accession_locations()
+        self.session.commit()
+        self.session.expunge_all()
 
     def close(self) -> None:
+        if self._session is None:
+            # The database was never used
+            return
+
         try:
+            self.flush_accession_locations()
             self.session.commit()
         except IntegrityError as err:
             self.session.rollback()
+            self.pending_accession_locations = set()
+            self.clear_lookup_caches()
+
+    @staticmethod
+    def patsy_record_to_accession_values(batch_id: int, patsy_record: PatsyRecord) -> Dict[str, Any]:
+        """
+        Converts a PatsyRecord into a Dictionary of "accessions" table values
+        """
+        return {
+            'batch_id': batch_id,
+            'relpath': patsy_record.relpath,
+            'filename': patsy_record.filename,
+            'extension': patsy_record.extension,
+            'bytes': patsy_record.bytes,
+            'timestamp': patsy_record.moddate,
+            'md5': patsy_record.md5,
+            'sha1': patsy_record.sha1,
+            'sha256': patsy_record.sha256
+        }
 
     @staticmethod
     def db_view_to_patsy_record(db_values: Dict[str, str]) -> PatsyRecord:
@@ -1,9 +1,15 @@
 import csv
+import os
 import sys
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from patsy.core.db_gateway import DbGateway
+from patsy.core.parquet import PARQUET_EXTENSION, ParquetDictWriter
 from patsy.core.patsy_record import PatsyUtils
 from patsy.core.load import Load
-from typing import List, TextIO
+from typing import cast, Any, Iterator, List, Optional, Tuple, Union
 
 
 class ExportResult():
@@ -25,37 +31,219 @@ class ExportResult():
 
 
 class Export:
+    # The name of the manifest file written by "export_shards"
+    MANIFEST_FILE = 'manifest.csv'
+    MANIFEST_FIELDS = ['file', 'batches', 'rows']
+
+    # The supported output formats
+    CSV_FORMAT = 'csv'
+    PARQUET_FORMAT = 'parquet'
+    FORMATS = [CSV_FORMAT, PARQUET_FORMAT]
+
+    # The "since" value that exports the rows changed since the stored
+    # export watermark
+    SINCE_LAST = 'last'
+
+    # The name of the export watermark used by "since" SINCE_LAST
+    WATERMARK_NAME = 'export'
+
     def __init__(self, gateway: DbGateway) -> None:
         self.gateway = gateway
         self.export_result = ExportResult()
 
-    def export(self, batch: str, output: str) -> ExportResult:
-        batch_list = []
+    def export(self, batch: str, output: str, output_format: str = CSV_FORMAT,
+               since: Union[datetime, str, None] = None) -> ExportResult:
+        """
+        Exports the given batch, or all batches if batch is None, to the
+        given output file, or to standard out if output is None, in the given
+        format ("csv" or "parquet"). Parquet output must be written to a file.
 
-        if batch is None:
-            batches = self.gateway.get_all_batches()
-            batch_list = [batch.name for batch in batches]
-        else:
-            batch_list = [batch]
+        If "since" is a (UTC) datetime, only the rows changed at or after that
+        time are exported. If "since" is SINCE_LAST, only the rows changed
+        since the stored export watermark (or all rows, if there is no
+        watermark) are exported, and the watermark is then set to the time
+        the export started.
+        """
+        since_time, export_started_at = self.resolve_since(since)
+        with Export.open_writer(output, output_format) as writer:
+            if batch is None:
+                self.export_all_entries(writer, since=since_time)
+            else:
+                self.export_entries([batch], writer, since=since_time)
+        self.store_watermark(export_started_at)
+        return self.export_result
+
+    def resolve_since(self, since: Union[datetime, str, None]) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """
+        Returns a tuple of the (UTC) time to export the changed rows since
+        (None to export all rows), and, if "since" is SINCE_LAST, the
+        current time to store as the new watermark once the export is
+        complete (otherwise None).
+
+        The new watermark is the time before the rows are queried, or, on
+        PostgreSQL, the start of the oldest open transaction (see
+        "oldest_transaction_timestamp"), so that rows changed during the
+        export, or committed after it by transactions that started before
+        it, are exported by the next export, rather than being missed.
+        """
+        if since == Export.SINCE_LAST:
+            return (self.gateway.get_export_watermark(Export.WATERMARK_NAME),
+                    self.gateway.oldest_transaction_timestamp())
+        return cast(Optional[datetime], since), None
+
+    def store_watermark(self, export_started_at: Optional[datetime]) -> None:
+        if export_started_at is not None:
+            self.gateway.set_export_watermark(Export.WATERMARK_NAME, export_started_at)
 
-        if output is None:
-            out = sys.stdout
-            self.export_entries(batch_list, out)
-            return self.export_result
+    @staticmethod
+    @contextmanager
+    def open_writer(output: Optional[str], output_format: str = CSV_FORMAT) -> Iterator[Any]:
+        """
+        Opens a writer for the given output file (or standard out if output
+        is None), with "writeheader" and "writerow" methods as for
+        csv.DictWriter.
+
+        For the "parquet" format, a ParquetDictWriter is returned, which
+        writes typed columns in row groups, instead of CSV text.
+        """
+        if output_format == Export.PARQUET_FORMAT:
+            if output is None:
+                raise ValueError('Parquet output must be written to a file')
+            with ParquetDictWriter(output, Load.ALL_CSV_FIELDS) as parquet_writer:
+                yield parquet_writer
+        elif output is None:
+            yield csv.DictWriter(sys.stdout, fieldnames=Load.ALL_CSV_FIELDS, extrasaction='raise')
         else:
             with open(output, mode='w') as file_stream:
-                self.export_entries(batch_list, file_stream)
-            return self.export_result
+                yield csv.DictWriter(file_stream, fieldnames=Load.ALL_CSV_FIELDS, extrasaction='raise')
+
+    def export_shards(self, output_dir: str, jobs: int, output_format: str = CSV_FORMAT,
+                      since: Union[datetime, str, None] = None) -> ExportResult:
+        """
+        Exports all the batches to "shard" files in the given directory, in
+        the given format, written in parallel by "jobs" worker processes,
+        each using its own database connection.
+
+        The batches are split into (at most) "jobs" contiguous ranges of batch
+        names, with roughly equal numbers of rows, so that concatenating the
+        shards in order gives the same rows as a single export. A manifest
+        listing each shard file, and its batch and row counts, is written to
+        MANIFEST_FILE in the directory.
+
+        "since" limits the export to the changed rows, as for "export".
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        since_time, export_started_at = self.resolve_since(since)
+        batch_ranges = Export.shard_batch_ranges(self.gateway.get_batch_row_counts(since_time), jobs)
+        extension = PARQUET_EXTENSION if output_format == Export.PARQUET_FORMAT else '.csv'
+        shard_files = [os.path.join(output_dir, f"shard-{i:04d}{extension}") for i in range(len(batch_ranges))]
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    export_shard, self.gateway.database, start_batch, end_batch, shard_file, output_format,
+                    since_time
+                )
+                for (start_batch, end_batch), shard_file in zip(batch_ranges, shard_files)
+            ]
+            shard_results = [future.result() for future in futures]
+
+        with open(os.path.join(output_dir, Export.MANIFEST_FILE), mode='w') as manifest:
+            writer = csv.DictWriter(manifest, fieldnames=Export.MANIFEST_FIELDS)
+            writer.writeheader()
+            for shard_file, shard_result in zip(shard_files, shard_results):
+                writer.writerow({
+                    'file': os.path.basename(shard_file),
+                    'batches': shard_result.batches_exported,
+                    'rows': shard_result.rows_exported
+                })
+                self.export_result.batches_exported += shard_result.batches_exported
+                self.export_result.rows_exported += shard_result.rows_exported
+
+        self.store_watermark(export_started_at)
+        return self.export_result
 
-    def export_entries(self, batch_list: List[str], file_stream: TextIO) -> None:
-        writer = csv.DictWriter(file_stream, fieldnames=Load.ALL_CSV_FIELDS, extrasaction='raise')
+    @staticmethod
+    def shard_batch_ranges(batch_row_counts: List[Tuple[str, int]],
+                           shards: int) -> List[Tuple[Optional[str], Optional[str]]]:
+        """
+        Splits the given list of (batch name, row count), ordered by batch
+        name, into at most "shards" contiguous ranges with roughly equal total
+        row counts.
 
+        Returns a list of (start batch name, end batch name) tuples, where the
+        start is inclusive and the end is exclusive. The first range has no
+        start, and the last range no end (None), so that together the ranges
+        cover every batch name.
+        """
+        total_rows = sum(count for _, count in batch_row_counts)
+        starts: List[Optional[str]] = [None]
+        rows = 0
+        for i, (_, count) in enumerate(batch_row_counts[:-1]):
+            rows += count
+            if len(starts) < shards and rows >= total_rows * len(starts) / shards:
+                starts.append(batch_row_counts[i + 1][0])
+
+        ends = starts[1:] + [None]
+        return list(zip(starts, ends))
+
+    def export_all_entries(self, writer: Any, start_batch: Optional[str] = None,
+                           end_batch: Optional[str] = None, since: Optional[datetime] = None) -> None:
+        """
+        Exports the rows of all the batches (optionally limited to the batch
+        names in the range "start_batch" (inclusive) to "end_batch"
+        (exclusive), and to the rows changed at or after "since") to the given
+        writer (see "open_writer"), ordered by batch name and relpath, using a
+        single streamed query instead of a query per batch.
+        """
         writer.writeheader()
-        for b in batch_list:
-            batch_records = self.gateway.get_batch_records(b)
-            if len(batch_records) > 0:
+        rows_exported = 0
+        current_batch = None
+        for patsy_record in self.gateway.iter_all_records(start_batch, end_batch, since):
+            # Rows are ordered by batch name, so each change of batch name
+            # is a new batch
+            if rows_exported == 0 or patsy_record.batch != current_batch:
+                current_batch = patsy_record.batch
                 self.export_result.batches_exported += 1
-            for patsy_record in batch_records:
+
+            csv_dict = PatsyUtils.to_csv(patsy_record)
+            writer.writerow(csv_dict)
+            rows_exported += 1
+
+        self.export_result.rows_exported += rows_exported
+
+    def export_entries(self, batch_list: List[str], writer: Any, since: Optional[datetime] = None) -> None:
+        writer.writeheader()
+        for b in batch_list:
+            # Rows are written as they are fetched, so that the whole batch
+            # is never held in memory
+            rows_exported = 0
+            for patsy_record in self.gateway.iter_batch_records(b, since):
                 csv_dict = PatsyUtils.to_csv(patsy_record)
                 writer.writerow(csv_dict)
-                self.export_result.rows_exported += 1
+                rows_exported += 1
+
+            if rows_exported > 0:
+                self.export_result.batches_exported += 1
+            self.export_result.rows_exported += rows_exported
+
+
+def export_shard(database: Optional[str], start_batch: Optional[str], end_batch: Optional[str],
+                 shard_file: str, output_format: str = Export.CSV_FORMAT,
+                 since: Optional[datetime] = None) -> ExportResult:
+    """
+    Process pool worker used by "Export.export_shards".
+
+    Exports the batches in the given range of batch names (limited to the
+    rows changed at or after "since", if provided) to the given shard file,
+    using a new connection to the given database, and returns the
+    ExportResult for the shard.
+    """
+    gateway = DbGateway(Namespace(database=database))
+    try:
+        shard_export = Export(gateway)
+        with Export.open_writer(shard_file, output_format) as writer:
+            shard_export.export_all_entries(writer, start_batch, end_batch, since)
+        return shard_export.export_result
+    finally:
+        gateway.session.close()
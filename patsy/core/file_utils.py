@@ -0,0 +1,60 @@
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import sys
+from typing import Any, Callable, Dict, TextIO
+
+# The file name used to read from standard input
+STDIN = '-'
+
+
+def open_zstd(file: str, mode: str) -> Any:
+    try:
+        import zstandard
+    except ImportError as err:
+        raise OSError(f"The 'zstandard' package is required to read '{file}'. "
+                      "Install it using 'pip install patsy[zstd]'.") from err
+    return zstandard.open(file, mode=mode)
+
+
+# Functions used to open compressed files, by file extension
+DECOMPRESSORS: Dict[str, Callable[[str, str], Any]] = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.zst': open_zstd
+}
+
+
+def open_text(file: str) -> TextIO:
+    """
+    Opens the given file for reading as text.
+
+    Files ending in ".gz", ".bz2", ".xz" or ".zst" are decompressed as they
+    are read, so that the uncompressed contents are never written to disk.
+    The file name "-" reads from standard input, which is left open when the
+    returned file is closed.
+    """
+    if file == STDIN:
+        return open(sys.stdin.fileno(), closefd=False)
+
+    extension = os.path.splitext(file)[1].lower()
+    decompressor = DECOMPRESSORS.get(extension)
+    if decompressor is not None:
+        return decompressor(file, 'rt')  # type: ignore[no-any-return]
+
+    return open(file)
+
+
+def open_text_argument(file: str) -> TextIO:
+    """
+    Argparse "type" function that opens the given file using "open_text",
+    reporting files that cannot be opened in the same way as
+    "argparse.FileType".
+    """
+    try:
+        return open_text(file)
+    except OSError as err:
+        raise argparse.ArgumentTypeError(f"can't open '{file}': {err}")
@@ -0,0 +1,62 @@
+import hashlib
+import io
+import time
+from typing import Dict, Optional, Sequence
+
+# The digest algorithms (hashlib names) stored for each accession
+ALGORITHMS = ['md5', 'sha1', 'sha256']
+
+# The size of each read when hashing a file. Large reads keep the number of
+# system calls (and the per-read Python overhead) low.
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+# The number of bytes in a megabyte, as used by throughput limits
+MEGABYTE = 1024 * 1024
+
+
+class RateLimiter():
+    """
+    Limits the throughput of reads to the given number of bytes per second,
+    by sleeping (in "throttle") whenever the bytes read so far are ahead of
+    the rate since the limiter was created.
+    """
+    def __init__(self, bytes_per_second: float) -> None:
+        self.bytes_per_second = bytes_per_second
+        self.start_time = time.monotonic()
+        self.bytes_read = 0
+
+    def throttle(self, num_bytes: int) -> None:
+        """
+        Records that the given number of bytes have been read, sleeping until
+        the total is within the rate limit.
+        """
+        self.bytes_read += num_bytes
+        expected_time = self.bytes_read / self.bytes_per_second
+        elapsed_time = time.monotonic() - self.start_time
+        if expected_time > elapsed_time:
+            time.sleep(expected_time - elapsed_time)
+
+
+def hash_file(path: str, algorithms: Sequence[str] = ALGORITHMS,
+              rate_limiter: Optional[RateLimiter] = None) -> Dict[str, str]:
+    """
+    Returns a Dictionary of algorithm name to hex digest for the given file,
+    computing all the digests in a single pass over the file, so that it is
+    only read once, however many digests are needed.
+
+    The file is read READ_BUFFER_SIZE bytes at a time (without Python's own
+    buffering, which would only add a copy) into a reused buffer. If a
+    RateLimiter is provided, it is used to limit the read throughput.
+    """
+    hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with io.FileIO(path, mode='rb') as f:
+        while num_bytes := f.readinto(buffer):
+            chunk = view[:num_bytes]
+            for h in hashes:
+                h.update(chunk)
+            if rate_limiter is not None:
+                rate_limiter.throttle(num_bytes)
+
+    return {algorithm: h.hexdigest() for algorithm, h in zip(algorithms, hashes)}
@@ -0,0 +1,228 @@
+import csv
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from patsy.core.hashing import hash_file
+from patsy.core.load import Load
+from patsy.core.parallel import process_map
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set
+
+
+class InvalidInventoryError(Exception):
+    pass
+
+
+class InventoryResult():
+    """
+    Holds the information about the results of an inventory
+    """
+    def __init__(self) -> None:
+        self.files_inventoried = 0
+        self.files_resumed = 0
+        self.bytes_read = 0
+        self.errors: List[str] = []
+
+    def __repr__(self) -> str:
+        lines = [
+            f"files_inventoried='{self.files_inventoried}'",
+            f"files_resumed='{self.files_resumed}'",
+            f"bytes_read='{self.bytes_read}'",
+            f"errors='{self.errors}'"
+        ]
+
+        return f"<InventoryResult({','.join(lines)})>"
+
+
+class InventoryFile(NamedTuple):
+    """
+    The result of inventorying a file: the inventory CSV row for the file,
+    or the error that prevented it from being read.
+    """
+    relpath: str
+    row: Optional[Dict[str, str]]
+    error: Optional[str]
+
+
+class Inventory:
+    """
+    Builds an inventory CSV file of the files in a directory tree, in the
+    format accepted by the "load" command.
+    """
+    def __init__(self) -> None:
+        self.inventory_result = InventoryResult()
+
+    def inventory(self, batch: str, root: str, output: Optional[str] = None, jobs: int = 1,
+                  resume: bool = False, load: Optional[Load] = None) -> InventoryResult:
+        """
+        Inventories the files under the given root directory as the given
+        batch, writing a row for each file to the given output CSV file (or
+        standard out if output is None) as the files are hashed, in relpath
+        order.
+
+        Files are hashed by "jobs" worker processes, with the MD5, SHA1 and
+        SHA256 digests computed in a single read of each file.
+
+        When "resume" is True, the files already in the output file (from
+        an earlier, interrupted run) are not hashed again, and the new rows
+        are appended to the file.
+
+        If a Load is provided, the rows (including any rows already in the
+        output file) are also added to the database, as they are written.
+        The database is committed after each chunk of rows, so that the rows
+        loaded are retained if the inventory is interrupted.
+        """
+        root = os.path.abspath(root)
+        completed_relpaths: Set[str] = set()
+        if resume and output is not None:
+            completed_relpaths = Inventory.read_completed_relpaths(output, batch)
+            self.inventory_result.files_resumed = len(completed_relpaths)
+
+        # The output file is not inventoried, if it is in the directory tree
+        excluded_paths = {os.path.abspath(output)} if output is not None else set()
+
+        with Inventory.open_output(output, append=bool(completed_relpaths)) as writer:
+            if not completed_relpaths:
+                writer.writeheader()
+
+            def rows() -> Iterator[Dict[str, str]]:
+                if load is not None and completed_relpaths and output is not None:
+                    with open(output, mode='r', newline='') as f:
+                        yield from csv.DictReader(f)
+
+                relpaths = (
+                    relpath for relpath in self.walk(root)
+                    if relpath not in completed_relpaths and os.path.join(root, relpath) not in excluded_paths
+                )
+                for inventory_file in process_map(file_row, ((batch, root, relpath) for relpath in relpaths), jobs):
+                    if inventory_file.row is None:
+                        self.inventory_result.errors.append(f"{inventory_file.relpath}: {inventory_file.error}")
+                        continue
+                    writer.writerow(inventory_file.row)
+                    self.inventory_result.files_inventoried += 1
+                    self.inventory_result.bytes_read += int(inventory_file.row['BYTES'])
+                    yield inventory_file.row
+
+            if load is None:
+                for _ in rows():
+                    pass
+            else:
+                for records in Load.chunked(load.valid_records(rows()), load.chunk_size):
+                    load.add_records(records, load.load_result)
+                    load.gateway.commit()
+
+        return self.inventory_result
+
+    def walk(self, root: str, relpath: str = '') -> Iterator[str]:
+        """
+        Generator returning the relpath of each regular file under the given
+        root directory, in sorted order, using "/" as the separator.
+        Symbolic links are not followed, and directories that cannot be read
+        are recorded as errors.
+        """
+        try:
+            with os.scandir(os.path.join(root, relpath)) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as err:
+            self.inventory_result.errors.append(f"{relpath or '.'}: {err}")
+            return
+
+        for entry in entries:
+            entry_relpath = f"{relpath}/{entry.name}" if relpath else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                yield from self.walk(root, entry_relpath)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry_relpath
+
+    @staticmethod
+    def read_completed_relpaths(output: str, batch: str) -> Set[str]:
+        """
+        Returns the relpaths of the rows in the given (partial) inventory
+        CSV file, after removing any incomplete last line left by an
+        interrupted run. Returns an empty set if the file does not exist or
+        is empty.
+
+        Raises InvalidInventoryError if the file is not an inventory CSV file
+        for the given batch.
+        """
+        if not os.path.exists(output):
+            return set()
+
+        Inventory.truncate_partial_line(output)
+        relpaths = set()
+        with open(output, mode='r', newline='') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames is None:
+                return set()
+            if reader.fieldnames != Load.ALL_CSV_FIELDS:
+                raise InvalidInventoryError(f"'{output}' does not have the expected inventory CSV header")
+            for row in reader:
+                if row['BATCH'] != batch:
+                    raise InvalidInventoryError(f"'{output}' contains rows for batch '{row['BATCH']}'")
+                relpaths.add(row['RELPATH'])
+        return relpaths
+
+    @staticmethod
+    def truncate_partial_line(path: str) -> None:
+        """
+        Removes any bytes after the last newline of the given file.
+        """
+        block_size = 64 * 1024
+        with open(path, mode='rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - block_size)
+                f.seek(start)
+                newline_index = f.read(position - start).rfind(b'\n')
+                if newline_index >= 0:
+                    f.truncate(start + newline_index + 1)
+                    return
+                position = start
+            f.truncate(0)
+
+    @staticmethod
+    @contextmanager
+    def open_output(output: Optional[str], append: bool = False) -> Iterator[Any]:
+        if output is None:
+            yield csv.DictWriter(sys.stdout, fieldnames=Load.ALL_CSV_FIELDS)
+        else:
+            # Line buffered, so that an interrupted run leaves at most one
+            # incomplete line
+            with open(output, mode='a' if append else 'w', newline='', buffering=1) as file_stream:
+                yield csv.DictWriter(file_stream, fieldnames=Load.ALL_CSV_FIELDS)
+
+
+def file_row(batch: str, root: str, relpath: str) -> InventoryFile:
+    """
+    Process pool worker used by "Inventory.inventory".
+
+    Returns the inventory CSV row for the file at the given relpath under
+    the root directory.
+    """
+    path = os.path.join(root, *relpath.split('/'))
+    try:
+        stat = os.stat(path)
+        digests = hash_file(path)
+    except OSError as err:
+        return InventoryFile(relpath, None, str(err))
+
+    filename = os.path.basename(path)
+    mtime = int(stat.st_mtime)
+    row = {
+        'BATCH': batch,
+        'PATH': path,
+        'DIRECTORY': os.path.dirname(path),
+        'RELPATH': relpath,
+        'FILENAME': filename,
+        'EXTENSION': os.path.splitext(filename)[1][1:].upper(),
+        'BYTES': str(stat.st_size),
+        'MTIME': str(mtime),
+        'MODDATE': datetime.fromtimestamp(mtime).strftime('%Y-%m-%dT%H:%M:%S'),
+        'MD5': digests['md5'],
+        'SHA1': digests['sha1'],
+        'SHA256': digests['sha256'],
+        'STORAGEPROVIDER': '',
+        'STORAGELOCATION': ''
+    }
+    return InventoryFile(relpath, row, None)
@@ -1,7 +1,18 @@
 import csv
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from multiprocessing import Manager
+from multiprocessing.managers import SyncManager
+from queue import Empty, Queue
 from patsy.core.db_gateway import DbGateway, AddResult
-from patsy.core.patsy_record import PatsyUtils
-from typing import Dict, List, Optional, Sequence
+from patsy.core.file_utils import STDIN, open_text
+from patsy.core.parquet import ParquetDictReader, is_parquet_file
+from patsy.core.patsy_record import PatsyRecord, PatsyUtils
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 
 class LoadResult():
@@ -11,7 +22,36 @@ class LoadResult():
         self.accessions_added = 0
         self.storage_providers_added = 0
         self.locations_added = 0
+        self.files_skipped = 0
+        self.batches_skipped = 0
         self.errors: List[str] = []
+        # The new or changed (scope, name) fingerprints to record once the
+        # file has been loaded
+        self.fingerprints: Dict[Tuple[str, str], str] = {}
+
+    def add(self, add_result: AddResult) -> None:
+        """
+        Adds the totals from the given AddResult to this LoadResult
+        """
+        self.batches_added += add_result.batches_added
+        self.accessions_added += add_result.accessions_added
+        self.storage_providers_added += add_result.storage_providers_added
+        self.locations_added += add_result.locations_added
+
+    def merge(self, other: 'LoadResult', error_prefix: str = '') -> None:
+        """
+        Merges the totals and errors from the given LoadResult into this
+        LoadResult, adding the (optional) error_prefix to each error.
+        """
+        self.rows_processed += other.rows_processed
+        self.batches_added += other.batches_added
+        self.accessions_added += other.accessions_added
+        self.storage_providers_added += other.storage_providers_added
+        self.locations_added += other.locations_added
+        self.files_skipped += other.files_skipped
+        self.batches_skipped += other.batches_skipped
+        self.fingerprints.update(other.fingerprints)
+        self.errors.extend(f"{error_prefix}{error}" for error in other.errors)
 
     def __repr__(self) -> str:
         lines = [
@@ -20,6 +60,8 @@ class LoadResult():
             f"accessions_added='{self.accessions_added}'",
             f"storage_providers_added='{self.storage_providers_added}'",
             f"locations_added='{self.locations_added}'",
+            f"files_skipped='{self.files_skipped}'",
+            f"batches_skipped='{self.batches_skipped}'",
             f"errors='{self.errors}'"
         ]
 
@@ -58,33 +100,334 @@ class Load:
         'ETAG', 'ID', 'KEYPATH', 'RESULT'
     ]
 
-    def __init__(self, gateway: DbGateway) -> None:
+    # The default number of CSV rows added to the database at once in "bulk"
+    # mode
+    DEFAULT_CHUNK_SIZE = 10000
+
+    # The scope of the fingerprints recorded when "skip_unchanged" is used
+    BATCH_FINGERPRINT = 'batch'
+
+    # The maximum number of rows in each fingerprinted segment of a batch,
+    # which are held in memory until the segment's fingerprint is checked.
+    # Fixed, so that the fingerprints do not depend on the load options.
+    FINGERPRINT_SEGMENT_ROWS = 10000
+
+    def __init__(self, gateway: DbGateway, bulk: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 copy: bool = False, commit_every: int = 0, skip_unchanged: bool = False,
+                 stored_fingerprints: Optional[Dict[Tuple[str, str], str]] = None) -> None:
         self.gateway = gateway
+        self.bulk = bulk
+        self.chunk_size = chunk_size
+        self.copy = copy
+        self.commit_every = commit_every
+        self.skip_unchanged = skip_unchanged
+        self.stored_fingerprints = stored_fingerprints
         self.load_result = LoadResult()
+        self.file_results: Dict[str, LoadResult] = {}
+
+    def process_files(self, files: List[str], jobs: int = 1) -> LoadResult:
+        """
+        Loads the given inventory CSV files, returning a LoadResult combining
+        the results of all the files. The results for each individual file are
+        available in "file_results".
+
+        When "jobs" is greater than 1, the files are parsed and validated by
+        a pool of "jobs" processes, which send the valid records over a queue
+        to this process, which is the only one writing to the database. Files
+        are always processed one at a time when reading from standard input.
+        If writing to the database fails, the parsers are stopped, and the
+        exception is raised.
+
+        When "skip_unchanged" is True, files and batches whose fingerprints
+        match those recorded by a previous load are skipped.
+        """
+        if self.skip_unchanged and self.stored_fingerprints is None:
+            self.stored_fingerprints = self.gateway.get_load_fingerprints()
+
+        if jobs > 1 and len(files) > 1 and STDIN not in files:
+            self.process_files_in_parallel(files, jobs)
+        else:
+            for file in files:
+                file_load = Load(self.gateway, bulk=self.bulk, chunk_size=self.chunk_size, copy=self.copy,
+                                 commit_every=self.commit_every, skip_unchanged=self.skip_unchanged,
+                                 stored_fingerprints=self.stored_fingerprints)
+                self.file_results[file] = file_load.process_file(file)
+
+        for file in files:
+            error_prefix = f"{file}: " if len(files) > 1 else ''
+            self.load_result.merge(self.file_results[file], error_prefix)
+
+        return self.load_result
+
+    def process_files_in_parallel(self, files: List[str], jobs: int) -> None:
+        if self.copy and self.gateway.dialect_name() != 'postgresql':
+            self.load_result.errors.append('Loading using "COPY" is only supported for PostgreSQL databases.')
+            return
+
+        for file in files:
+            self.file_results[file] = LoadResult()
+
+        records_since_commit = 0
+        manager: SyncManager = Manager()
+        with manager:
+            # Limit the queue size, so that memory use is bounded when the
+            # parsers are faster than the database
+            queue = manager.Queue(maxsize=jobs * 2)
+            # Set when the records are no longer wanted, to stop the parsers
+            cancel = manager.Event()
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [
+                    executor.submit(parse_file, file, queue, self.chunk_size, self.stored_fingerprints, cancel)
+                    for file in files
+                ]
+
+                try:
+                    files_remaining = len(files)
+                    while files_remaining > 0:
+                        file, patsy_records, parse_result = queue.get()
+                        file_result = self.file_results[file]
+                        if patsy_records is not None:
+                            self.add_records(patsy_records, file_result)
+                            records_since_commit += len(patsy_records)
+                            if self.commit_every > 0 and records_since_commit >= self.commit_every:
+                                self.gateway.commit()
+                                records_since_commit = 0
+                        if parse_result is not None:
+                            file_result.merge(parse_result)
+                            self.record_fingerprints(file_result)
+                            files_remaining -= 1
+                except BaseException:
+                    # The parsers may be blocked on the (full) queue, so
+                    # the executor cannot be shut down until the queue is
+                    # drained
+                    cancel.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    Load.drain_queue(queue, futures)
+                    raise
+
+                # Raise any exception from the parsers
+                for future in futures:
+                    future.result()
+
+    @staticmethod
+    def drain_queue(queue: 'Queue[Any]', futures: List[Any]) -> None:
+        """
+        Discards the items put on the given queue until the given (parser)
+        futures are all done or cancelled.
+        """
+        while not all(future.done() for future in futures):
+            try:
+                queue.get(timeout=0.1)
+            except Empty:
+                pass
 
     def process_file(self, file: str) -> LoadResult:
-        csv_line_index = 2  # Starting at two to account for CSV header
-        with open(file) as f:
-            reader = csv.DictReader(f, delimiter=',')
-
-            if not self.is_header_valid(reader.fieldnames):
-                return self.load_result
-
-            reader.fieldnames
-            add_result = None
-            for row in reader:
-                add_result = self.process_csv_row(csv_line_index, row)
-                self.load_result.rows_processed += 1
-                csv_line_index += 1
-
-                if add_result:
-                    self.load_result.batches_added += add_result.batches_added
-                    self.load_result.accessions_added += add_result.accessions_added
-                    self.load_result.storage_providers_added += add_result.storage_providers_added
-                    self.load_result.locations_added += add_result.locations_added
+        if self.copy and self.gateway.dialect_name() != 'postgresql':
+            self.load_result.errors.append('Loading using "COPY" is only supported for PostgreSQL databases.')
+            return self.load_result
+
+        try:
+            with Load.open_inventory(file) as reader:
+                if not self.is_header_valid(reader.fieldnames):
+                    return self.load_result
 
+                patsy_records = self.records_to_load(file, reader)
+                if self.commit_every > 0:
+                    # Commit every "commit_every" records, so that memory use
+                    # stays bounded, and committed records are retained if a
+                    # later record fails.
+                    for records in Load.chunked(patsy_records, self.commit_every):
+                        self.add_records(records, self.load_result)
+                        self.gateway.commit()
+                else:
+                    self.add_records(patsy_records, self.load_result)
+        except OSError as err:
+            self.load_result.errors.append(f"Cannot read file: {err}")
+            return self.load_result
+
+        self.record_fingerprints(self.load_result)
         return self.load_result
 
+    def records_to_load(self, file: str, rows: Iterable[Dict[str, str]]) -> Iterator[PatsyRecord]:
+        """
+        Returns the valid records from the given CSV rows of the given file.
+
+        When "skip_unchanged" is True, only the records of the changed
+        segments of each batch are returned (see "changed_records"). Standard
+        input is always loaded in full, without being fingerprinted, as it
+        has no name to record the fingerprints under.
+        """
+        if not self.skip_unchanged or file == STDIN:
+            return self.valid_records(rows)
+
+        if self.stored_fingerprints is None:
+            self.stored_fingerprints = self.gateway.get_load_fingerprints()
+
+        return self.changed_records(file, rows)
+
+    def changed_records(self, file: str, rows: Iterable[Dict[str, str]]) -> Iterator[PatsyRecord]:
+        """
+        Generator returning the valid records of the segments of the given
+        CSV rows whose fingerprints have changed since the given file was
+        last loaded, fingerprinting the rows as they are parsed, so that the
+        file is only read once.
+
+        Each batch in the file is split into segments of consecutive rows
+        (of at most FINGERPRINT_SEGMENT_ROWS rows), fingerprinted by file,
+        batch and segment number, so that a batch split over several files
+        has separate fingerprints in each file. The new or changed
+        fingerprints are added to the LoadResult, and the file is counted
+        as skipped if no segment has changed.
+        """
+        stored_fingerprints = self.stored_fingerprints or {}
+        file_name = os.path.abspath(file)
+        segment_counts: Dict[str, int] = {}
+        changed_batches: Set[str] = set()
+        for batch_name, first_line, segment_rows in Load.batch_segments(rows):
+            segment_number = segment_counts.get(batch_name, 0)
+            segment_counts[batch_name] = segment_number + 1
+
+            key = (Load.BATCH_FINGERPRINT, f'{file_name}\x1f{batch_name}\x1f{segment_number}')
+            sha256 = Load.fingerprint_rows(segment_rows)
+            if stored_fingerprints.get(key) == sha256:
+                continue
+
+            changed_batches.add(batch_name)
+            self.load_result.fingerprints[key] = sha256
+            yield from self.valid_records(segment_rows, first_line)
+
+        if segment_counts and not changed_batches:
+            self.load_result.files_skipped += 1
+        self.load_result.batches_skipped += len(segment_counts.keys() - changed_batches)
+
+    @staticmethod
+    def batch_segments(rows: Iterable[Dict[str, str]]) -> Iterator[Tuple[str, int, List[Dict[str, str]]]]:
+        """
+        Generator returning a (batch name, line number, rows) tuple for each
+        run of consecutive CSV rows of the same batch, split into segments
+        of at most FINGERPRINT_SEGMENT_ROWS rows. The line number is that of
+        the first row of the segment.
+        """
+        segment: List[Dict[str, str]] = []
+        segment_batch = ''
+        first_line = 2  # Starting at two to account for CSV header
+        for csv_line_index, row in enumerate(rows, start=2):
+            batch_name = (row.get('BATCH') or '').strip()
+            if segment and (batch_name != segment_batch or len(segment) >= Load.FINGERPRINT_SEGMENT_ROWS):
+                yield segment_batch, first_line, segment
+                segment = []
+            if not segment:
+                segment_batch = batch_name
+                first_line = csv_line_index
+            segment.append(row)
+
+        if segment:
+            yield segment_batch, first_line, segment
+
+    def record_fingerprints(self, load_result: LoadResult) -> None:
+        """
+        Stores the new or changed fingerprints of a file that has been loaded.
+
+        Files with errors are not fingerprinted, so that they are loaded (and
+        their errors reported) again by the next load.
+        """
+        if self.skip_unchanged and load_result.fingerprints and not load_result.errors:
+            self.gateway.set_load_fingerprints(load_result.fingerprints)
+
+    @staticmethod
+    def fingerprint_rows(rows: Iterable[Dict[str, str]]) -> str:
+        """
+        Returns the SHA-256 fingerprint of the given CSV rows.
+
+        Rows are normalized to the known CSV fields, in a fixed order, with
+        surrounding whitespace removed, so that the fingerprint does not
+        depend on the order of the columns.
+        """
+        rows_hash = hashlib.sha256()
+        for row in rows:
+            rows_hash.update(('\x1f'.join((row.get(field) or '').strip() for field in Load.ALL_CSV_FIELDS)
+                              + '\n').encode('utf-8'))
+        return rows_hash.hexdigest()
+
+    def add_records(self, patsy_records: Iterable[PatsyRecord], load_result: LoadResult) -> None:
+        """
+        Adds the given records to the database using the configured load mode,
+        adding the totals to the given LoadResult.
+        """
+        if self.copy:
+            load_result.add(self.gateway.copy_all(patsy_records))
+        elif self.bulk:
+            for chunk in Load.chunked(patsy_records, self.chunk_size):
+                load_result.add(self.gateway.add_all(chunk))
+        else:
+            for patsy_record in patsy_records:
+                load_result.add(self.gateway.add(patsy_record))
+            self.gateway.flush_accession_locations()
+
+    def valid_records(self, rows: Iterable[Dict[str, str]], first_line: int = 2) -> Iterator[PatsyRecord]:
+        """
+        Generator returning a PatsyRecord for each valid row of the given
+        CSV rows. Invalid rows are skipped, and recorded as errors in the
+        LoadResult. "first_line" is the line number of the first row, used
+        in the errors (by default, the line after the CSV header).
+        """
+        csv_line_index = first_line
+        for row in rows:
+            self.load_result.rows_processed += 1
+            if self.is_row_valid(csv_line_index, row):
+                yield PatsyUtils.from_inventory_csv(row)
+            csv_line_index += 1
+
+    @staticmethod
+    @contextmanager
+    def open_inventory(file: str) -> Iterator[Union['csv.DictReader[str]', ParquetDictReader]]:
+        """
+        Opens the given inventory file, returning a reader providing the
+        "fieldnames" of the file, and its rows as Dictionaries of field name
+        to value: a ParquetDictReader for ".parquet" files, otherwise a
+        csv.DictReader.
+        """
+        if is_parquet_file(file):
+            with ParquetDictReader(file) as parquet_reader:
+                yield parquet_reader
+        else:
+            with open_text(file) as f:
+                yield csv.DictReader(f, delimiter=',')
+
+    @staticmethod
+    def expand_files(file_patterns: List[str], unmatched_patterns: Optional[List[str]] = None) -> List[str]:
+        """
+        Returns the list of files matching the given file names or glob
+        patterns, in the given order. Patterns matching no files are added
+        to the (optional) "unmatched_patterns" list. File names that are not
+        patterns are returned as-is.
+        """
+        files: List[str] = []
+        for pattern in file_patterns:
+            if glob.has_magic(pattern):
+                matches = sorted(glob.glob(pattern, recursive=True))
+                if not matches and unmatched_patterns is not None:
+                    unmatched_patterns.append(pattern)
+                files.extend(matches)
+            else:
+                files.append(pattern)
+
+        # Remove duplicates, preserving order
+        return list(dict.fromkeys(files))
+
+    @staticmethod
+    def chunked(patsy_records: Iterable[PatsyRecord], chunk_size: int) -> Iterator[List[PatsyRecord]]:
+        """
+        Generator returning the given records as lists of at most chunk_size
+        records. Raises ValueError if chunk_size is less than 1.
+        """
+        if chunk_size < 1:
+            raise ValueError(f"The chunk size must be at least 1: {chunk_size}")
+
+        iterator = iter(patsy_records)
+        while chunk := list(islice(iterator, chunk_size)):
+            yield chunk
+
     def process_csv_row(self, csv_line_index: int, row: Dict[str, str]) -> Optional[AddResult]:
         if not self.is_row_valid(csv_line_index, row):
             return None
@@ -133,3 +476,42 @@ class Load:
             )
             return False
         return True
+
+
+def parse_file(file: str, queue: 'Queue[Tuple[str, Optional[List[PatsyRecord]], Optional[LoadResult]]]',
+               chunk_size: int, stored_fingerprints: Optional[Dict[Tuple[str, str], str]] = None,
+               cancel: Optional[Any] = None) -> None:
+    """
+    Process pool worker used by "Load.process_files_in_parallel".
+
+    Parses and validates the given inventory CSV file, putting a
+    (file, records, None) tuple on the queue for each chunk of valid
+    records, followed by a final (file, None, LoadResult) tuple with the
+    number of rows processed and any validation errors (including an error
+    if the file cannot be read).
+
+    When "stored_fingerprints" is provided, unchanged files and batches are
+    skipped, and the fingerprints to record are returned in the LoadResult.
+
+    Stops parsing when the (optional) "cancel" Event is set.
+    """
+    # Parsing and validation do not use the gateway, which cannot be shared
+    # between processes
+    parser = Load(gateway=None, skip_unchanged=stored_fingerprints is not None,  # type: ignore[arg-type]
+                  stored_fingerprints=stored_fingerprints)
+    try:
+        with Load.open_inventory(file) as reader:
+            if parser.is_header_valid(reader.fieldnames):
+                for chunk in Load.chunked(parser.records_to_load(file, reader), chunk_size):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    queue.put((file, chunk, None))
+    except OSError as err:
+        parser.load_result.errors.append(f"Cannot read file: {err}")
+    except BaseException:
+        # The file has not been fully loaded, so none of its fingerprints
+        # can be recorded
+        parser.load_result.fingerprints.clear()
+        raise
+    finally:
+        queue.put((file, None, parser.load_result))
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LookupCache(Generic[K, V]):
+    """
+    Dictionary-like cache of database lookups, holding at most "max_size"
+    entries. When full, the least recently used entry is discarded.
+
+    Keeps count of cache hits, misses and evictions.
+    """
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.entries: OrderedDict[K, V] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Returns the cached value for the given key, or None if the key is not
+        in the cache.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: K, value: V) -> None:
+        """
+        Adds the given key and value to the cache, discarding the least
+        recently used entry if the cache is full.
+        """
+        if self.max_size <= 0:
+            return
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Removes all entries from the cache. The hit and miss counts are
+        retained.
+        """
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        lines = [
+            f"size='{len(self.entries)}'",
+            f"max_size='{self.max_size}'",
+            f"hits='{self.hits}'",
+            f"misses='{self.misses}'",
+            f"evictions='{self.evictions}'"
+        ]
+
+        return f"<LookupCache({','.join(lines)})>"
@@ -0,0 +1,63 @@
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Iterable, Iterator, Sequence, TypeVar
+
+T = TypeVar('T')
+
+# The number of tasks submitted per worker ahead of their results being
+# returned by "process_map" and "thread_map"
+TASKS_AHEAD_PER_JOB = 4
+
+
+def process_map(function: Callable[..., T], args_iterable: Iterable[Sequence[Any]], jobs: int) -> Iterator[T]:
+    """
+    Generator returning the result of calling the given (module-level)
+    function with each of the given argument tuples, in the same order,
+    using "jobs" worker processes (or this process, if "jobs" is 1).
+
+    Unlike "Executor.map", which submits all the tasks at once, only
+    TASKS_AHEAD_PER_JOB tasks per worker are submitted ahead of their
+    results being returned, so that memory use does not depend on the
+    number of tasks, and results are returned as they become available.
+    """
+    if jobs <= 1:
+        for args in args_iterable:
+            yield function(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from bounded_map(executor, function, args_iterable, jobs * TASKS_AHEAD_PER_JOB)
+
+
+def thread_map(function: Callable[..., T], args_iterable: Iterable[Sequence[Any]], workers: int) -> Iterator[T]:
+    """
+    As "process_map", but using "workers" threads, for tasks (such as HTTP
+    requests) that spend most of their time waiting on I/O.
+
+    The argument tuples are consumed, and the results returned, in the
+    calling thread, so only "function" needs to be thread-safe.
+    """
+    if workers <= 1:
+        for args in args_iterable:
+            yield function(*args)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from bounded_map(executor, function, args_iterable, workers * TASKS_AHEAD_PER_JOB)
+
+
+def bounded_map(executor: Executor, function: Callable[..., T], args_iterable: Iterable[Sequence[Any]],
+                window: int) -> Iterator[T]:
+    """
+    Generator returning the results of the given function, called by the
+    given executor with each of the given argument tuples, in the same
+    order, with at most "window" tasks submitted ahead of their results.
+    """
+    pending: Deque[Future[T]] = deque()
+    for args in args_iterable:
+        pending.append(executor.submit(function, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
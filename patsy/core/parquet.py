@@ -0,0 +1,160 @@
+import os
+from types import TracebackType
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Type
+
+# The file extension of Parquet inventory files
+PARQUET_EXTENSION = '.parquet'
+
+# Inventory fields stored as 64-bit integers
+INT64_FIELDS = ['BYTES']
+
+# Inventory fields stored as dictionary-encoded strings, as they have
+# relatively few distinct values
+DICTIONARY_FIELDS = ['BATCH', 'STORAGEPROVIDER']
+
+# The default number of rows in each Parquet row group/record batch
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def import_pyarrow() -> Any:
+    """
+    Returns the "pyarrow" module, which is an optional dependency.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as err:
+        raise ImportError("The 'pyarrow' package is required for Parquet files. "
+                          "Install it using 'pip install patsy[parquet]'.") from err
+    return pyarrow
+
+
+def is_parquet_file(file: str) -> bool:
+    return os.fspath(file).lower().endswith(PARQUET_EXTENSION)
+
+
+def inventory_schema(fieldnames: Sequence[str]) -> Any:
+    """
+    Returns the Arrow schema for the given inventory fields.
+    """
+    pa = import_pyarrow()
+    fields = []
+    for name in fieldnames:
+        if name in INT64_FIELDS:
+            fields.append(pa.field(name, pa.int64()))
+        elif name in DICTIONARY_FIELDS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+class ParquetDictWriter():
+    """
+    Writes inventory rows, given as Dictionaries of field name to string
+    value (as for "csv.DictWriter"), to a Parquet file, one row group of
+    "chunk_size" rows at a time.
+
+    The "BYTES" field is stored as a 64-bit integer, and the "BATCH" and
+    "STORAGEPROVIDER" fields are dictionary-encoded. Empty values are stored
+    as nulls. A "BYTES" value that is not an integer raises a ValueError.
+    """
+    def __init__(self, path: str, fieldnames: Sequence[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        pa = import_pyarrow()
+        self.fieldnames = list(fieldnames)
+        self.chunk_size = chunk_size
+        self.schema = inventory_schema(fieldnames)
+        self.writer = pa.parquet.ParquetWriter(path, self.schema)
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.fieldnames}
+        self.rows = 0
+
+    def writeheader(self) -> None:
+        # The schema is written as part of the file
+        pass
+
+    def writerow(self, row: Dict[str, Any]) -> None:
+        for name in self.fieldnames:
+            value = row.get(name)
+            if name in INT64_FIELDS:
+                value = ParquetDictWriter.to_int(name, value)
+            self.columns[name].append(value if value != '' else None)
+
+        self.rows += 1
+        if self.rows >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered rows to the file as a record batch.
+        """
+        if self.rows == 0:
+            return
+
+        pa = import_pyarrow()
+        arrays = []
+        for field in self.schema:
+            values = self.columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self.writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+        self.columns = {name: [] for name in self.fieldnames}
+        self.rows = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+
+    def __enter__(self) -> 'ParquetDictWriter':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    @staticmethod
+    def to_int(name: str, value: Any) -> Optional[int]:
+        """
+        Returns the given value of the given field as an integer, or None if
+        the value is empty. Raises a ValueError if the value is not an
+        integer, rather than storing it as a null, which would lose it.
+        """
+        if value is None or value == '':
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError) as err:
+            raise ValueError(f"Invalid {name} value: '{value}' is not an integer") from err
+
+
+class ParquetDictReader():
+    """
+    Reads the rows of a Parquet inventory file, one record batch at a time,
+    as Dictionaries of field name to string value, in the same form as
+    "csv.DictReader". Null values are returned as empty strings.
+    """
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        pa = import_pyarrow()
+        self.parquet_file = pa.parquet.ParquetFile(path)
+        self.chunk_size = chunk_size
+        self.fieldnames: List[str] = self.parquet_file.schema_arrow.names
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for record_batch in self.parquet_file.iter_batches(batch_size=self.chunk_size):
+            columns = [
+                (name, record_batch.column(i).to_pylist()) for i, name in enumerate(record_batch.schema.names)
+            ]
+            for row in range(record_batch.num_rows):
+                yield {name: '' if values[row] is None else str(values[row]) for name, values in columns}
+
+    def close(self) -> None:
+        self.parquet_file.close()
+
+    def __enter__(self) -> 'ParquetDictReader':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
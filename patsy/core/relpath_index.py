@@ -0,0 +1,53 @@
+from operator import attrgetter
+from pathlib import PurePosixPath
+from typing import Callable, Dict, Generic, Iterable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class RelpathIndex(Generic[T]):
+    """
+    Index of items (such as accessions) by relpath, used to match paths that
+    have extra leading components (such as APTrust file identifiers, which
+    start with the institution and bag name) to the item whose relpath is
+    the rest of the path.
+
+    The index is a Dictionary, so matching a path takes one lookup per
+    candidate suffix of the path, independent of the number of items.
+    """
+    def __init__(self, items: Iterable[T], relpath: Callable[[T], str] = attrgetter('relpath')) -> None:
+        self.items: Dict[str, T] = {}
+        # The largest number of components in a relpath. Longer suffixes of
+        # a path cannot match, so are not looked up.
+        self.max_parts = 0
+        for item in items:
+            item_relpath = relpath(item)
+            if item_relpath not in self.items:
+                self.items[item_relpath] = item
+                self.max_parts = max(self.max_parts, len(PurePosixPath(item_relpath).parts))
+
+    def get(self, relpath: str) -> Optional[T]:
+        """
+        Returns the item with the given relpath, or None.
+        """
+        return self.items.get(relpath)
+
+    def match(self, path: str, min_prefix_parts: int = 0) -> Optional[T]:
+        """
+        Returns the item whose relpath is the longest suffix of the given
+        path, after removing at least "min_prefix_parts" leading components,
+        or None if no item matches. Any number of further leading components
+        are removed to find a match.
+
+        When more than one item has the same relpath, the first is returned.
+        """
+        parts = PurePosixPath(path).parts
+        start = max(min_prefix_parts, len(parts) - self.max_parts)
+        for i in range(start, len(parts)):
+            item = self.items.get('/'.join(parts[i:]))
+            if item is not None:
+                return item
+        return None
+
+    def __len__(self) -> int:
+        return len(self.items)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class CachedResponse(NamedTuple):
+    """
+    A cached (parsed JSON) response body, with the time (in seconds since
+    the epoch) it was retrieved or last revalidated, and the "ETag" and
+    "Last-Modified" response headers used to revalidate it.
+    """
+    body: Any
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class ResponseCache():
+    """
+    On-disk cache of API responses, keyed by URL and query parameters, with
+    each response stored as a JSON file in the cache directory.
+
+    Responses retrieved less than "ttl" seconds ago are fresh, and can be
+    used without a request. Older responses should be revalidated using a
+    conditional request (see "conditional_headers").
+    """
+    # The default number of seconds a cached response is fresh
+    DEFAULT_TTL = 3600.0
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[CachedResponse]:
+        """
+        Returns the cached response for the given URL and parameters, or None
+        if there is no (readable) cached response.
+        """
+        try:
+            with open(self.path(url, params), mode='r') as f:
+                entry = json.load(f)
+            return CachedResponse(entry['body'], entry['fetched_at'], entry.get('etag'), entry.get('last_modified'))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, url: str, params: Optional[Dict[str, Any]], response: CachedResponse) -> None:
+        """
+        Stores the given response for the given URL and parameters. The
+        response is written to a temporary file, which then replaces any
+        existing file, so that readers (and other threads) never see a
+        partial response.
+        """
+        path = self.path(url, params)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {'url': url, 'params': ResponseCache.normalize(params), **response._asdict()}
+        with open(tmp_path, mode='w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, response: CachedResponse) -> bool:
+        return time.time() - response.fetched_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(response: CachedResponse) -> Dict[str, str]:
+        """
+        Returns the headers of a conditional request revalidating the given
+        cached response, which the server answers with a 304 status code
+        (and no body) if the response is unchanged.
+        """
+        headers = {}
+        if response.etag:
+            headers['If-None-Match'] = response.etag
+        if response.last_modified:
+            headers['If-Modified-Since'] = response.last_modified
+        return headers
+
+    def path(self, url: str, params: Optional[Dict[str, Any]]) -> str:
+        key = json.dumps([url, ResponseCache.normalize(params)])
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    @staticmethod
+    def normalize(params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Returns the given parameters as strings, in sorted order, so that
+        equivalent parameters have the same key.
+        """
+        return {name: str(value) for name, value in sorted((params or {}).items()) if value is not None}
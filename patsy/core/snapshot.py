@@ -0,0 +1,148 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from types import TracebackType
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple, Type
+
+# The version of the snapshot file format, stored in the "snapshot_info"
+# table, and checked when a snapshot is opened
+SNAPSHOT_FORMAT_VERSION = '1'
+
+# The snapshot is a SQLite database file. The "checksums" table is a
+# "WITHOUT ROWID" table, so the rows are stored in the primary key B-tree,
+# sorted by storage location, without a separate index.
+SQL_CREATE_SNAPSHOT = [
+    """
+    CREATE TABLE checksums (
+        storage_location TEXT PRIMARY KEY,
+        md5 TEXT,
+        sha1 TEXT,
+        sha256 TEXT
+    ) WITHOUT ROWID
+    """,
+    "CREATE TABLE snapshot_info (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID"
+]
+
+
+class InvalidSnapshotError(Exception):
+    pass
+
+
+class Checksums(NamedTuple):
+    """
+    The checksums of the accession at a storage location, with the same
+    attribute names as the Accession class.
+    """
+    md5: Optional[str]
+    sha1: Optional[str]
+    sha256: Optional[str]
+
+
+class ChecksumSnapshot():
+    """
+    Read-only, on-disk index of storage location to accession checksums,
+    used to look up checksums without a database connection.
+
+    The snapshot file is opened using the SQLite "immutable" option, so that
+    no locking or change detection is performed when it is read, and is read
+    using memory mapping.
+    """
+    # The number of storage locations looked up by a single query
+    LOOKUP_CHUNK_SIZE = 500
+
+    # The number of rows inserted at a time when building a snapshot
+    INSERT_CHUNK_SIZE = 10000
+
+    # The maximum number of bytes of the snapshot file read using memory
+    # mapping, instead of "read" system calls
+    MMAP_SIZE = 1 << 30
+
+    def __init__(self, path: str) -> None:
+        uri = Path(path).absolute().as_uri() + '?mode=ro&immutable=1'
+        try:
+            self.connection = sqlite3.connect(uri, uri=True)
+            self.connection.execute(f"PRAGMA mmap_size={ChecksumSnapshot.MMAP_SIZE}")
+            self.info = dict(self.connection.execute("SELECT key, value FROM snapshot_info"))
+        except sqlite3.Error as err:
+            raise InvalidSnapshotError(f"Cannot read snapshot file '{path}': {err}") from err
+
+        if self.info.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            self.connection.close()
+            raise InvalidSnapshotError(
+                f"Snapshot file '{path}' has an unsupported format version: '{self.info.get('format_version')}'"
+            )
+
+    def get_checksums(self, locations: Sequence[str]) -> Dict[str, Checksums]:
+        """
+        Returns a Dictionary of storage location to Checksums for the given
+        storage locations. Locations not in the snapshot are not included.
+        """
+        checksums: Dict[str, Checksums] = {}
+        unique_locations = list(dict.fromkeys(locations))
+        for i in range(0, len(unique_locations), ChecksumSnapshot.LOOKUP_CHUNK_SIZE):
+            chunk = unique_locations[i:i + ChecksumSnapshot.LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT storage_location, md5, sha1, sha256 FROM checksums WHERE storage_location IN ({placeholders})",
+                chunk
+            )
+            for storage_location, md5, sha1, sha256 in rows:
+                checksums[storage_location] = Checksums(md5, sha1, sha256)
+        return checksums
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'ChecksumSnapshot':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    @staticmethod
+    def build(path: str, location_checksums: Iterable[Tuple[str, str, str, str]]) -> int:
+        """
+        Writes a snapshot file to the given path from the given (storage
+        location, md5, sha1, sha256) tuples, which should be ordered by
+        storage location. If a storage location appears more than once, the
+        first tuple is used.
+
+        The snapshot is written to a temporary file, which then replaces any
+        existing file at the path, so that readers never see a partial
+        snapshot. Returns the number of storage locations in the snapshot.
+        """
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        connection = sqlite3.connect(tmp_path)
+        try:
+            # The file is only used once it is complete, so journaling is
+            # not needed
+            connection.execute("PRAGMA journal_mode=OFF")
+            connection.execute("PRAGMA synchronous=OFF")
+            for sql in SQL_CREATE_SNAPSHOT:
+                connection.execute(sql)
+
+            iterator = iter(location_checksums)
+            while rows := list(islice(iterator, ChecksumSnapshot.INSERT_CHUNK_SIZE)):
+                connection.executemany("INSERT OR IGNORE INTO checksums VALUES (?, ?, ?, ?)", rows)
+
+            locations = connection.execute("SELECT COUNT(*) FROM checksums").fetchone()[0]
+            connection.executemany("INSERT INTO snapshot_info VALUES (?, ?)", [
+                ('format_version', SNAPSHOT_FORMAT_VERSION),
+                ('created_at', datetime.now(timezone.utc).isoformat()),
+                ('locations', str(locations))
+            ])
+            connection.commit()
+        except BaseException:
+            connection.close()
+            os.remove(tmp_path)
+            raise
+
+        connection.close()
+        os.replace(tmp_path, path)
+        return int(locations)
@@ -1,20 +1,34 @@
 import logging
+import math
 import re
+import time
 from dataclasses import dataclass, field
-from pathlib import Path
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import cast, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import requests
+from requests.adapters import HTTPAdapter
 from sqlalchemy import text
 
+from patsy.core.batch_name_index import BatchNameIndex
 from patsy.core.db_gateway import DbGateway
-from patsy.model import Accession, Batch, Location, StorageProvider
+from patsy.core.parallel import thread_map
+from patsy.core.relpath_index import RelpathIndex
+from patsy.core.response_cache import CachedResponse, ResponseCache
+from patsy.model import Accession, StorageProvider, SyncState
+
+# An APTrust timestamp, such as "2022-12-04T18:24:48.94241Z"
+TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:\d{2})?')
 
 
 class InvalidStatusCodeError(Exception):
     pass
 
 
+class RequestFailedError(Exception):
+    pass
+
+
 class MissingHeadersError(Exception):
     pass
 
@@ -23,11 +37,40 @@ class InvalidTimeError(Exception):
     pass
 
 
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """
+    Returns the given APTrust timestamp as a naive UTC datetime, or None if
+    the value is not a timestamp. Unlike "datetime.fromisoformat" (before
+    Python 3.11), accepts the "Z" suffix, and any number of fractional digits.
+    """
+    match = TIMESTAMP_PATTERN.fullmatch(value or '')
+    if match is None:
+        return None
+
+    seconds, fraction, offset = match.groups()
+    timestamp = datetime.strptime(seconds, '%Y-%m-%dT%H:%M:%S')
+    if fraction:
+        timestamp = timestamp.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+    if offset and offset != 'Z':
+        sign = 1 if offset[0] == '+' else -1
+        timestamp -= sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+    return timestamp
+
+
+def format_timestamp(timestamp: datetime) -> str:
+    """
+    Returns the given (naive UTC) datetime as an APTrust timestamp.
+    """
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
 @dataclass
 class SyncResult():
     files_duplicated: List[str] = field(default_factory=list)
     files_not_found: List[str] = field(default_factory=list)
     skipped_batches: List[str] = field(default_factory=list)
+    # The batch names similar to the names of the skipped bags, by bag name
+    batch_candidates: Dict[str, List[str]] = field(default_factory=dict)
     batches_processed: int = 0
     batches_skipped: int = 0
     files_processed: int = 0
@@ -54,31 +97,162 @@ class Sync:
     FILE_REQUEST = '/member-api/v3/files'
     OBJECT_REQUEST = '/member-api/v3/objects'
 
-    def __init__(self, gateway: DbGateway, headers: Dict[str, Any]) -> None:
+    # The number of leading components of an APTrust file identifier (the
+    # institution, bag name and "data" directory) that are never part of
+    # the relpath
+    IDENTIFIER_PREFIX_PARTS = 3
+
+    # The storage provider name of the SyncState of incremental syncs
+    SYNC_STATE_PROVIDER = 'APTrust'
+
+    # The default number of threads retrieving the file lists of bags
+    DEFAULT_WORKERS = 4
+
+    # The default number of seconds to wait to connect to the API, and for
+    # each response
+    DEFAULT_TIMEOUT = 60.0
+
+    def __init__(self, gateway: DbGateway, headers: Dict[str, Any], workers: int = DEFAULT_WORKERS,
+                 timeout: float = DEFAULT_TIMEOUT, base_url: str = APTRUST_URL,
+                 response_cache: Optional[ResponseCache] = None, offline: bool = False) -> None:
         # Headers will be an enviroment variable that will be obtained and passed in
         self.headers = headers
         self.gateway = gateway
+        self.workers = workers
+        self.timeout = timeout
+        self.base_url = base_url
+        # When "offline" is True, only the responses in the cache are used
+        self.response_cache = response_cache
+        self.offline = offline
         self.sync_results = SyncResult()
+        self.aptrust_storage_provider_id: Optional[int] = None
+        self.cached_batch_locations: Optional[Tuple[int, Set[str]]] = None
+        # The batch ids by name, the batch names by id, and the batch ids by
+        # APTrust object id, loaded once by "load_batches"
+        self.batch_ids: Optional[Dict[str, int]] = None
+        self.batch_names: Dict[int, str] = {}
+        self.object_batch_ids: Dict[int, int] = {}
+        # The object batch ids matched by this sync, not yet stored
+        self.new_object_batch_ids: Dict[int, int] = {}
+        self.batch_name_index: Optional[BatchNameIndex] = None
+        # The latest creation time of the bags synced incrementally
+        self.last_created_at: Optional[datetime] = None
+        self.http_session = Sync.create_http_session(workers)
+
+    @staticmethod
+    def create_http_session(workers: int) -> requests.Session:
+        """
+        Returns a requests Session whose connection pool keeps a (keep-alive)
+        connection open for each worker thread (of both the bag and the page
+        thread pools), so that connections are reused for all the requests.
+        """
+        http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1) * 2)
+        http_session.mount('https://', adapter)
+        http_session.mount('http://', adapter)
+        return http_session
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Returns the parsed JSON response of a GET request, or None (logging a
+        warning) if the request fails, or does not return a 200 status code.
+        Called by the worker threads of "iter_pages" and "process".
+
+        If there is a response cache, fresh cached responses are used without
+        a request, and stale ones are revalidated with a conditional request.
+        In offline mode, only cached responses (fresh or not) are used.
+        """
+        cache = self.response_cache
+        cached = cache.get(url, params) if cache is not None else None
+        if cache is not None and cached is not None and (self.offline or cache.is_fresh(cached)):
+            return cast(Dict[str, Any], cached.body)
+
+        if self.offline:
+            logging.warning(f"No cached response for {url} {params or ''}, skipping this get request.")
+            return None
 
-    def get_request(self, endpoint: str, **params: Any) -> list[Dict[str, Any]]:
-        results = []
-        r = requests.get(url=self.APTRUST_URL + endpoint, params=params, headers=self.headers)
+        headers = self.headers
+        if cached is not None:
+            headers = {**self.headers, **ResponseCache.conditional_headers(cached)}
+
+        try:
+            r = self.http_session.get(url=url, params=params, headers=headers, timeout=self.timeout)
+        except requests.RequestException as err:
+            logging.warning(f"The get request failed ({err}), skipping this get request.")
+            return None
 
-        while r.status_code == 200:
-            get_results = r.json().get('results')
-            if get_results is None:
-                logging.info("There was no results to retrieve from the get request.")
-                return []
+        if r.status_code == 304 and cache is not None and cached is not None:
+            cache.put(url, params, cached._replace(fetched_at=time.time()))
+            return cast(Dict[str, Any], cached.body)
 
-            results.extend(get_results)
-            next_page = r.json().get('next')
-            if next_page == '':
-                return results
+        if r.status_code != 200:
+            logging.warning(f"Got a {r.status_code} status code, skipping this get request.")
+            return None
 
-            r = requests.get(url=self.APTRUST_URL + next_page, headers=self.headers)
+        body = r.json()
+        if cache is not None:
+            cache.put(url, params, CachedResponse(
+                body, time.time(), r.headers.get('ETag'), r.headers.get('Last-Modified')
+            ))
+        return cast(Dict[str, Any], body)
+
+    def iter_pages(self, endpoint: str, params: Dict[str, Any],
+                   first_page: Optional[Dict[str, Any]] = None) -> Iterator[list[Dict[str, Any]]]:
+        """
+        Generator returning the results of each page of the given listing
+        endpoint, in order. The first page may be provided, if it has already
+        been retrieved.
+
+        The number of pages is calculated from the total "count" and the
+        size of the first page, and the remaining pages are retrieved
+        concurrently (using the "page" parameter) by "workers" threads, at
+        most a few pages ahead of the page being returned, so that the pages
+        can be processed while the later pages are downloaded, and memory
+        use does not depend on the number of pages. If the count is not
+        provided, the "next" links are followed one page at a time.
+
+        Raises RequestFailedError if a page cannot be retrieved.
+        """
+        url = self.base_url + endpoint
+        if first_page is None:
+            first_page = self.get_json(url, params)
+        if first_page is None:
+            raise RequestFailedError(f"Cannot retrieve {endpoint}")
+
+        results = first_page.get('results')
+        if results is None:
+            logging.info("There was no results to retrieve from the get request.")
+            return
+
+        yield results
+        next_page = first_page.get('next')
+        count = first_page.get('count')
+
+        if next_page and isinstance(count, int) and results:
+            pages = math.ceil(count / len(results))
+            page_args = ((url, {**params, 'page': page}) for page in range(2, pages + 1))
+            for response in thread_map(self.get_json, page_args, self.workers):
+                if response is None or response.get('results') is None:
+                    raise RequestFailedError(f"Cannot retrieve all the pages of {endpoint}")
+                yield response['results']
+            return
+
+        while next_page:
+            response = self.get_json(self.base_url + next_page)
+            if response is None or response.get('results') is None:
+                raise RequestFailedError(f"Cannot retrieve all the pages of {endpoint}")
+            yield response['results']
+            next_page = response.get('next')
 
-        logging.warning(f"Got a {r.status_code} status code, skipping this get request.")
-        return []
+    def get_request(self, endpoint: str, **params: Any) -> list[Dict[str, Any]]:
+        """
+        Returns the results of all the pages of the given listing endpoint,
+        or an empty list if any page cannot be retrieved.
+        """
+        try:
+            return [result for page in self.iter_pages(endpoint, params) for result in page]
+        except RequestFailedError:
+            return []
 
     def parse_name(self, batchname: str) -> str:
         if batchname.startswith('archive'):
@@ -95,39 +269,96 @@ class Sync:
         else:
             return batchname
 
-    def check_path(self, id: str, relpaths: list[Accession]) -> Optional[Accession]:
-        p = Path(id)
-
-        # Initially try removing the first 3 paths
-        # Then increment down to 3 if it doesn't match
-        for i in range(3, 6):
-            id = '/'.join(map(str, p.parts[i:]))
-            match = [x for x in relpaths if x.relpath == id]
-            if match:
-                return match[0]
-
-        # match will be None if no match was found
-        return None
+    def check_path(self, id: str,
+                   relpaths: Union[list[Accession], RelpathIndex[Accession]]) -> Optional[Accession]:
+        """
+        Returns the accession whose relpath is the longest suffix of the
+        given identifier, after removing the IDENTIFIER_PREFIX_PARTS leading
+        components, and any number of further leading components. Returns
+        None if no accession matches.
+
+        "relpaths" should be a RelpathIndex of the accessions of the batch,
+        so that it is only built once per batch.
+        """
+        if not isinstance(relpaths, RelpathIndex):
+            relpaths = RelpathIndex(relpaths)
+        return relpaths.match(id, Sync.IDENTIFIER_PREFIX_PARTS)
+
+    def get_aptrust_storage_provider_id(self) -> Optional[int]:
+        """
+        Returns the id of the "APTrust" storage provider, or None if it does
+        not exist. The id is only queried until it is found.
+        """
+        if self.aptrust_storage_provider_id is None:
+            ap_trust_storage_provider = self.gateway.session.query(StorageProvider).filter(
+                StorageProvider.name == "APTrust"
+                ).first()
+            if ap_trust_storage_provider is not None:
+                self.aptrust_storage_provider_id = ap_trust_storage_provider.id
+        return self.aptrust_storage_provider_id
+
+    def batch_locations(self, storage_provider_id: int, batch_id: Optional[int]) -> Set[str]:
+        """
+        Returns the (known) APTrust locations of the batch with the given id,
+        retrieved with one query, and kept (with the locations added since)
+        for the following calls for the same batch. Only the locations of
+        the last batch are kept.
+        """
+        if batch_id is None:
+            return set()
+        if self.cached_batch_locations is None or self.cached_batch_locations[0] != batch_id:
+            self.cached_batch_locations = (
+                batch_id, self.gateway.get_batch_storage_locations(batch_id, storage_provider_id)
+            )
+        return self.cached_batch_locations[1]
+
+    def existing_locations(self, storage_provider_id: int, identifiers: list[str],
+                           batch_locations: Set[str]) -> Set[str]:
+        """
+        Returns the given identifiers that already exist as APTrust locations.
+
+        Only the identifiers that are not in the given locations of the batch
+        (usually none, when a bag is synced again) are checked in the
+        database (in chunks).
+        """
+        unknown = [id for id in identifiers if id not in batch_locations]
+        existing = {id for id in identifiers if id in batch_locations}
+        existing.update(self.gateway.get_storage_locations(storage_provider_id, unknown))
+        return existing
 
     def check_or_add_files(self, batch: str, identifiers: list[str],
-                           accessions: list[Accession], add: bool = False) -> None:
+                           accessions: Union[list[Accession], RelpathIndex[Accession]], add: bool = False,
+                           batch_id: Optional[int] = None) -> None:
+        """
+        Matches the given APTrust file identifiers with the given accessions
+        (of the batch with the given name and (optional) id), recording the
+        identifiers that do not match an accession, or are already APTrust
+        locations. If "add" is True, the other identifiers are added as
+        APTrust locations of their accessions.
+
+        The existing locations are checked, and the new locations and links
+        inserted, in bulk, rather than one identifier at a time. "accessions"
+        may be a RelpathIndex, so that it is built once for all the pages of
+        the files of a bag.
+        """
         amount_files_added: int = 0
         amount_not_found: int = 0
         amount_already_exists: int = 0
         amount_files_processed: int = 0
 
-        ap_trust_storage_provider = self.gateway.session.query(StorageProvider).filter(
-            StorageProvider.name == "APTrust"
-            ).first()
-        if ap_trust_storage_provider is None:
+        storage_provider_id = self.get_aptrust_storage_provider_id()
+        if storage_provider_id is None:
             return None
 
+        relpath_index = accessions if isinstance(accessions, RelpathIndex) else RelpathIndex(accessions)
+
         # Go through the identifiers
+        matches = []
         for id in identifiers:
             # Add processed file and check the path
             self.sync_results.files_processed += 1
             amount_files_processed += 1
-            match = self.check_path(id, accessions)
+            match = self.check_path(id, relpath_index)
 
             if match is None:
                 # Add the identifier to the list of not found files
@@ -135,26 +366,26 @@ class Sync:
                 amount_not_found += 1
                 continue
 
-            location = self.gateway.session.query(Location) \
-                           .filter(Location.storage_location == id,
-                                   Location.storage_provider == ap_trust_storage_provider) \
-                           .first()
+            matches.append((id, match))
 
-            if location is None:
-                if add:
-                    location = Location(
-                        storage_location=id,
-                        storage_provider=ap_trust_storage_provider,
-                    )
-                    self.gateway.session.add(location)
-                    match.locations.append(location)
+        batch_locations = self.batch_locations(storage_provider_id, batch_id)
+        existing = self.existing_locations(storage_provider_id, [id for id, _ in matches], batch_locations)
 
-                self.sync_results.locations_added += 1
-                amount_files_added += 1
-            else:
+        # The accession ids of the new locations, by identifier
+        new_locations: Dict[str, int] = {}
+        for id, match in matches:
+            if id in existing or (add and id in new_locations):
                 self.sync_results.duplicate_files += 1
                 self.sync_results.files_duplicated.append(id)
                 amount_already_exists += 1
+            else:
+                new_locations.setdefault(id, match.id)
+                self.sync_results.locations_added += 1
+                amount_files_added += 1
+
+        if add:
+            self.gateway.add_linked_locations(storage_provider_id, new_locations)
+            batch_locations.update(new_locations)
 
         if amount_files_added > 0:
             logging.info(f"Batch {batch}: {amount_files_added}/{amount_files_processed} files matched")
@@ -165,68 +396,241 @@ class Sync:
         if amount_already_exists > 0:
             logging.info(f"Batch {batch}: {amount_already_exists}/{amount_files_processed} preexisting matches")
 
-    def check_batch(self, bag: Dict[str, Any]) -> Optional[tuple[str, str]]:
+    def load_batches(self) -> None:
+        """
+        Loads the names and ids of all the batches, and the batch ids of the
+        APTrust objects matched by previous syncs, with one query each, the
+        first time it is called.
+        """
+        if self.batch_ids is not None:
+            return
+
+        self.batch_names = self.gateway.get_batch_names()
+        # As with the previous "first" query, a name is matched to a single
+        # batch
+        self.batch_ids = {}
+        for batch_id in sorted(self.batch_names):
+            self.batch_ids.setdefault(self.batch_names[batch_id], batch_id)
+        self.object_batch_ids = self.gateway.get_aptrust_object_batch_ids()
+
+    def check_batch(self, bag: Dict[str, Any]) -> Optional[tuple[int, str]]:
+        """
+        Returns the (id, name) of the batch matching the given bag, or None
+        if the bag does not match a batch in PATSy.
+
+        Bags whose object was matched by a previous sync are matched using
+        the stored batch id, without parsing the bag name. Other bags are
+        matched by their parsed bag name, and the match is recorded (see
+        "save_object_batch_ids"). No queries are made after the first call
+        (see "load_batches").
+        """
+        self.load_batches()
+        object_id = bag.get('id')
+        batch_id = self.object_batch_ids.get(object_id)  # type: ignore
+        if batch_id is not None and batch_id in self.batch_names:
+            return batch_id, self.batch_names[batch_id]
+
         # Check if archive in PATSy
         batch_name = self.parse_name(bag.get('bag_name'))  # type: ignore
         logging.debug(f"Checking if {batch_name} in database.")
-        query = self.gateway.session.query(Batch) \
-                    .filter(Batch.name == batch_name) \
-                    .first()
-
-        # If so create tuple from the query
-        if query is not None:
-            return query.id, query.name
+        batch_id = self.batch_ids.get(batch_name)  # type: ignore
+        if batch_id is None:
+            return None
 
-        return None
+        if isinstance(object_id, int):
+            self.object_batch_ids[object_id] = batch_id
+            self.new_object_batch_ids[object_id] = batch_id
+        return batch_id, batch_name
+
+    def save_object_batch_ids(self) -> None:
+        """
+        Stores the batch ids of the APTrust objects matched (by name) since
+        the last call, so that later syncs match them without parsing their
+        bag names.
+        """
+        if self.new_object_batch_ids:
+            self.gateway.add_aptrust_objects(self.new_object_batch_ids)
+            self.new_object_batch_ids = {}
+
+    def batch_candidates(self, bag_name: str) -> List[str]:
+        """
+        Returns the names of the batches similar to the given (unmatched) bag
+        name, using a BatchNameIndex of the batch names built the first time
+        it is called.
+        """
+        if self.batch_name_index is None:
+            self.load_batches()
+            self.batch_name_index = BatchNameIndex(self.batch_ids or {})
+        return self.batch_name_index.candidates(self.parse_name(bag_name))
 
     def check_new_locations(self, name: str) -> bool:
-        session = self.gateway.session
-        engine = session.get_bind()
-        with engine.connect() as con:
-            t = text("SELECT * FROM patsy_records WHERE batch_name=:name and storage_provider = 'APTrust'")
-            rs = con.execute(t, name=name)
-
-            if not rs:
-                return True
-
-        return False
-
-    def process(self, **params: Any) -> SyncResult:
-        bags = self.get_request(self.OBJECT_REQUEST, per_page=1000, **params)
-        # Get all the objects and loop over them
+        """
+        Returns True if the batch with the given name has no APTrust
+        locations. Uses the session (not a separate connection), so that the
+        locations added but not yet committed are included, and the session's
+        transaction is not affected.
+        """
+        t = text("SELECT 1 FROM patsy_records WHERE batch_name=:name and storage_provider = 'APTrust'")
+        return self.gateway.session.execute(t, {'name': name}).first() is None
+
+    def matched_bags(self, bags: Iterable[Dict[str, Any]]) -> Iterator[Tuple[Dict[str, Any], int, str]]:
+        """
+        Generator returning a (bag, batch id, batch name) tuple for each of
+        the given bags that matches a batch in PATSy. Bags that do not match
+        a batch are recorded as skipped.
+        """
         for bag in bags:
             in_patsy = self.check_batch(bag)
             self.sync_results.batches_processed += 1
 
-            # If bag was found in PATSy, go through the files in the bag
-            if in_patsy is not None:
-                batch_id, batch_name = in_patsy
-                accessions = self.gateway.session.query(Accession) \
-                                 .filter(Accession.batch_id == batch_id) \
-                                 .all()
-
-                if self.check_new_locations(batch_name):
-                    logging.info(f"Found a batch that didn't have APTrust locations in PATSy: {bag.get('title')}")
-                    logging.info(f"There are {bag.get('file_count')} files in the batch")
-
-                logging.debug(f'Attempting to check files from {batch_name}')
-                object_id = bag.get('id')
-                files = self.get_request(self.FILE_REQUEST, intellectual_object_id=object_id, per_page=1000, state='A')
+            if in_patsy is None:
+                logging.warning("Batch was not found in database! Skipping this batch!")
+                self.sync_results.batches_skipped += 1
+                self.sync_results.skipped_batches.append(bag.get('bag_name'))  # type: ignore
+                candidates = self.batch_candidates(bag.get('bag_name') or '')
+                if candidates:
+                    self.sync_results.batch_candidates[bag.get('bag_name')] = candidates  # type: ignore
+                continue
 
-                if files:
-                    logging.debug("Successfully retrieved files!")
-                    identifiers = [f.get('identifier') for f in files]
-                    self.check_or_add_files(batch_name, identifiers, accessions, add=True)  # type: ignore
+            batch_id, batch_name = in_patsy
+            yield bag, int(batch_id), batch_name
+
+    def file_params(self, bag: Dict[str, Any]) -> Dict[str, Any]:
+        return {'intellectual_object_id': bag.get('id'), 'per_page': 1000, 'state': 'A'}
+
+    def get_first_file_page(self, bag: Dict[str, Any], batch_id: int,
+                            batch_name: str) -> Tuple[Dict[str, Any], int, str, Optional[Dict[str, Any]]]:
+        """
+        Returns the given bag, batch id and batch name, with the first page of
+        the active files of the bag (or None if it cannot be retrieved).
+        Called by the worker threads of "process", so only makes requests to
+        the API, and does not use the database.
+        """
+        logging.debug(f'Attempting to check files from {batch_name}')
+        return bag, batch_id, batch_name, self.get_json(self.base_url + self.FILE_REQUEST, self.file_params(bag))
+
+    @staticmethod
+    def bag_position(bag: Dict[str, Any]) -> Tuple[datetime, int]:
+        """
+        Returns the (update time, id) of the given bag, which orders the bags
+        for incremental syncs.
+        """
+        return parse_timestamp(bag.get('updated_at')) or datetime.min, int(bag.get('id') or 0)
+
+    def bags_to_sync(self, bags: list[Dict[str, Any]], sync_state: Optional[SyncState]) -> list[Dict[str, Any]]:
+        """
+        Returns the given bags in (update time, id) order, without the bags
+        at or before the position recorded in the given SyncState (those
+        synced by the previous incremental syncs).
+        """
+        bags = sorted(bags, key=Sync.bag_position)
+        if sync_state is None or sync_state.last_updated_at is None:
+            return bags
+
+        cursor = sync_state.cursor or ''
+        position = (sync_state.last_updated_at, int(cursor) if cursor.isdigit() else -1)
+        return [bag for bag in bags if Sync.bag_position(bag) > position]
+
+    def save_sync_state(self, bag: Dict[str, Any]) -> None:
+        """
+        Records the given bag (and so all the bags before it) as synced, in
+        the same transaction as its locations and the objects matched, and
+        commits.
+        """
+        self.save_object_batch_ids()
+        created_at = parse_timestamp(bag.get('created_at'))
+        if created_at is not None and (self.last_created_at is None or created_at > self.last_created_at):
+            self.last_created_at = created_at
+
+        self.gateway.set_sync_state(
+            Sync.SYNC_STATE_PROVIDER, self.last_created_at, parse_timestamp(bag.get('updated_at')), str(bag.get('id'))
+        )
+        self.gateway.commit()
+
+    def process(self, incremental: bool = False, **params: Any) -> SyncResult:
+        """
+        Matches the files of the bags returned by the API for the given
+        parameters with the accessions in PATSy, adding their APTrust
+        locations.
+
+        The first page of the files of "workers" bags are retrieved
+        concurrently, by a thread pool. The remaining pages of each bag are
+        retrieved concurrently (see "iter_pages"), and matched as they are
+        returned. The matching and database updates are all performed by
+        this thread, one bag at a time, in the order the bags were returned.
+
+        When "incremental" is True, only the bags updated since the last bag
+        synced by the previous incremental sync (or all the bags, for the
+        first incremental sync) are synced, in order of update time. The last
+        bag synced is recorded in the SyncState, and committed, after each bag,
+        so that an interrupted sync is resumed by the next incremental sync.
+        If the files of a bag cannot be retrieved, the SyncState is not
+        advanced past it.
+        """
+        sync_state = None
+        if incremental:
+            sync_state = self.gateway.get_sync_state(Sync.SYNC_STATE_PROVIDER)
+            if sync_state is not None:
+                self.last_created_at = sync_state.last_created_at
+                if sync_state.last_updated_at is not None:
+                    params['updated_at__gteq'] = format_timestamp(sync_state.last_updated_at)
+                    logging.info(f"Syncing bags updated since {params['updated_at__gteq']}")
 
-                else:
-                    logging.warning("Batch was skipped!")
-                    self.sync_results.batches_skipped += 1
-                    self.sync_results.skipped_batches.append(bag.get('bag_name'))  # type: ignore
+        bags = self.get_request(self.OBJECT_REQUEST, per_page=1000, **params)
+        if incremental:
+            bags = self.bags_to_sync(bags, sync_state)
+
+        # The SyncState is advanced until a bag fails
+        checkpoint = incremental
+        # Get all the objects and retrieve the files of those found in PATSy
+        first_pages = thread_map(self.get_first_file_page, self.matched_bags(bags), self.workers)
+        for bag, batch_id, batch_name, first_page in first_pages:
+            accessions = self.gateway.session.query(Accession) \
+                             .filter(Accession.batch_id == batch_id) \
+                             .all()
+            relpath_index = RelpathIndex(accessions)
+
+            if self.check_new_locations(batch_name):
+                logging.info(f"Found a batch that didn't have APTrust locations in PATSy: {bag.get('title')}")
+                logging.info(f"There are {bag.get('file_count')} files in the batch")
+
+            files_found = False
+            failed = False
+            try:
+                for files in self.iter_pages(self.FILE_REQUEST, self.file_params(bag), first_page):
+                    if files:
+                        files_found = True
+                        identifiers = [f.get('identifier') for f in files]
+                        self.check_or_add_files(batch_name, identifiers, relpath_index,  # type: ignore
+                                                add=True, batch_id=batch_id)
+            except RequestFailedError:
+                # The files of the pages already retrieved have been
+                # processed, but the batch is reported as skipped
+                files_found = False
+                failed = True
+
+            if files_found:
+                logging.debug("Successfully retrieved files!")
 
             else:
-                logging.warning("Batch was not found in database! Skipping this batch!")
+                logging.warning("Batch was skipped!")
                 self.sync_results.batches_skipped += 1
                 self.sync_results.skipped_batches.append(bag.get('bag_name'))  # type: ignore
 
+            if checkpoint and failed:
+                # The bags before this bag have all been synced
+                index = bags.index(bag)
+                if index > 0:
+                    self.save_sync_state(bags[index - 1])
+                logging.warning(f"The sync state will not be advanced past {bag.get('bag_name')}")
+                checkpoint = False
+            elif checkpoint:
+                self.save_sync_state(bag)
+
+        # Record the bags after the last bag found in PATSy as synced
+        if checkpoint and bags:
+            self.save_sync_state(bags[-1])
+        self.save_object_batch_ids()
+
         logging.debug("FINISHED PROCESS")
         return self.sync_results
@@ -5,8 +5,9 @@ import sqlalchemy
 
 from dataclasses import dataclass
 from patsy.core.db_gateway import DbGateway
+from patsy.core.file_utils import STDIN, open_text
 from patsy.model import Accession
-from typing import List, TypeVar
+from typing import List, Optional, Sequence, TypeVar
 
 
 @dataclass
@@ -56,18 +57,26 @@ class UpdateArgs:
         if not hasattr(Accession, self.db_target_column):
             errors.append(f"Database target column '{self.db_target_column}' does not exist for accessions.")
 
-        try:
-            with open(self.file) as f:
-                reader = csv.DictReader(f, delimiter=',')
-                fieldnames = reader.fieldnames
+        # Standard input can only be read once, so its header is checked by
+        # "Update.update" instead
+        if self.file != STDIN:
+            try:
+                with open_text(self.file) as f:
+                    reader = csv.DictReader(f, delimiter=',')
+                    errors.extend(self.validate_csv_header(reader.fieldnames))
+            except OSError as os:
+                errors.append(f"Could not access '{self.file}'. {os}")
 
-                if fieldnames is None or self.csv_compare_column not in fieldnames:
-                    errors.append(f"CSV compare column '{self.csv_compare_column}' not found in '{self.file}'.")
+        return errors
+
+    def validate_csv_header(self, fieldnames: Optional[Sequence[str]]) -> list[str]:
+        errors = []
 
-                if fieldnames is None or self.csv_update_column not in fieldnames:
-                    errors.append(f"CSV update column '{self.csv_update_column}' not found in '{self.file}'.")
-        except OSError as os:
-            errors.append(f"Could not access '{self.file}'. {os}")
+        if fieldnames is None or self.csv_compare_column not in fieldnames:
+            errors.append(f"CSV compare column '{self.csv_compare_column}' not found in '{self.file}'.")
+
+        if fieldnames is None or self.csv_update_column not in fieldnames:
+            errors.append(f"CSV update column '{self.csv_update_column}' not found in '{self.file}'.")
 
         return errors
 
@@ -115,8 +124,14 @@ class Update:
         csv_file = args.file
 
         session = self.gateway.session
-        with open(csv_file) as f:
+        with open_text(csv_file) as f:
             reader = csv.DictReader(f, delimiter=',')
+            if csv_file == STDIN:
+                header_errors = args.validate_csv_header(reader.fieldnames)
+                if len(header_errors) > 0:
+                    self.update_result.add_errors(header_errors)
+                    return self.update_result
+
             for row in reader:
                 self.update_result.csv_rows_processed += 1
                 csv_compare_value = row[csv_compare_column]
@@ -0,0 +1,198 @@
+import csv
+import os
+import sys
+from contextlib import contextmanager
+from patsy.core.db_gateway import DbGateway
+from patsy.core.hashing import ALGORITHMS, MEGABYTE, RateLimiter, hash_file
+from patsy.core.parallel import process_map
+from patsy.model import Accession, Batch
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class VerifyResult():
+    """
+    Holds the information about the results of a verification
+    """
+    def __init__(self) -> None:
+        self.files_processed = 0
+        self.files_matched = 0
+        self.files_mismatched = 0
+        self.files_missing = 0
+        self.files_skipped = 0
+        self.files_with_errors = 0
+        self.bytes_read = 0
+
+    def __repr__(self) -> str:
+        lines = [
+            f"files_processed='{self.files_processed}'",
+            f"files_matched='{self.files_matched}'",
+            f"files_mismatched='{self.files_mismatched}'",
+            f"files_missing='{self.files_missing}'",
+            f"files_skipped='{self.files_skipped}'",
+            f"files_with_errors='{self.files_with_errors}'",
+            f"bytes_read='{self.bytes_read}'",
+        ]
+
+        return f"<VerifyResult({','.join(lines)})>"
+
+
+class FileTask(NamedTuple):
+    """
+    A file to verify (the relpath of an accession under the root directory),
+    and the values stored for its accession
+    """
+    root: str
+    relpath: str
+    path: str
+    bytes: Optional[int]
+    checksums: Dict[str, str]
+
+
+class FileCheck(NamedTuple):
+    """
+    The result of verifying a file. "differences" is a list of (field,
+    expected value, actual value) tuples.
+    """
+    relpath: str
+    path: str
+    status: str
+    differences: List[Tuple[str, str, str]]
+    bytes_read: int
+
+
+class Verify:
+    # The statuses of a verified file
+    OK = 'OK'
+    MISMATCH = 'MISMATCH'
+    MISSING = 'MISSING'
+    SKIPPED = 'SKIPPED'
+    ERROR = 'ERROR'
+
+    # The fields of the report, which lists the files that were not verified
+    # successfully. For files with errors, "actual" is the error message.
+    REPORT_FIELDS = ['relpath', 'path', 'status', 'field', 'expected', 'actual']
+
+    def __init__(self, gateway: DbGateway) -> None:
+        self.gateway = gateway
+        self.verify_result = VerifyResult()
+
+    def verify(self, batch: Batch, root: str, output: Optional[str] = None, jobs: int = 1,
+               max_rate: Optional[float] = None) -> VerifyResult:
+        """
+        Verifies the files of the accessions of the given batch, at their
+        relpaths under the given (local) root directory, against the stored
+        size and checksums, writing a report of the files that do not match,
+        are missing, or could not be read to the given output file (or
+        standard out if output is None) as they are found.
+
+        Files are hashed by "jobs" worker processes, limited to a total of
+        "max_rate" megabytes per second (if provided), with all the needed
+        digests computed in a single read of each file.
+        """
+        root = os.path.abspath(root)
+        bytes_per_second = max_rate * MEGABYTE if max_rate else None
+        with Verify.open_report(output) as writer:
+            writer.writeheader()
+            for file_check in Verify.check_files(self.file_tasks(batch, root), jobs, bytes_per_second):
+                self.add_file_check(file_check)
+                if file_check.status not in [Verify.OK, Verify.SKIPPED]:
+                    for field, expected, actual in file_check.differences or [('', '', '')]:
+                        writer.writerow({
+                            'relpath': file_check.relpath, 'path': file_check.path, 'status': file_check.status,
+                            'field': field, 'expected': expected, 'actual': actual
+                        })
+        return self.verify_result
+
+    def file_tasks(self, batch: Batch, root: str) -> Iterator[FileTask]:
+        """
+        Generator returning a FileTask for each accession of the given batch,
+        ordered by relpath.
+        """
+        query = self.gateway.session.query(
+            Accession.relpath, Accession.bytes, Accession.md5, Accession.sha1, Accession.sha256
+        ).filter(Accession.batch_id == batch.id).order_by(Accession.relpath)
+
+        for relpath, num_bytes, md5, sha1, sha256 in query.yield_per(DbGateway.FETCH_SIZE):
+            checksums = {
+                algorithm: checksum.strip().lower()
+                for algorithm, checksum in zip(ALGORITHMS, [md5, sha1, sha256]) if checksum and checksum.strip()
+            }
+            yield FileTask(root, relpath, os.path.normpath(os.path.join(root, relpath)), num_bytes, checksums)
+
+    def add_file_check(self, file_check: FileCheck) -> None:
+        self.verify_result.files_processed += 1
+        self.verify_result.bytes_read += file_check.bytes_read
+        if file_check.status == Verify.OK:
+            self.verify_result.files_matched += 1
+        elif file_check.status == Verify.MISMATCH:
+            self.verify_result.files_mismatched += 1
+        elif file_check.status == Verify.MISSING:
+            self.verify_result.files_missing += 1
+        elif file_check.status == Verify.SKIPPED:
+            self.verify_result.files_skipped += 1
+        else:
+            self.verify_result.files_with_errors += 1
+
+    @staticmethod
+    def check_files(tasks: Iterable[FileTask], jobs: int,
+                    bytes_per_second: Optional[float]) -> Iterator[FileCheck]:
+        """
+        Generator returning the FileCheck for each of the given tasks, in the
+        same order, checking the files in "jobs" worker processes (see
+        "process_map"). The rate limit is divided equally between the
+        workers.
+        """
+        worker_bytes_per_second = bytes_per_second / jobs if bytes_per_second and jobs > 1 else bytes_per_second
+        yield from process_map(check_file, ((task, worker_bytes_per_second) for task in tasks), jobs)
+
+    @staticmethod
+    @contextmanager
+    def open_report(output: Optional[str]) -> Iterator[Any]:
+        if output is None:
+            yield csv.DictWriter(sys.stdout, fieldnames=Verify.REPORT_FIELDS)
+        else:
+            with open(output, mode='w') as file_stream:
+                yield csv.DictWriter(file_stream, fieldnames=Verify.REPORT_FIELDS)
+
+
+def check_file(task: FileTask, bytes_per_second: Optional[float] = None) -> FileCheck:
+    """
+    Process pool worker used by "Verify.check_files".
+
+    Checks the size of the file for the given task, and then (if the size
+    matches) computes the digests of the file for which a checksum is
+    stored, comparing them to the stored checksums.
+    """
+    def result(status: str, differences: Optional[List[Tuple[str, str, str]]] = None,
+               bytes_read: int = 0) -> FileCheck:
+        return FileCheck(task.relpath, task.path, status, differences or [], bytes_read)
+
+    if not task.checksums:
+        return result(Verify.SKIPPED)
+
+    # Only files under the root directory are verified
+    if not task.path.startswith(os.path.join(task.root, '')):
+        return result(Verify.ERROR, [('relpath', '', 'Path is outside the root directory')])
+
+    try:
+        size = os.stat(task.path).st_size
+    except FileNotFoundError:
+        return result(Verify.MISSING)
+    except OSError as err:
+        return result(Verify.ERROR, [('', '', str(err))])
+
+    # A file with a different size cannot match, so is not read
+    if task.bytes is not None and size != task.bytes:
+        return result(Verify.MISMATCH, [('bytes', str(task.bytes), str(size))])
+
+    rate_limiter = RateLimiter(bytes_per_second) if bytes_per_second else None
+    try:
+        digests = hash_file(task.path, list(task.checksums.keys()), rate_limiter)
+    except OSError as err:
+        return result(Verify.ERROR, [('', '', str(err))])
+
+    differences = [
+        (algorithm, expected, digests[algorithm])
+        for algorithm, expected in task.checksums.items() if digests[algorithm] != expected
+    ]
+    return result(Verify.MISMATCH if differences else Verify.OK, differences, size)
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, Integer, String, Index, ForeignKey, Table, BigInteger, MetaData
+from typing import Any
+from sqlalchemy import Column, Integer, String, Index, ForeignKey, Table, BigInteger, MetaData, DateTime
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import FunctionElement
 
 Base = declarative_base()
 
@@ -17,13 +20,53 @@ Base.metadata = MetaData(naming_convention={
         "pk": "pk_%(table_name)s"
     })
 
+
+class utcnow(FunctionElement):  # type: ignore
+    """
+    SQL expression for the current UTC date and time, without a time zone,
+    used as the value of the "created_at" and "updated_at" columns.
+    """
+    type = DateTime()
+
+
+@compiles(utcnow)  # type: ignore
+def default_utcnow(element: utcnow, compiler: Any, **kw: Any) -> str:
+    # SQLite "CURRENT_TIMESTAMP" is in UTC
+    return 'CURRENT_TIMESTAMP'
+
+
+@compiles(utcnow, 'postgresql')  # type: ignore
+def postgresql_utcnow(element: utcnow, compiler: Any, **kw: Any) -> str:
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+def created_at_column() -> Column:
+    """
+    Returns a "created_at" column, set by the database when a row is inserted.
+    """
+    return Column('created_at', DateTime, nullable=False, server_default=utcnow())
+
+
+def updated_at_column() -> Column:
+    """
+    Returns an "updated_at" column, set by the database when a row is
+    inserted, and by SQLAlchemy whenever the row is updated.
+    """
+    return Column('updated_at', DateTime, nullable=False, server_default=utcnow(), onupdate=utcnow())
+
+
 # Many-to-many relationship between accessions and locations
 accession_locations_table = Table('accession_locations', Base.metadata,
                                   Column('accession_id', Integer, ForeignKey('accessions.id', ondelete='CASCADE')),
-                                  Column('location_id', Integer, ForeignKey('locations.id')))
+                                  Column('location_id', Integer, ForeignKey('locations.id')),
+                                  created_at_column(),
+                                  updated_at_column())
 
 Index('accession_locations_accession_id', accession_locations_table.c.accession_id, unique=False)
 Index('accession_locations_location_id', accession_locations_table.c.location_id, unique=False)
+Index('accession_locations_accession_location',
+      accession_locations_table.c.accession_id, accession_locations_table.c.location_id, unique=True)
+Index('accession_locations_updated_at', accession_locations_table.c.updated_at, unique=False)
 
 
 class Batch(Base):  # type: ignore
@@ -57,6 +100,8 @@ class Accession(Base):  # type: ignore
     md5 = Column(String)
     sha1 = Column(String)
     sha256 = Column(String)
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
     batch = relationship("Batch", back_populates="accessions")
     locations = relationship(
@@ -70,6 +115,10 @@ Batch.accessions = relationship("Accession", order_by=Accession.id, back_populat
 
 Index('batch_name', Batch.name)
 Index('accession_batch_relpath', Accession.batch_id, Accession.relpath, unique=True)
+Index('accession_updated_at', Accession.updated_at, unique=False)
+Index('accession_md5', Accession.md5, unique=False)
+Index('accession_sha1', Accession.sha1, unique=False)
+Index('accession_sha256', Accession.sha256, unique=False)
 
 
 class StorageProvider(Base):  # type: ignore
@@ -98,6 +147,8 @@ class Location(Base):  # type: ignore
     storage_location = Column(String)
     accessions = relationship("Accession", secondary=accession_locations_table, back_populates="locations")
     storage_provider_id = Column(Integer, ForeignKey('storage_providers.id'))
+    created_at = created_at_column()
+    updated_at = updated_at_column()
 
     def __repr__(self) -> str:
         return f"<Location(id='{self.id}', storage_provider='{self.storage_provider.name}', " \
@@ -105,3 +156,90 @@ class Location(Base):  # type: ignore
 
 
 Index('location_storage', Location.storage_provider_id, Location.storage_location, unique=True)
+Index('location_updated_at', Location.updated_at, unique=False)
+Index('location_storage_location', Location.storage_location, unique=False)
+
+
+class LoadFingerprint(Base):  # type: ignore
+    """
+    Class representing the fingerprint (a SHA-256 digest of the normalized
+    CSV rows) of the rows of a batch in an inventory file, as of the last
+    time the file was loaded.
+    """
+
+    __tablename__ = "load_fingerprints"
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    sha256 = Column(String, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<LoadFingerprint(id='{self.id}', scope='{self.scope}', name='{self.name}', " \
+               f"sha256='{self.sha256}'>"
+
+
+Index('load_fingerprint_scope_name', LoadFingerprint.scope, LoadFingerprint.name, unique=True)
+
+
+class ExportWatermark(Base):  # type: ignore
+    """
+    Class representing the (UTC) time of the last "export --since last",
+    used as the starting point of the next incremental export.
+    """
+
+    __tablename__ = "export_watermarks"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    exported_at = Column(DateTime, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ExportWatermark(id='{self.id}', name='{self.name}', exported_at='{self.exported_at}'>"
+
+
+Index('export_watermark_name', ExportWatermark.name, unique=True)
+
+
+class SyncState(Base):  # type: ignore
+    """
+    Class representing the progress of the incremental syncs from a storage
+    provider: the (UTC) creation and update times of the last object synced,
+    and the provider's identifier for that object (the cursor), used as the
+    starting point of the next "sync --incremental".
+    """
+
+    __tablename__ = "sync_state"
+
+    id = Column(Integer, primary_key=True)
+    provider = Column(String, nullable=False)
+    last_created_at = Column(DateTime, nullable=True)
+    last_updated_at = Column(DateTime, nullable=True)
+    cursor = Column(String, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<SyncState(id='{self.id}', provider='{self.provider}', last_created_at='{self.last_created_at}', " \
+               f"last_updated_at='{self.last_updated_at}', cursor='{self.cursor}'>"
+
+
+Index('sync_state_provider', SyncState.provider, unique=True)
+
+
+class AptrustObject(Base):  # type: ignore
+    """
+    Class representing the batch matched to an APTrust (intellectual) object,
+    so that the object is matched without parsing its bag name when it is
+    synced again.
+    """
+
+    __tablename__ = "aptrust_objects"
+
+    id = Column(Integer, primary_key=True)
+    object_id = Column(Integer, nullable=False)
+    batch_id = Column(Integer, ForeignKey('batches.id', ondelete='CASCADE'), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<AptrustObject(id='{self.id}', object_id='{self.object_id}', batch_id='{self.batch_id}'>"
+
+
+Index('aptrust_object_object_id', AptrustObject.object_id, unique=True)
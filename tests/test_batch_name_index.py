@@ -0,0 +1,30 @@
+from patsy.core.batch_name_index import BatchNameIndex, normalize_name
+
+
+class TestBatchNameIndex:
+    def test_normalize_name(self):
+        assert normalize_name('Archive149') == 'archive149'
+        assert normalize_name('archive0149') == 'archive149'
+        assert normalize_name('ARCHIVE-0149') == 'archive149'
+        assert normalize_name('pcb_10_0') == 'pcb100'
+        assert normalize_name('PCA 007a') == 'pca7a'
+
+    def test_candidates__same_normalized_name(self):
+        index = BatchNameIndex(['Archive149', 'Archive150', 'PCA7'])
+        assert index.candidates('archive-0149') == ['Archive149']
+        assert index.candidates('pca_007') == ['PCA7']
+
+    def test_candidates__close_names_with_same_number(self):
+        index = BatchNameIndex(['Archive149', 'Archive148', 'Archive1490'])
+        assert index.candidates('Archiv149') == ['Archive149']
+        assert index.candidates('Archive149b') == ['Archive149']
+
+    def test_candidates__names_with_other_numbers_are_not_candidates(self):
+        index = BatchNameIndex(['Archive149', 'Archive148'])
+        assert index.candidates('Archive147') == []
+        assert index.candidates('unrelated') == []
+
+    def test_candidates__limit(self):
+        index = BatchNameIndex(['PCB_12', 'pcb12', 'PCB-12', 'pcb0012'])
+        assert index.candidates('PCB12') == ['PCB_12', 'pcb12', 'PCB-12']
+        assert index.candidates('PCB12', limit=1) == ['PCB_12']
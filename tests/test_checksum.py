@@ -1,7 +1,10 @@
+import gzip
 import tempfile
 import os
 
 from patsy.commands.checksum import Command, get_checksum
+from patsy.core.db_gateway import DbGateway
+from patsy.core.file_utils import open_text_argument
 from patsy.core.load import Load
 from argparse import Namespace
 from tests import clear_database
@@ -61,6 +64,46 @@ class TestChecksumCommand:
         finally:
             tearDown(self)
 
+    def test_locations_file_arg__gzip_compressed(self, capsys, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            locations_file = tmpdir.join('locations_file.csv.gz')
+            with open('tests/fixtures/checksum/locations_file.csv', 'rb') as f:
+                locations_file.write_binary(gzip.compress(f.read()))
+
+            with open_text_argument(str(locations_file)) as f:
+                self.command_args.locations_file = f
+                self.checksum_command.__call__(self.command_args, self.gateway)
+                expected = '85a929103d2f58ddfa8c8768eb6339ad  test_bucket/TEST_BATCH/colors/sample_blue.jpg\n' \
+                           '1041fd1cf84c71183db2d5d95942a41c  test_bucket/TEST_BATCH/colors/sample_red.jpg\n'
+                assert capsys.readouterr().out == expected
+        finally:
+            tearDown(self)
+
+    def test_locations_file_arg__chunked_lookup_keeps_order(self, capsys, caplog, db_gateway, monkeypatch, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            monkeypatch.setattr(DbGateway, 'IN_CLAUSE_SIZE', 2)
+            locations_file = tmpdir.join('locations_file.csv')
+            locations_file.write(
+                'location,destination\n'
+                'test_bucket/TEST_BATCH/colors/sample_red.jpg,red\n'
+                'not_a_location_in_database,missing\n'
+                'test_bucket/TEST_BATCH/colors/sample_blue.jpg,blue\n'
+                'test_bucket/TEST_BATCH/colors/sample_red.jpg,red_again\n'
+            )
+
+            with open(locations_file) as f:
+                self.command_args.locations_file = f
+                self.checksum_command.__call__(self.command_args, self.gateway)
+            expected = '1041fd1cf84c71183db2d5d95942a41c  red\n' \
+                       '85a929103d2f58ddfa8c8768eb6339ad  blue\n' \
+                       '1041fd1cf84c71183db2d5d95942a41c  red_again\n'
+            assert capsys.readouterr().out == expected
+            assert 'No accession record found for "not_a_location_in_database"' in caplog.text
+        finally:
+            tearDown(self)
+
     def test_output_file_arg(self, db_gateway):
         try:
             setUp(self, db_gateway)
@@ -1,9 +1,12 @@
 import csv
+import pytest
 
 from argparse import Namespace
 from patsy.commands.load import Command as LoadCommand
+from patsy.core.db_gateway import DbGateway
 from patsy.core.patsy_record import PatsyRecord, PatsyUtils
-from patsy.model import StorageProvider
+from patsy.model import Accession, Location, StorageProvider, accession_locations_table
+from sqlalchemy.exc import IntegrityError
 from tests import clear_database
 
 
@@ -18,7 +21,7 @@ def setUp(obj, gateway):
     ]
 
     for file in test_db_files:
-        args.file = file
+        args.files = [file]
         LoadCommand.__call__(obj, args, obj.gateway)
 
 
@@ -27,6 +30,23 @@ def tearDown(obj):
 
 
 class TestDbGateway:
+    def test_get_accessions_by_locations(self, db_gateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            monkeypatch.setattr(DbGateway, 'IN_CLAUSE_SIZE', 1)
+            locations = [
+                'test_bucket/TEST_BATCH/colors/sample_blue.jpg',
+                'not_a_location',
+                'test_bucket/TEST_BATCH/colors/sample_red.jpg'
+            ]
+            accessions = self.gateway.get_accessions_by_locations(locations)
+            assert {location: accession.relpath for location, accession in accessions.items()} == {
+                'test_bucket/TEST_BATCH/colors/sample_blue.jpg': 'colors/sample_blue.jpg',
+                'test_bucket/TEST_BATCH/colors/sample_red.jpg': 'colors/sample_red.jpg'
+            }
+        finally:
+            tearDown(self)
+
     def test_get_all_batches(self, db_gateway):
         try:
             setUp(self, db_gateway)
@@ -63,6 +83,20 @@ class TestDbGateway:
         finally:
             tearDown(self)
 
+    def test_iter_batch_records__fetches_rows_in_chunks(self, db_gateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            expected_patsy_records = self.gateway.get_batch_records("TEST_COLORS")
+            assert len(expected_patsy_records) > 2
+
+            monkeypatch.setattr(DbGateway, 'FETCH_SIZE', 2)
+            patsy_records = self.gateway.iter_batch_records("TEST_COLORS")
+            assert not isinstance(patsy_records, list)
+            assert list(patsy_records) == expected_patsy_records
+            assert list(self.gateway.iter_batch_records("")) == []
+        finally:
+            tearDown(self)
+
     def test_get_batch_records__batch_exists(self, db_gateway):
         try:
             setUp(self, db_gateway)
@@ -185,3 +219,46 @@ class TestDbGateway:
             assert location.storage_provider.name == 'TEST_STORAGE_PROVIDER'
         finally:
             tearDown(self)
+
+    def test_add_accession_locations__skips_existing_links(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            links = self.gateway.session.query(accession_locations_table).all()
+            link_count = len(links)
+            assert link_count > 0
+
+            accession = self.gateway.session.query(Accession).first()
+            location = self.gateway.session.query(Location).filter(Location.id != links[0].location_id).first()
+            new_links = {(link.accession_id, link.location_id) for link in links}
+            new_links.add((accession.id, location.id))
+
+            self.gateway.add_accession_locations(new_links)
+            assert self.gateway.session.query(accession_locations_table).count() == link_count + 1
+        finally:
+            tearDown(self)
+
+    def test_add__reloading_does_not_duplicate_links(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            link_count = self.gateway.session.query(accession_locations_table).count()
+
+            args = Namespace()
+            args.files = ["tests/fixtures/db_gateway/colors_inventory.csv"]
+            LoadCommand.__call__(self, args, self.gateway)
+
+            assert self.gateway.session.query(accession_locations_table).count() == link_count
+        finally:
+            tearDown(self)
+
+    def test_accession_locations__duplicate_links_are_rejected(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            link = self.gateway.session.query(accession_locations_table).first()
+            with pytest.raises(IntegrityError):
+                self.gateway.session.execute(
+                    accession_locations_table.insert(),
+                    {'accession_id': link.accession_id, 'location_id': link.location_id}
+                )
+            self.gateway.session.rollback()
+        finally:
+            tearDown(self)
@@ -1,6 +1,14 @@
+import argparse
+import csv
+import pytest
+import time
+
 from argparse import Namespace
+from datetime import datetime
 from patsy.commands.load import Load
-from patsy.commands.export import Command as ExportCommand
+from patsy.commands.export import Command as ExportCommand, configure_cli, since_argument
+from patsy.core.export import Export
+from patsy.model import Accession, Batch, Location, accession_locations_table
 from tests import clear_database
 
 
@@ -30,6 +38,21 @@ def tearDown(obj):
     clear_database(obj)
 
 
+def set_all_updated_at(gateway, updated_at):
+    """
+    Sets the "updated_at" timestamp of all accessions, locations and
+    accession/location links.
+    """
+    for table in [Accession.__table__, Location.__table__, accession_locations_table]:
+        gateway.session.execute(table.update().values(updated_at=updated_at))
+    gateway.session.commit()
+
+
+def exported_batches(export_file):
+    with open(export_file) as f:
+        return sorted({row['BATCH'] for row in csv.DictReader(f)})
+
+
 class TestExport:
     def test_export_aws_archiver(self, db_gateway, tmpdir):
         # Load file into database
@@ -97,3 +120,199 @@ class TestExport:
             assert len(load_result.errors) == 0
         finally:
             tearDown(self)
+
+    def test_export_all_batches_uses_single_ordered_query(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            # Load the batches out of name order
+            self.load.process_file('tests/fixtures/db_gateway/solar_system_inventory.csv')
+            self.load.process_file('tests/fixtures/db_gateway/colors_inventory.csv')
+            self.gateway.session.commit()
+
+            export_file = tmpdir.join("all-export.csv")
+            export_result = Export(self.gateway).export(None, str(export_file))
+            assert export_result.batches_exported == 2
+
+            with open(export_file) as f:
+                rows = list(csv.DictReader(f))
+            assert export_result.rows_exported == len(rows)
+            assert [(row['BATCH'], row['RELPATH']) for row in rows] == \
+                sorted((row['BATCH'], row['RELPATH']) for row in rows)
+
+            # The same rows as exporting each batch separately
+            batch_rows = []
+            for batch in ['TEST_COLORS', 'TEST_SOLAR_SYSTEM']:
+                batch_file = tmpdir.join(f"{batch}-export.csv")
+                Export(self.gateway).export(batch, str(batch_file))
+                with open(batch_file) as f:
+                    batch_rows.extend(csv.DictReader(f))
+            assert sorted(map(str, rows)) == sorted(map(str, batch_rows))
+        finally:
+            tearDown(self)
+
+    def test_export_shards(self, shared_db_gateway, tmpdir):
+        try:
+            setUp(self, shared_db_gateway)
+            self.load.process_file('tests/fixtures/db_gateway/solar_system_inventory.csv')
+            self.load.process_file('tests/fixtures/db_gateway/colors_inventory.csv')
+            self.gateway.session.commit()
+
+            single_file = tmpdir.join("all-export.csv")
+            single_result = Export(self.gateway).export(None, str(single_file))
+
+            output_dir = tmpdir.join("shards")
+            self.args.batch = None
+            self.args.output = None
+            self.args.output_dir = str(output_dir)
+            self.args.jobs = 2
+            ExportCommand.__call__(self, self.args, self.gateway)
+
+            with open(output_dir.join(Export.MANIFEST_FILE)) as f:
+                manifest = list(csv.DictReader(f))
+            assert [shard['file'] for shard in manifest] == ['shard-0000.csv', 'shard-0001.csv']
+            assert [shard['batches'] for shard in manifest] == ['1', '1']
+            assert sum(int(shard['rows']) for shard in manifest) == single_result.rows_exported
+
+            # Concatenating the shards in order gives the single file export
+            shard_rows = []
+            for shard in manifest:
+                with open(output_dir.join(shard['file'])) as f:
+                    shard_rows.extend(csv.DictReader(f))
+            with open(single_file) as f:
+                assert shard_rows == list(csv.DictReader(f))
+        finally:
+            tearDown(self)
+
+    def test_export_jobs_requires_output_dir(self, db_gateway, tmpdir, caplog):
+        try:
+            setUp(self, db_gateway)
+            export_file = tmpdir.join("export.csv")
+            self.args.batch = None
+            self.args.output = str(export_file)
+            self.args.jobs = 4
+            ExportCommand.__call__(self, self.args, self.gateway)
+
+            assert '"--jobs" can only be used with "--output-dir"' in caplog.text
+            assert not export_file.exists()
+        finally:
+            tearDown(self)
+
+    def test_export_jobs_must_be_positive(self, capsys):
+        parser = argparse.ArgumentParser(prog='patsy')
+        subparsers = parser.add_subparsers(title='commands')
+        configure_cli(subparsers)
+
+        args = parser.parse_args(['export', '--output-dir', 'EXPORT', '--jobs', '2'])
+        assert args.jobs == 2
+        with pytest.raises(SystemExit):
+            parser.parse_args(['export', '--output-dir', 'EXPORT', '--jobs', '-1'])
+        assert "must be at least 1: '-1'" in capsys.readouterr().err
+
+    def test_shard_batch_ranges(self):
+        batch_row_counts = [('a', 10), ('b', 1), ('c', 1), ('d', 8), ('e', 10)]
+        assert Export.shard_batch_ranges(batch_row_counts, 1) == [(None, None)]
+        assert Export.shard_batch_ranges(batch_row_counts, 2) == [(None, 'e'), ('e', None)]
+        assert Export.shard_batch_ranges(batch_row_counts, 3) == [(None, 'b'), ('b', 'e'), ('e', None)]
+        assert Export.shard_batch_ranges([('a', 10)], 4) == [(None, None)]
+        assert Export.shard_batch_ranges([], 4) == [(None, None)]
+
+    def test_export_since(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            self.load.process_file('tests/fixtures/db_gateway/colors_inventory.csv')
+            self.gateway.session.commit()
+            set_all_updated_at(self.gateway, datetime(2000, 1, 1))
+            self.load.process_file('tests/fixtures/db_gateway/solar_system_inventory.csv')
+            self.gateway.session.commit()
+
+            export_file = tmpdir.join("since-export.csv")
+            result = Export(self.gateway).export(None, str(export_file), since=datetime(2020, 1, 1))
+            assert result.batches_exported == 1
+            assert exported_batches(export_file) == ['TEST_SOLAR_SYSTEM']
+
+            # Linking an existing accession to a new location makes its row
+            # changed
+            set_all_updated_at(self.gateway, datetime(2000, 1, 1))
+            accession = self.gateway.session.query(Accession).filter(Accession.relpath == 'colors/sample_red.jpg').one()
+            storage_provider = accession.locations[0].storage_provider
+            accession.locations.append(Location(storage_provider=storage_provider, storage_location='new/red.txt'))
+            self.gateway.session.commit()
+
+            result = Export(self.gateway).export('TEST_COLORS', str(export_file), since=datetime(2020, 1, 1))
+            assert result.rows_exported == 1
+            with open(export_file) as f:
+                assert [row['STORAGELOCATION'] for row in csv.DictReader(f)] == ['new/red.txt']
+        finally:
+            tearDown(self)
+
+    def test_export_since_last(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            self.load.process_file('tests/fixtures/db_gateway/colors_inventory.csv')
+            self.gateway.session.commit()
+
+            # The first export, without a watermark, exports all rows
+            export_file = tmpdir.join("since-last-export.csv")
+            result = Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+            assert exported_batches(export_file) == ['TEST_COLORS']
+            assert self.gateway.get_export_watermark(Export.WATERMARK_NAME) is not None
+            self.gateway.session.commit()
+
+            # Rows changed before the watermark are not exported again
+            set_all_updated_at(self.gateway, datetime(2000, 1, 1))
+            self.load.process_file('tests/fixtures/db_gateway/solar_system_inventory.csv')
+            self.gateway.session.commit()
+
+            result = Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+            assert exported_batches(export_file) == ['TEST_SOLAR_SYSTEM']
+            self.gateway.session.commit()
+
+            set_all_updated_at(self.gateway, datetime(2000, 1, 1))
+            result = Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+            assert result.rows_exported == 0
+        finally:
+            tearDown(self)
+
+    def test_export_since_last_includes_rows_committed_after_export(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            if self.gateway.dialect_name() != 'postgresql':
+                pytest.skip('Requires PostgreSQL')
+
+            self.load.process_file('tests/fixtures/db_gateway/colors_inventory.csv')
+            self.gateway.session.commit()
+            export_file = tmpdir.join("since-last-export.csv")
+            Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+            self.gateway.session.commit()
+            set_all_updated_at(self.gateway, datetime(2000, 1, 1))
+
+            # A load transaction that starts before the next export, and
+            # commits after it
+            with self.gateway.session.get_bind().connect() as connection:
+                transaction = connection.begin()
+                batch_id = connection.execute(
+                    Batch.__table__.insert().values(name='TEST_LATE')
+                ).inserted_primary_key[0]
+                connection.execute(Accession.__table__.insert().values(
+                    batch_id=batch_id, relpath='late.txt', filename='late.txt', bytes=1, md5='md5'
+                ))
+                time.sleep(1.1)
+
+                result = Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+                assert result.rows_exported == 0
+                self.gateway.session.commit()
+                transaction.commit()
+
+            # The watermark is the start of the load transaction, so its rows
+            # are exported by the next export
+            Export(self.gateway).export(None, str(export_file), since=Export.SINCE_LAST)
+            assert exported_batches(export_file) == ['TEST_LATE']
+        finally:
+            tearDown(self)
+
+    def test_since_argument(self):
+        assert since_argument('last') == Export.SINCE_LAST
+        assert since_argument('2026-10-18T09:30:00') == datetime(2026, 10, 18, 9, 30)
+        assert since_argument('2026-10-18T09:30:00-04:00') == datetime(2026, 10, 18, 13, 30)
+        with pytest.raises(argparse.ArgumentTypeError):
+            since_argument('yesterday')
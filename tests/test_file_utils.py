@@ -0,0 +1,47 @@
+import argparse
+import bz2
+import gzip
+import lzma
+import pytest
+import sys
+
+from patsy.core.file_utils import open_text, open_text_argument
+
+CSV_TEXT = 'location,destination\nbucket/file.txt,/tmp/file.txt\n'
+
+
+class TestOpenText:
+    def test_open_text__uncompressed_file(self, tmpdir):
+        file = tmpdir.join('file.csv')
+        file.write(CSV_TEXT)
+        with open_text(str(file)) as f:
+            assert f.read() == CSV_TEXT
+
+    @pytest.mark.parametrize('extension,compress', [
+        ('.gz', gzip.compress), ('.bz2', bz2.compress), ('.xz', lzma.compress)
+    ])
+    def test_open_text__compressed_file(self, tmpdir, extension, compress):
+        file = tmpdir.join(f'file.csv{extension}')
+        file.write_binary(compress(CSV_TEXT.encode('utf-8')))
+        with open_text(str(file)) as f:
+            assert f.read() == CSV_TEXT
+
+    def test_open_text__zstd_compressed_file(self, tmpdir):
+        zstandard = pytest.importorskip('zstandard')
+        file = tmpdir.join('file.csv.zst')
+        file.write_binary(zstandard.ZstdCompressor().compress(CSV_TEXT.encode('utf-8')))
+        with open_text(str(file)) as f:
+            assert f.read() == CSV_TEXT
+
+    def test_open_text__stdin(self, tmpdir, monkeypatch):
+        file = tmpdir.join('file.csv')
+        file.write(CSV_TEXT)
+        with open(str(file)) as stdin:
+            monkeypatch.setattr(sys, 'stdin', stdin)
+            with open_text('-') as f:
+                assert f.read() == CSV_TEXT
+            assert not stdin.closed
+
+    def test_open_text_argument__missing_file(self):
+        with pytest.raises(argparse.ArgumentTypeError):
+            open_text_argument('file_does_not_exist.csv.gz')
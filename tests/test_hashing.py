@@ -0,0 +1,35 @@
+import hashlib
+
+from patsy.core import hashing
+from patsy.core.hashing import RateLimiter, hash_file
+
+
+class TestHashFile:
+    def test_computes_all_digests_in_one_pass(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(hashing, 'READ_BUFFER_SIZE', 7)
+        content = b'The quick brown fox jumps over the lazy dog'
+        file = tmpdir.join('file.txt')
+        file.write_binary(content)
+
+        assert hash_file(str(file)) == {
+            'md5': hashlib.md5(content).hexdigest(),
+            'sha1': hashlib.sha1(content).hexdigest(),
+            'sha256': hashlib.sha256(content).hexdigest()
+        }
+        assert hash_file(str(file), ['sha1']) == {'sha1': hashlib.sha1(content).hexdigest()}
+
+
+class TestRateLimiter:
+    def test_throttle_sleeps_when_ahead_of_rate(self, monkeypatch):
+        now = [100.0]
+        sleeps = []
+        monkeypatch.setattr(hashing.time, 'monotonic', lambda: now[0])
+        monkeypatch.setattr(hashing.time, 'sleep', lambda seconds: sleeps.append(seconds))
+
+        rate_limiter = RateLimiter(1000)
+        now[0] += 1.0
+        rate_limiter.throttle(500)
+        assert sleeps == []
+
+        rate_limiter.throttle(2500)
+        assert sleeps == [2.0]
@@ -0,0 +1,111 @@
+import csv
+import hashlib
+import pytest
+
+from argparse import Namespace
+from patsy.commands.inventory import Command as InventoryCommand
+from patsy.core.inventory import Inventory
+from patsy.core.load import Load
+from patsy.model import Accession
+from tests import clear_database
+
+FILES = {
+    'a/one.txt': b'one',
+    'a/b/two.JPG': b'two',
+    'c/three': b'three',
+    'four.tif': b'four'
+}
+
+RELPATHS = sorted(FILES)
+
+
+def setUp(obj, gateway, tmpdir):
+    obj.gateway = gateway
+    obj.root = tmpdir.mkdir('root')
+    for relpath, content in FILES.items():
+        obj.root.join(relpath).write_binary(content, ensure=True)
+
+    obj.inventory_file = tmpdir.join('inventory.csv')
+
+
+def tearDown(obj):
+    clear_database(obj)
+
+
+def inventory_rows(obj):
+    with open(obj.inventory_file, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+class TestInventory:
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_inventory(self, db_gateway, tmpdir, jobs):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            result = Inventory().inventory('TEST_INVENTORY', str(self.root), str(self.inventory_file), jobs=jobs)
+
+            assert result.files_inventoried == 4
+            assert result.bytes_read == sum(len(content) for content in FILES.values())
+            assert result.errors == []
+
+            rows = inventory_rows(self)
+            assert [row['RELPATH'] for row in rows] == ['a/b/two.JPG', 'a/one.txt', 'c/three', 'four.tif']
+            two = rows[0]
+            assert two['BATCH'] == 'TEST_INVENTORY'
+            assert two['FILENAME'] == 'two.JPG'
+            assert two['EXTENSION'] == 'JPG'
+            assert two['BYTES'] == '3'
+            assert two['MD5'] == hashlib.md5(b'two').hexdigest()
+            assert two['SHA1'] == hashlib.sha1(b'two').hexdigest()
+            assert two['SHA256'] == hashlib.sha256(b'two').hexdigest()
+            assert rows[2]['EXTENSION'] == ''
+
+            # The inventory is accepted by "load" as-is
+            load_result = Load(self.gateway).process_file(str(self.inventory_file))
+            assert load_result.errors == []
+            assert load_result.accessions_added == 4
+        finally:
+            tearDown(self)
+
+    def test_inventory_resume(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            Inventory().inventory('TEST_INVENTORY', str(self.root), str(self.inventory_file))
+
+            # Simulate an interrupted run, which wrote two rows and part of a
+            # third
+            with open(self.inventory_file, newline='') as f:
+                lines = f.readlines()
+            with open(self.inventory_file, mode='w', newline='') as f:
+                f.writelines(lines[:3])
+                f.write(lines[3][:10])
+
+            result = Inventory().inventory('TEST_INVENTORY', str(self.root), str(self.inventory_file), resume=True)
+            assert result.files_resumed == 2
+            assert result.files_inventoried == 2
+            relpaths = [row['RELPATH'] for row in inventory_rows(self)]
+            assert relpaths == ['a/b/two.JPG', 'a/one.txt', 'c/three', 'four.tif']
+        finally:
+            tearDown(self)
+
+    def test_inventory_command_with_load(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            args = Namespace(batch='TEST_INVENTORY', directory=str(self.root), output=str(self.inventory_file),
+                             jobs=1, resume=False, load=True, chunk_size=2)
+            InventoryCommand()(args, self.gateway)
+
+            relpaths = [accession.relpath for accession in self.gateway.session.query(Accession)]
+            assert sorted(relpaths) == RELPATHS
+            assert len(inventory_rows(self)) == 4
+        finally:
+            tearDown(self)
+
+    def test_inventory_command_resume_requires_output(self, db_gateway, tmpdir, caplog):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            args = Namespace(batch='TEST_INVENTORY', directory=str(self.root), output=None, resume=True)
+            InventoryCommand()(args, self.gateway)
+            assert '"--resume" requires an "--output" file' in caplog.text
+        finally:
+            tearDown(self)
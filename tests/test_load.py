@@ -1,6 +1,16 @@
-from patsy.core.load import Load
+import gzip
+import pytest
+import sys
+
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager
+from patsy.commands.load import Command as LoadCommand, configure_cli
+from patsy.core.load import Load, parse_file
+from patsy.model import Accession, Location, accession_locations_table
+from queue import Queue
+from sqlalchemy import event
 from tests import clear_database
-from typing import Dict
+from typing import Any, Dict
 
 
 def setUp(obj, gateway):
@@ -28,6 +38,68 @@ def tearDown(obj):
     clear_database(obj)
 
 
+@contextmanager
+def count_statements(gateway):
+    """Yields the list of SQL statements executed in the "with" block."""
+    statements = []
+    engine = gateway.session.get_bind()
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+
+class TestLoadArgs():
+    def test_bulk_and_copy_are_mutually_exclusive(self, capsys):
+        parser = ArgumentParser(prog='patsy')
+        subparsers = parser.add_subparsers(title='commands')
+        configure_cli(subparsers)
+
+        args = parser.parse_args(['load', '--copy', 'FILE.CSV'])
+        assert args.copy is True
+        assert args.bulk is False
+
+        with pytest.raises(SystemExit):
+            parser.parse_args(['load', '--bulk', '--copy', 'FILE.CSV'])
+        assert 'not allowed with argument' in capsys.readouterr().err
+
+    def test_cache_size_must_be_positive(self, capsys):
+        parser = ArgumentParser(prog='patsy')
+        subparsers = parser.add_subparsers(title='commands')
+        configure_cli(subparsers)
+
+        assert parser.parse_args(['load', '--cache-size', '1', 'FILE.CSV']).cache_size == 1
+        with pytest.raises(SystemExit):
+            parser.parse_args(['load', '--cache-size', '0', 'FILE.CSV'])
+        assert "must be at least 1: '0'" in capsys.readouterr().err
+
+    def test_chunk_size_must_be_positive(self, capsys):
+        parser = ArgumentParser(prog='patsy')
+        subparsers = parser.add_subparsers(title='commands')
+        configure_cli(subparsers)
+
+        with pytest.raises(SystemExit):
+            parser.parse_args(['load', '--bulk', '--chunk-size', '0', 'FILE.CSV'])
+        assert "must be at least 1: '0'" in capsys.readouterr().err
+
+        with pytest.raises(ValueError):
+            list(Load.chunked(iter([]), 0))
+
+    def test_jobs_must_be_positive(self, capsys):
+        parser = ArgumentParser(prog='patsy')
+        subparsers = parser.add_subparsers(title='commands')
+        configure_cli(subparsers)
+
+        with pytest.raises(SystemExit):
+            parser.parse_args(['load', '--jobs', '0', 'FILE.CSV'])
+        assert "must be at least 1: '0'" in capsys.readouterr().err
+
+
 class TestLoad():
     def test_process_csv_file(self, db_gateway):
         try:
@@ -193,6 +265,396 @@ class TestLoad():
         finally:
             tearDown(self)
 
+    def test_load__with_commit_every(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, commit_every=2)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 3
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 0
+
+            # All rows should have been committed
+            self.gateway.session.rollback()
+            assert self.gateway.session.query(Accession).count() == 3
+            assert self.gateway.session.query(accession_locations_table).count() == 3
+        finally:
+            tearDown(self)
+
+    def test_load__with_commit_every_keeps_committed_rows_after_failure(self, db_gateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            add = self.gateway.add
+
+            def add_then_fail(patsy_record):
+                if patsy_record.relpath == 'colors/sample_green.jpg':
+                    raise RuntimeError('Simulated failure')
+                return add(patsy_record)
+
+            monkeypatch.setattr(self.gateway, 'add', add_then_fail)
+
+            self.load = Load(self.gateway, commit_every=2)
+            with pytest.raises(RuntimeError):
+                self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+
+            # The first chunk of two rows should have been committed
+            self.gateway.session.rollback()
+            assert self.gateway.session.query(Accession).count() == 2
+        finally:
+            tearDown(self)
+
+    def test_load__multiple_files(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            files = Load.expand_files(['tests/fixtures/load/colors_inventory-*.csv',
+                                       'tests/fixtures/load/invalid_inventory.csv'])
+            assert files == [
+                'tests/fixtures/load/colors_inventory-aws-archiver.csv',
+                'tests/fixtures/load/colors_inventory-preserve.csv',
+                'tests/fixtures/load/invalid_inventory.csv'
+            ]
+
+            load_result = self.load.process_files(files)
+            assert load_result.rows_processed == 9
+            assert load_result.batches_added == 2
+            assert load_result.accessions_added == 5
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 5
+            assert len(load_result.errors) == 1
+            assert load_result.errors[0].startswith('tests/fixtures/load/invalid_inventory.csv: Line 3')
+            assert self.load.file_results['tests/fixtures/load/colors_inventory-preserve.csv'].rows_processed == 3
+        finally:
+            tearDown(self)
+
+    def test_load__unmatched_pattern_is_an_error(self, db_gateway, caplog):
+        try:
+            setUp(self, db_gateway)
+            unmatched_patterns = []
+            files = Load.expand_files(['tests/fixtures/load/missing*.csv',
+                                       'tests/fixtures/load/colors_inventory-preserve.csv'], unmatched_patterns)
+            assert files == ['tests/fixtures/load/colors_inventory-preserve.csv']
+            assert unmatched_patterns == ['tests/fixtures/load/missing*.csv']
+
+            args = Namespace(files=['tests/fixtures/load/missing*.csv'])
+            LoadCommand()(args, self.gateway)
+            assert 'No files match "tests/fixtures/load/missing*.csv"' in caplog.text
+            assert 'LOAD COMPLETE WITH ERRORS' in caplog.text
+            assert 'LOAD SUCCESSFUL' not in caplog.text
+        finally:
+            tearDown(self)
+
+    def test_load__multiple_files_in_parallel(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            files = [
+                'tests/fixtures/load/colors_inventory-aws-archiver.csv',
+                'tests/fixtures/load/invalid_inventory.csv',
+                'tests/fixtures/load/multiple_accessions_one_location.csv',
+                'tests/fixtures/load/unknown_extra_field_inventory.csv'
+            ]
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_files(files, jobs=2)
+            assert load_result.rows_processed == 8
+            assert load_result.batches_added == 3
+            assert load_result.accessions_added == 6
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 5
+            assert len(load_result.errors) == 2
+
+            file_result = self.load.file_results['tests/fixtures/load/colors_inventory-aws-archiver.csv']
+            assert file_result.rows_processed == 3
+            assert file_result.accessions_added == 3
+            assert len(file_result.errors) == 0
+        finally:
+            tearDown(self)
+
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_load__unreadable_file_is_an_error(self, db_gateway, caplog, jobs):
+        try:
+            setUp(self, db_gateway)
+            files = [
+                'tests/fixtures/load/colors_inventory-aws-archiver.csv',
+                'tests/fixtures/load/colors_inventory-preserve.csv',
+                'tests/fixtures/load/nonexistent.csv'
+            ]
+            load_result = self.load.process_files(files, jobs=jobs)
+            assert load_result.rows_processed == 6
+            assert load_result.accessions_added == 3
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 1
+            assert load_result.errors[0].startswith('tests/fixtures/load/nonexistent.csv: Cannot read file:')
+            assert len(self.load.file_results['tests/fixtures/load/colors_inventory-preserve.csv'].errors) == 0
+
+            args = Namespace(files=files, jobs=jobs)
+            LoadCommand()(args, self.gateway)
+            assert 'Cannot read file' in caplog.text
+            assert 'LOAD COMPLETE WITH ERRORS' in caplog.text
+        finally:
+            tearDown(self)
+
+    def test_load__multiple_files_in_parallel_stops_parsers_after_write_error(self, db_gateway, tmpdir, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            header = ','.join(Load.REQUIRED_CSV_FIELDS)
+            files = []
+            for i in range(4):
+                inventory = tmpdir.join(f'inventory_{i}.csv')
+                rows = [f'batch_{i},file_{j},file_{j},{j},md5_{i}_{j},,,,,' for j in range(2000)]
+                inventory.write('\n'.join([header] + rows) + '\n')
+                files.append(str(inventory))
+
+            self.load = Load(self.gateway, bulk=True, chunk_size=100)
+
+            def fail(patsy_records, load_result):
+                raise RuntimeError('Simulated failure')
+
+            monkeypatch.setattr(self.load, 'add_records', fail)
+
+            # The parsers, blocked on the full queue, are stopped, rather
+            # than the load waiting for them forever
+            with pytest.raises(RuntimeError):
+                self.load.process_files(files, jobs=2)
+        finally:
+            tearDown(self)
+
+    def test_load__reload_with_prefetch_uses_lookup_caches(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 3
+
+            self.gateway.configure_lookup_caches(cache_size=100, prefetch=True)
+            self.load = Load(self.gateway)
+            with count_statements(self.gateway) as statements:
+                load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 0
+            assert load_result.locations_added == 0
+
+            # The batch query, the storage provider, accession and location
+            # prefetch queries, and the (ignored) link insert. Every row
+            # is answered by the prefetched caches, without any queries.
+            assert len(statements) == 5
+        finally:
+            tearDown(self)
+
+    def test_load__reload_with_prefetch_and_empty_caches(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 3
+
+            # Nothing can be cached, so the existing accessions are looked up
+            self.gateway.configure_lookup_caches(cache_size=0, prefetch=True)
+            self.load = Load(self.gateway)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 0
+            assert load_result.locations_added == 0
+        finally:
+            tearDown(self)
+
+    def test_load__with_prefetch_adds_new_accessions(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.gateway.configure_lookup_caches(cache_size=100, prefetch=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-preserve.csv')
+            assert load_result.accessions_added == 3
+
+            self.load = Load(self.gateway)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+            assert self.gateway.session.query(accession_locations_table).count() == 3
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_skips_unchanged_file(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(['tests/fixtures/load/colors_inventory-aws-archiver.csv'])
+            assert load_result.rows_processed == 3
+            assert load_result.files_skipped == 0
+            assert self.gateway.get_load_fingerprints() != {}
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(['tests/fixtures/load/colors_inventory-aws-archiver.csv'])
+            assert load_result.rows_processed == 0
+            assert load_result.files_skipped == 1
+            assert load_result.batches_skipped == 1
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_loads_only_changed_batches(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            with open('tests/fixtures/load/colors_inventory-aws-archiver.csv') as f:
+                header, *rows = f.read().splitlines()
+            other_batch_rows = [row.replace('TEST_BATCH', 'OTHER_BATCH') for row in rows]
+            inventory = tmpdir.join('inventory.csv')
+            inventory.write('\n'.join([header] + rows + other_batch_rows) + '\n')
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files([str(inventory)])
+            assert load_result.rows_processed == 6
+            assert load_result.batches_added == 2
+
+            # Change one row of "OTHER_BATCH"
+            other_batch_rows[0] = other_batch_rows[0].replace('sample_blue', 'sample_cyan')
+            inventory.write('\n'.join([header] + rows + other_batch_rows) + '\n')
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files([str(inventory)])
+            assert load_result.rows_processed == 3
+            assert load_result.files_skipped == 0
+            assert load_result.batches_skipped == 1
+            assert load_result.accessions_added == 1
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_batch_split_over_files(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            with open('tests/fixtures/load/colors_inventory-aws-archiver.csv') as f:
+                header, *rows = f.read().splitlines()
+            first = tmpdir.join('first.csv')
+            first.write('\n'.join([header] + rows[:2]) + '\n')
+            second = tmpdir.join('second.csv')
+            second.write('\n'.join([header] + rows[2:]) + '\n')
+            files = [str(first), str(second)]
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(files)
+            assert load_result.rows_processed == 3
+
+            # Each file has its own fingerprint for the batch
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(files)
+            assert load_result.rows_processed == 0
+            assert load_result.files_skipped == 2
+
+            second.write('\n'.join([header] + [rows[2].replace('sample_green', 'sample_lime')]) + '\n')
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(files)
+            assert load_result.rows_processed == 1
+            assert load_result.files_skipped == 1
+            assert load_result.accessions_added == 1
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_reads_file_once(self, db_gateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            opened = []
+            open_inventory = Load.open_inventory
+
+            def counting_open_inventory(file):
+                opened.append(file)
+                return open_inventory(file)
+
+            monkeypatch.setattr(Load, 'open_inventory', counting_open_inventory)
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(['tests/fixtures/load/colors_inventory-aws-archiver.csv'])
+            assert load_result.rows_processed == 3
+            assert opened == ['tests/fixtures/load/colors_inventory-aws-archiver.csv']
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_does_not_skip_file_with_errors(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(['tests/fixtures/load/invalid_inventory.csv'])
+            assert len(load_result.errors) == 1
+            assert self.gateway.get_load_fingerprints() == {}
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(['tests/fixtures/load/invalid_inventory.csv'])
+            assert load_result.files_skipped == 0
+            assert len(load_result.errors) == 1
+        finally:
+            tearDown(self)
+
+    def test_load__skip_unchanged_in_parallel(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            files = [
+                'tests/fixtures/load/colors_inventory-aws-archiver.csv',
+                'tests/fixtures/load/multiple_accessions_one_location.csv'
+            ]
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(files, jobs=2)
+            assert load_result.rows_processed == 5
+
+            self.load = Load(self.gateway, skip_unchanged=True)
+            load_result = self.load.process_files(files, jobs=2)
+            assert load_result.rows_processed == 0
+            assert load_result.files_skipped == 2
+        finally:
+            tearDown(self)
+
+    def test_parse_file__parser_failure_returns_no_fingerprints(self, tmpdir, monkeypatch):
+        with open('tests/fixtures/load/colors_inventory-aws-archiver.csv') as f:
+            header, *rows = f.read().splitlines()
+        other_batch_rows = [row.replace('TEST_BATCH', 'OTHER_BATCH') for row in rows]
+        inventory = tmpdir.join('inventory.csv')
+        inventory.write('\n'.join([header] + rows + other_batch_rows) + '\n')
+
+        valid_records = Load.valid_records
+        segments = []
+
+        def failing_valid_records(load, segment_rows, first_line=2):
+            # Fail on the second batch, after the first has been fingerprinted
+            segments.append(first_line)
+            if len(segments) > 1:
+                raise RuntimeError('Simulated failure')
+            return valid_records(load, segment_rows, first_line)
+
+        monkeypatch.setattr(Load, 'valid_records', failing_valid_records)
+        queue: 'Queue[Any]' = Queue()
+        with pytest.raises(RuntimeError):
+            parse_file(str(inventory), queue, chunk_size=1, stored_fingerprints={})
+
+        items = []
+        while not queue.empty():
+            items.append(queue.get())
+        file, patsy_records, parse_result = items[-1]
+        assert patsy_records is None
+        assert parse_result.fingerprints == {}
+
+    def test_load__gzip_compressed_file(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            inventory = tmpdir.join('inventory.csv.gz')
+            with open('tests/fixtures/load/colors_inventory-aws-archiver.csv', 'rb') as f:
+                inventory.write_binary(gzip.compress(f.read()))
+
+            load_result = self.load.process_files([str(inventory)])
+            assert load_result.rows_processed == 3
+            assert load_result.accessions_added == 3
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 0
+        finally:
+            tearDown(self)
+
+    def test_load__stdin(self, db_gateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            with open('tests/fixtures/load/colors_inventory-aws-archiver.csv') as stdin:
+                monkeypatch.setattr(sys, 'stdin', stdin)
+                self.load = Load(self.gateway, skip_unchanged=True)
+                load_result = self.load.process_files(['-'], jobs=2)
+            assert load_result.rows_processed == 3
+            assert load_result.accessions_added == 3
+            assert len(load_result.errors) == 0
+        finally:
+            tearDown(self)
+
     def test_load__with_empty_csv_field_returns_error(self, db_gateway):
         try:
             setUp(self, db_gateway)
@@ -220,6 +682,200 @@ class TestLoad():
             tearDown(self)
 
 
+class TestBulkLoad():
+    def test_load__file_with_invalid_rows(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/invalid_inventory.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 2
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 2
+            assert len(load_result.errors) == 1
+        finally:
+            tearDown(self)
+
+    def test_load__file_with_valid_rows_in_multiple_chunks(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, bulk=True, chunk_size=2)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 3
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 0
+
+            session = self.gateway.session
+            assert session.query(Accession).count() == 3
+            assert session.query(Location).count() == 3
+            assert session.query(accession_locations_table).count() == 3
+        finally:
+            tearDown(self)
+
+    def test_load__file_with_multiple_accessions_one_location(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/multiple_accessions_one_location.csv')
+            assert load_result.rows_processed == 2
+            assert load_result.batches_added == 2
+            assert load_result.accessions_added == 2
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 1
+            assert len(load_result.errors) == 0
+            assert self.gateway.session.query(accession_locations_table).count() == 2
+        finally:
+            tearDown(self)
+
+    def test_load__file_loaded_twice(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+
+            # First load uses the row-by-row mode
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 3
+
+            # Second load - nothing should be added
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 0
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 0
+            assert load_result.locations_added == 0
+            assert len(load_result.errors) == 0
+            assert self.gateway.session.query(accession_locations_table).count() == 3
+        finally:
+            tearDown(self)
+
+    def test_load__reload_with_prefetch(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 3
+
+            self.gateway.configure_lookup_caches(cache_size=100, prefetch=True)
+            self.load = Load(self.gateway, bulk=True)
+            with count_statements(self.gateway) as statements:
+                load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 0
+            assert load_result.locations_added == 0
+            assert len(statements) == 5
+            assert self.gateway.session.query(accession_locations_table).count() == 3
+        finally:
+            tearDown(self)
+
+    def test_load__file_from_preserve_tool_then_archiver_update(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-preserve.csv')
+            assert load_result.accessions_added == 3
+            assert load_result.storage_providers_added == 0
+            assert load_result.locations_added == 0
+
+            # Only locations should be added
+            self.load = Load(self.gateway, bulk=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 0
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 0
+        finally:
+            tearDown(self)
+
+
+class TestCopyLoad():
+    def test_load__copy_requires_postgresql(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            if self.gateway.dialect_name() == 'postgresql':
+                pytest.skip('Only applicable to non-PostgreSQL databases')
+
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 0
+            assert load_result.accessions_added == 0
+            assert len(load_result.errors) == 1
+        finally:
+            tearDown(self)
+
+    def test_load__file_with_invalid_rows(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            if self.gateway.dialect_name() != 'postgresql':
+                pytest.skip('Requires PostgreSQL')
+
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/invalid_inventory.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 2
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 2
+            assert len(load_result.errors) == 1
+        finally:
+            tearDown(self)
+
+    def test_load__file_with_multiple_accessions_one_location(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            if self.gateway.dialect_name() != 'postgresql':
+                pytest.skip('Requires PostgreSQL')
+
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/multiple_accessions_one_location.csv')
+            assert load_result.rows_processed == 2
+            assert load_result.batches_added == 2
+            assert load_result.accessions_added == 2
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 1
+            assert self.gateway.session.query(accession_locations_table).count() == 2
+        finally:
+            tearDown(self)
+
+    def test_load__file_from_preserve_tool_then_archiver_update_then_reload(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            if self.gateway.dialect_name() != 'postgresql':
+                pytest.skip('Requires PostgreSQL')
+
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-preserve.csv')
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 3
+            assert load_result.storage_providers_added == 0
+            assert load_result.locations_added == 0
+
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.batches_added == 0
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+
+            # Reloading should not add anything
+            self.load = Load(self.gateway, copy=True)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 0
+            assert load_result.accessions_added == 0
+            assert load_result.storage_providers_added == 0
+            assert load_result.locations_added == 0
+            assert self.gateway.session.query(accession_locations_table).count() == 3
+            assert self.gateway.session.query(Accession).filter(Accession.extension == 'JPG').count() == 3
+        finally:
+            tearDown(self)
+
+
 def remove_key(dict: Dict[str, str], key: str) -> Dict[str, str]:
     new_dict = dict.copy()
     new_dict.pop(key)
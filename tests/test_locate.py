@@ -0,0 +1,89 @@
+import csv
+import io
+import pytest
+
+from argparse import Namespace
+from patsy.commands.locate import Command
+from patsy.core.load import Load
+from tests import clear_database
+
+BLUE_MD5 = '85a929103d2f58ddfa8c8768eb6339ad'
+RED_SHA1 = 'faa08c0d35d34688312ca82333fb1bf8fb1e48d4'
+
+
+def setUp(obj, gateway):
+    obj.gateway = gateway
+    # Arguments passed to locate.Command
+    obj.locate_command = Command()
+    obj.command_args = Namespace()
+    obj.command_args.md5 = []
+    obj.command_args.sha1 = []
+    obj.command_args.sha256 = []
+    obj.command_args.checksums_file = None
+    obj.command_args.output_file = io.StringIO()
+
+    obj.load = Load(obj.gateway)
+    obj.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+
+
+def tearDown(obj):
+    clear_database(obj)
+
+
+def output_rows(obj):
+    return list(csv.DictReader(io.StringIO(obj.command_args.output_file.getvalue())))
+
+
+class TestLocateCommand:
+    def test_md5_arg(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            self.command_args.md5 = [BLUE_MD5]
+            self.locate_command(self.command_args, self.gateway)
+            assert output_rows(self) == [{
+                'checksum_type': 'md5',
+                'checksum': BLUE_MD5,
+                'batch': 'TEST_BATCH',
+                'relpath': 'colors/sample_blue.jpg',
+                'storage_provider': 'AWS',
+                'storage_location': 'test_bucket/TEST_BATCH/colors/sample_blue.jpg'
+            }]
+        finally:
+            tearDown(self)
+
+    def test_checksums_file_arg(self, caplog, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            checksums_file = tmpdir.join('checksums.csv')
+            checksums_file.write(f'md5,sha1\n{BLUE_MD5},\nnot_a_checksum,{RED_SHA1}\n')
+
+            with open(checksums_file) as f:
+                self.command_args.checksums_file = f
+                self.locate_command(self.command_args, self.gateway)
+
+            assert [(row['checksum_type'], row['relpath']) for row in output_rows(self)] == [
+                ('md5', 'colors/sample_blue.jpg'),
+                ('sha1', 'colors/sample_red.jpg')
+            ]
+            assert 'No accession record found with MD5 checksum "not_a_checksum"' in caplog.text
+        finally:
+            tearDown(self)
+
+
+class TestGetRecordsByChecksums:
+    def test_returns_records_for_each_checksum(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            records = self.gateway.get_records_by_checksums('md5', [BLUE_MD5, 'not_a_checksum'])
+            assert list(records.keys()) == [BLUE_MD5]
+            assert [r.storage_location for r in records[BLUE_MD5]] == ['test_bucket/TEST_BATCH/colors/sample_blue.jpg']
+        finally:
+            tearDown(self)
+
+    def test_unknown_checksum_type_raises_error(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            with pytest.raises(ValueError):
+                self.gateway.get_records_by_checksums('relpath', ['colors/sample_blue.jpg'])
+        finally:
+            tearDown(self)
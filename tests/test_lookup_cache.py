@@ -0,0 +1,45 @@
+from patsy.core.lookup_cache import LookupCache
+
+
+class TestLookupCache:
+    def test_get__missing_key_returns_none_and_counts_miss(self):
+        cache = LookupCache(10)
+        assert cache.get('missing') is None
+        assert cache.hits == 0
+        assert cache.misses == 1
+
+    def test_get__existing_key_returns_value_and_counts_hit(self):
+        cache = LookupCache(10)
+        cache.put('key', 1)
+        assert cache.get('key') == 1
+        assert cache.hits == 1
+        assert cache.misses == 0
+
+    def test_put__discards_least_recently_used_entry_when_full(self):
+        cache = LookupCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+
+        # Using "a" makes "b" the least recently used entry
+        assert cache.get('a') == 1
+        cache.put('c', 3)
+
+        assert len(cache) == 2
+        assert cache.evictions == 1
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_put__zero_size_cache_holds_nothing(self):
+        cache = LookupCache(0)
+        cache.put('a', 1)
+        assert len(cache) == 0
+        assert cache.get('a') is None
+
+    def test_clear__removes_entries_and_keeps_counts(self):
+        cache = LookupCache(10)
+        cache.put('a', 1)
+        cache.get('a')
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.hits == 1
@@ -0,0 +1,115 @@
+import csv
+import pytest
+
+from argparse import Namespace
+from patsy.commands.export import Command as ExportCommand
+from patsy.core.export import Export
+from patsy.core.load import Load
+from patsy.core.parquet import ParquetDictReader, ParquetDictWriter
+from tests import clear_database
+
+pyarrow = pytest.importorskip('pyarrow')
+pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+
+
+def setUp(obj, gateway):
+    obj.gateway = gateway
+    obj.args = Namespace()
+    obj.load = Load(obj.gateway)
+
+
+def tearDown(obj):
+    clear_database(obj)
+
+
+class TestParquetFiles:
+    def test_write_and_read_rows(self, tmpdir):
+        parquet_file = str(tmpdir.join('inventory.parquet'))
+        rows = [
+            {'BATCH': 'TEST_BATCH', 'RELPATH': f'file{i}.txt', 'BYTES': str(i), 'STORAGEPROVIDER': ''}
+            for i in range(5)
+        ]
+        with ParquetDictWriter(parquet_file, Load.ALL_CSV_FIELDS, chunk_size=2) as writer:
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+        metadata = pyarrow_parquet.ParquetFile(parquet_file).metadata
+        assert metadata.num_rows == 5
+        assert metadata.num_row_groups == 3
+
+        schema = pyarrow_parquet.read_schema(parquet_file)
+        assert schema.field('BYTES').type == pyarrow.int64()
+        assert pyarrow.types.is_dictionary(schema.field('BATCH').type)
+        assert pyarrow.types.is_dictionary(schema.field('STORAGEPROVIDER').type)
+        assert schema.field('RELPATH').type == pyarrow.string()
+
+        with ParquetDictReader(parquet_file, chunk_size=2) as reader:
+            assert reader.fieldnames == Load.ALL_CSV_FIELDS
+            read_rows = list(reader)
+        assert len(read_rows) == 5
+        assert read_rows[3]['BATCH'] == 'TEST_BATCH'
+        assert read_rows[3]['RELPATH'] == 'file3.txt'
+        assert read_rows[3]['BYTES'] == '3'
+        assert read_rows[3]['STORAGEPROVIDER'] == ''
+        assert read_rows[3]['MD5'] == ''
+
+    def test_write_invalid_int_value(self, tmpdir):
+        parquet_file = str(tmpdir.join('inventory.parquet'))
+        with pytest.raises(ValueError, match="Invalid BYTES value: 'twelve'"):
+            with ParquetDictWriter(parquet_file, Load.ALL_CSV_FIELDS) as writer:
+                writer.writerow({'BATCH': 'TEST_BATCH', 'RELPATH': 'file.txt', 'BYTES': 'twelve'})
+
+
+class TestParquetExportAndLoad:
+    def test_export_parquet_then_load(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            load_result = self.load.process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+            assert load_result.accessions_added == 3
+            self.gateway.session.commit()
+
+            csv_file = str(tmpdir.join('export.csv'))
+            Export(self.gateway).export(None, csv_file)
+
+            parquet_file = str(tmpdir.join('export.parquet'))
+            self.args.batch = None
+            self.args.output = parquet_file
+            self.args.output_format = 'parquet'
+            ExportCommand.__call__(self, self.args, self.gateway)
+
+            # Same rows as the CSV export
+            with open(csv_file) as f:
+                csv_rows = list(csv.DictReader(f))
+            with ParquetDictReader(parquet_file) as reader:
+                assert list(reader) == csv_rows
+
+            # Loading the Parquet file adds nothing new
+            self.load = Load(self.gateway)
+            load_result = self.load.process_file(parquet_file)
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 0
+            assert load_result.accessions_added == 0
+            assert load_result.locations_added == 0
+            assert len(load_result.errors) == 0
+        finally:
+            tearDown(self)
+
+    def test_load_parquet_into_empty_database(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            parquet_file = str(tmpdir.join('inventory.parquet'))
+            with open('tests/fixtures/load/colors_inventory-aws-archiver.csv') as f, \
+                    ParquetDictWriter(parquet_file, Load.ALL_CSV_FIELDS) as writer:
+                for row in csv.DictReader(f):
+                    writer.writerow(row)
+
+            load_result = self.load.process_file(parquet_file)
+            assert load_result.rows_processed == 3
+            assert load_result.batches_added == 1
+            assert load_result.accessions_added == 3
+            assert load_result.storage_providers_added == 1
+            assert load_result.locations_added == 3
+            assert len(load_result.errors) == 0
+        finally:
+            tearDown(self)
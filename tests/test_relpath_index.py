@@ -0,0 +1,36 @@
+from collections import namedtuple
+from patsy.core.relpath_index import RelpathIndex
+
+Item = namedtuple('Item', ['id', 'relpath'])
+
+
+class TestRelpathIndex:
+    def test_get__returns_item_with_relpath(self):
+        index = RelpathIndex([Item(1, 'a/b.txt'), Item(2, 'b.txt')])
+        assert index.get('a/b.txt') == Item(1, 'a/b.txt')
+        assert index.get('c.txt') is None
+        assert len(index) == 2
+
+    def test_match__returns_longest_matching_suffix(self):
+        index = RelpathIndex([Item(1, 'b.txt'), Item(2, 'a/b.txt')])
+        assert index.match('x/y/a/b.txt') == Item(2, 'a/b.txt')
+        assert index.match('x/y/c/b.txt') == Item(1, 'b.txt')
+        assert index.match('x/y/c.txt') is None
+
+    def test_match__skips_min_prefix_parts(self):
+        index = RelpathIndex([Item(1, 'data/b.txt'), Item(2, 'b.txt')])
+        assert index.match('data/b.txt') == Item(1, 'data/b.txt')
+        assert index.match('data/b.txt', min_prefix_parts=1) == Item(2, 'b.txt')
+        assert index.match('b.txt', min_prefix_parts=1) is None
+
+    def test_match__handles_any_prefix_depth(self):
+        index = RelpathIndex([Item(1, 'a/b.txt')])
+        assert index.match('1/2/3/4/5/6/7/8/a/b.txt', min_prefix_parts=3) == Item(1, 'a/b.txt')
+
+    def test_duplicate_relpaths__first_item_is_used(self):
+        index = RelpathIndex([Item(1, 'a.txt'), Item(2, 'a.txt')])
+        assert index.match('x/a.txt') == Item(1, 'a.txt')
+
+    def test_custom_relpath_function(self):
+        index = RelpathIndex([('a.txt', 1)], relpath=lambda item: item[0])
+        assert index.match('x/a.txt') == ('a.txt', 1)
@@ -0,0 +1,36 @@
+import time
+
+from patsy.core.response_cache import CachedResponse, ResponseCache
+
+
+class TestResponseCache:
+    def test_get__missing_response_returns_none(self, tmpdir):
+        cache = ResponseCache(str(tmpdir))
+        assert cache.get('https://example.org/objects', {'page': 1}) is None
+
+    def test_put_and_get(self, tmpdir):
+        cache = ResponseCache(str(tmpdir))
+        response = CachedResponse({'results': [1, 2]}, time.time(), '"abc"', 'Sat, 01 Oct 2022 00:00:00 GMT')
+        cache.put('https://example.org/objects', {'page': 1, 'per_page': 1000}, response)
+
+        # Parameters are normalized, so their order and type do not matter
+        assert cache.get('https://example.org/objects', {'per_page': '1000', 'page': '1'}) == response
+        assert cache.get('https://example.org/objects', {'page': 2, 'per_page': 1000}) is None
+        assert cache.get('https://example.org/files', {'page': 1, 'per_page': 1000}) is None
+
+    def test_get__unreadable_response_returns_none(self, tmpdir):
+        cache = ResponseCache(str(tmpdir))
+        with open(cache.path('https://example.org/objects', None), mode='w') as f:
+            f.write('{"body": ')
+        assert cache.get('https://example.org/objects') is None
+
+    def test_is_fresh(self, tmpdir):
+        cache = ResponseCache(str(tmpdir), ttl=60)
+        assert cache.is_fresh(CachedResponse({}, time.time() - 30))
+        assert not cache.is_fresh(CachedResponse({}, time.time() - 90))
+
+    def test_conditional_headers(self):
+        assert ResponseCache.conditional_headers(CachedResponse({}, 0)) == {}
+        assert ResponseCache.conditional_headers(CachedResponse({}, 0, '"abc"', 'yesterday')) == {
+            'If-None-Match': '"abc"', 'If-Modified-Since': 'yesterday'
+        }
@@ -0,0 +1,84 @@
+import pytest
+
+from argparse import Namespace
+from patsy.commands.checksum import Command as ChecksumCommand
+from patsy.commands.snapshot import Command as SnapshotCommand
+from patsy.core.db_gateway import DbGateway
+from patsy.core.load import Load
+from patsy.core.snapshot import Checksums, ChecksumSnapshot, InvalidSnapshotError
+from tests import clear_database
+
+BLUE_LOCATION = 'test_bucket/TEST_BATCH/colors/sample_blue.jpg'
+RED_LOCATION = 'test_bucket/TEST_BATCH/colors/sample_red.jpg'
+
+
+def setUp(obj, gateway, tmpdir):
+    obj.gateway = gateway
+    Load(obj.gateway).process_file('tests/fixtures/load/colors_inventory-aws-archiver.csv')
+    obj.gateway.session.commit()
+
+    obj.snapshot_file = str(tmpdir.join('checksums.snapshot'))
+    SnapshotCommand()(Namespace(snapshot_command='build', output=obj.snapshot_file), obj.gateway)
+
+
+def tearDown(obj):
+    clear_database(obj)
+
+
+class TestSnapshot:
+    def test_build_and_get_checksums(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            with ChecksumSnapshot(self.snapshot_file) as snapshot:
+                assert snapshot.info['locations'] == '3'
+                checksums = snapshot.get_checksums([BLUE_LOCATION, 'not_a_location'])
+                assert checksums == {
+                    BLUE_LOCATION: Checksums(
+                        '85a929103d2f58ddfa8c8768eb6339ad',
+                        '2fa953a48600e1aef0486b4b3a17c6100cfeef80',
+                        'e80dd1c34dbdc98521138eacc0e921683d8c9970a1f7cfe75bbfff56d5638238'
+                    )
+                }
+        finally:
+            tearDown(self)
+
+    def test_build_replaces_existing_snapshot(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            assert ChecksumSnapshot.build(self.snapshot_file, [('location', 'md5', 'sha1', 'sha256')]) == 1
+            with ChecksumSnapshot(self.snapshot_file) as snapshot:
+                assert snapshot.get_checksums([BLUE_LOCATION, 'location']) == {
+                    'location': Checksums('md5', 'sha1', 'sha256')
+                }
+            assert not tmpdir.join('checksums.snapshot.tmp').exists()
+        finally:
+            tearDown(self)
+
+    def test_invalid_snapshot_file_raises_error(self, tmpdir):
+        not_a_snapshot = tmpdir.join('not_a_snapshot')
+        not_a_snapshot.write('not a snapshot')
+        with pytest.raises(InvalidSnapshotError):
+            ChecksumSnapshot(str(not_a_snapshot))
+        with pytest.raises(InvalidSnapshotError):
+            ChecksumSnapshot(str(tmpdir.join('missing')))
+
+
+class TestChecksumCommandSnapshot:
+    def test_snapshot_arg_does_not_use_database(self, capsys, caplog, db_gateway, tmpdir, monkeypatch):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            monkeypatch.delenv('PATSY_DATABASE', raising=False)
+            args = Namespace(
+                location=[RED_LOCATION, 'not_a_location'], output_type='sha1', output_file=None,
+                snapshot=self.snapshot_file
+            )
+
+            # A gateway without a database, which raises an error if used
+            offline_gateway = DbGateway(Namespace(database=None))
+            ChecksumCommand()(args, offline_gateway)
+            offline_gateway.close()
+
+            assert capsys.readouterr().out == f'faa08c0d35d34688312ca82333fb1bf8fb1e48d4  {RED_LOCATION}\n'
+            assert 'No accession record found for "not_a_location"' in caplog.text
+        finally:
+            tearDown(self)
@@ -1,8 +1,17 @@
 import os
+import hashlib
 import json
+import threading
+import time
 import httpretty
 
-from patsy.core.sync import Sync
+from contextlib import contextmanager
+from sqlalchemy import event
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from datetime import datetime
+from patsy.core.response_cache import ResponseCache
+from patsy.core.sync import Sync, parse_timestamp
 from patsy.core.load import Load
 from patsy.model import Accession, StorageProvider
 from tests import clear_database
@@ -37,6 +46,89 @@ def tearDown(obj):
     clear_database(obj)
 
 
+class MockAPTrustHandler(BaseHTTPRequestHandler):
+    """
+    Serves the bags in "bags.json", and the files of archive0149, two files
+    per page, recording the client address of each request, and the largest
+    number of file requests handled at once. Responses have an "ETag", and
+    conditional requests for unchanged responses get a 304 status code.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.client_addresses.add(self.client_address)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == Sync.OBJECT_REQUEST:
+            self.server.object_queries.append(query)
+            with open('tests/fixtures/sync/bags.json') as f:
+                body = json.load(f)
+        elif self.server.fail_files:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        else:
+            with self.server.lock:
+                self.server.active_requests += 1
+                self.server.max_active_requests = max(self.server.max_active_requests, self.server.active_requests)
+            time.sleep(self.server.file_delay)
+            with self.server.lock:
+                self.server.active_requests -= 1
+            with open('tests/fixtures/sync/archive0149.json') as f:
+                files = json.load(f) if query['intellectual_object_id'] == ['246810'] else []
+            page = int(query.get('page', ['1'])[0])
+            next_page = f"{url.path}?intellectual_object_id={query['intellectual_object_id'][0]}&page={page + 1}"
+            body = {
+                'count': len(files),
+                'next': next_page if page * 2 < len(files) else '',
+                'previous': '',
+                'results': files[(page - 1) * 2:page * 2]
+            }
+
+        data = json.dumps(body).encode('utf-8')
+        etag = f'"{hashlib.sha256(data).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def mock_aptrust_server(file_delay=0.0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockAPTrustHandler)
+    server.client_addresses = set()
+    server.file_delay = file_delay
+    server.fail_files = False
+    server.object_queries = []
+    server.not_modified = 0
+    server.lock = threading.Lock()
+    server.active_requests = 0
+    server.max_active_requests = 0
+    # Ignore the errors from responding to requests that timed out
+    server.handle_error = lambda request, client_address: None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 class TestSync:
     def test_parse_name(self, db_gateway):
         try:
@@ -71,6 +163,23 @@ class TestSync:
         finally:
             tearDown(self)
 
+    def test_check_path__deeper_prefix(self, db_gateway):
+        try:
+            setUp(self, db_gateway, load=True)
+            accessions = self.gateway.session.query(Accession) \
+                             .filter(Accession.batch_id == 1) \
+                             .all()
+            relpath = accessions[0].relpath
+
+            for prefix in ['umd.edu/archive0149/data', 'umd.edu/archive0149/data/a/b/c/d/e']:
+                assert self.sync.check_path(f'{prefix}/{relpath}', accessions).relpath == relpath
+
+            # The institution, bag name and "data" directory are never part
+            # of the relpath
+            assert self.sync.check_path(f'umd.edu/{relpath}', accessions) is None
+        finally:
+            tearDown(self)
+
     # The baglist.json file has 30 bags
     # Only 1 should be in the database
     def test_batches(self, db_gateway):
@@ -88,6 +197,52 @@ class TestSync:
         finally:
             tearDown(self)
 
+    def test_batches__object_mapping(self, db_gateway):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            with mock_aptrust_server() as server:
+                host, port = server.server_address
+                base_url = f'http://{host}:{port}'
+                Sync(self.gateway, self.sync.headers, base_url=base_url).process()
+                self.gateway.session.commit()
+
+                # The object matched by name is recorded
+                assert self.gateway.get_aptrust_object_batch_ids() == {246810: 1}
+
+                statements = []
+                engine = self.gateway.session.get_bind()
+
+                def count_statement(conn, cursor, statement, parameters, context, executemany):
+                    statements.append(statement)
+
+                sync = Sync(self.gateway, self.sync.headers, base_url=base_url)
+                sync.parse_name = lambda name: 'not parsed'
+                event.listen(engine, 'before_cursor_execute', count_statement)
+                try:
+                    bags = sync.get_request(Sync.OBJECT_REQUEST)
+                    matched = list(sync.matched_bags(bags))
+                finally:
+                    event.remove(engine, 'before_cursor_execute', count_statement)
+
+                # The batches and objects are loaded with one query each, and
+                # the recorded object is matched without parsing its name
+                assert len(statements) == 2
+                assert [(bag['bag_name'], batch_id, batch_name) for bag, batch_id, batch_name in matched] == \
+                    [('archive0149', 1, 'Archive149')]
+                sync.http_session.close()
+        finally:
+            tearDown(self)
+
+    def test_batches__candidates_for_unmatched_bags(self, db_gateway):
+        try:
+            setUp(self, db_gateway, load=True)
+            bags = [{'id': 1, 'bag_name': 'archiv0149'}, {'id': 2, 'bag_name': 'archive0148'}]
+            assert list(self.sync.matched_bags(bags)) == []
+            assert self.sync.sync_results.skipped_batches == ['archiv0149', 'archive0148']
+            assert self.sync.sync_results.batch_candidates == {'archiv0149': ['Archive149']}
+        finally:
+            tearDown(self)
+
     def test_check_locations_archive149(self, db_gateway):
         try:
             setUp(self, db_gateway, load=True)
@@ -165,6 +320,55 @@ class TestSync:
         finally:
             tearDown(self)
 
+    def test_add_locations__bulk_statements(self, db_gateway):
+        try:
+            setUp(self, db_gateway, load=True)
+
+            with open('tests/fixtures/sync/archive0149.json') as f:
+                files = json.load(f)
+
+            accessions = self.gateway.session.query(Accession) \
+                             .filter(Accession.batch_id == 1) \
+                             .all()
+            identifiers = [f.get('identifier') for f in files]
+
+            statements = []
+            engine = self.gateway.session.get_bind()
+
+            def count_statement(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine, 'before_cursor_execute', count_statement)
+            try:
+                self.sync.check_or_add_files('Archive149', identifiers, accessions, True, batch_id=1)
+                self.gateway.session.commit()
+                added_statements = len(statements)
+
+                accessions = self.gateway.session.query(Accession) \
+                                 .filter(Accession.batch_id == 1) \
+                                 .all()
+                statements.clear()
+                self.sync.check_or_add_files('Archive149', identifiers, accessions, True, batch_id=1)
+                synced_statements = len(statements)
+            finally:
+                event.remove(engine, 'before_cursor_execute', count_statement)
+
+            # Storage provider, batch locations, existing locations, location
+            # insert, location ids and link insert
+            assert added_statements == 6
+            # The locations of the batch (including those added) are kept
+            # for the following calls, so syncing again needs no queries
+            assert synced_statements == 0
+            assert self.sync.sync_results.locations_added == 12
+            assert self.sync.sync_results.duplicate_files == 12
+
+            for identifier in identifiers:
+                accession = self.gateway.get_accession_by_location(identifier)
+                assert accession is not None
+                assert identifier.endswith(accession.relpath)
+        finally:
+            tearDown(self)
+
     # Using a modified CSV file which uses the same path but with the
     # Storage provider changed to AWS
     def test_add_second_locations_archive149(self, db_gateway):
@@ -333,3 +537,151 @@ class TestSync:
 
         finally:
             tearDown(self)
+
+    def test_aptrust_mock_server_with_workers(self, db_gateway):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            with mock_aptrust_server() as server:
+                host, port = server.server_address
+                sync = Sync(self.gateway, self.sync.headers, workers=4, base_url=f'http://{host}:{port}')
+                sync_result = sync.process()
+
+                assert sync_result.batches_processed == 30
+                assert sync_result.batches_skipped == 29
+                assert len(sync_result.files_not_found) == 0
+                assert sync_result.files_processed == 12
+                assert sync_result.locations_added == 12
+
+                # The requests reuse the keep-alive connections of the bag and
+                # page threads
+                assert len(server.client_addresses) <= 8
+                sync.http_session.close()
+        finally:
+            tearDown(self)
+
+    def test_iter_pages__fetches_pages_concurrently_in_order(self, db_gateway):
+        try:
+            setUp(self, db_gateway)
+            with open('tests/fixtures/sync/archive0149.json') as f:
+                identifiers = [f.get('identifier') for f in json.load(f)]
+
+            with mock_aptrust_server(file_delay=0.1) as server:
+                host, port = server.server_address
+                sync = Sync(self.gateway, self.sync.headers, workers=3, base_url=f'http://{host}:{port}')
+                pages = list(sync.iter_pages(Sync.FILE_REQUEST, {'intellectual_object_id': 246810}))
+
+                assert [len(page) for page in pages] == [2, 2, 2, 2, 2, 2]
+                assert [f.get('identifier') for page in pages for f in page] == identifiers
+                assert server.max_active_requests > 1
+                sync.http_session.close()
+        finally:
+            tearDown(self)
+
+    def test_aptrust_incremental(self, db_gateway):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            with mock_aptrust_server() as server:
+                host, port = server.server_address
+                base_url = f'http://{host}:{port}'
+
+                sync_result = Sync(self.gateway, self.sync.headers, base_url=base_url).process(incremental=True)
+                assert sync_result.batches_processed == 30
+                assert sync_result.locations_added == 12
+                assert 'updated_at__gteq' not in server.object_queries[0]
+
+                # The state is the last bag, by update time
+                sync_state = self.gateway.get_sync_state(Sync.SYNC_STATE_PROVIDER)
+                assert sync_state.last_updated_at == datetime(2022, 12, 4, 18, 24, 48, 942410)
+                assert sync_state.cursor == '249278'
+
+                # Only the bags updated since the last bag are requested, and
+                # the last bag has already been synced
+                sync_result = Sync(self.gateway, self.sync.headers, base_url=base_url).process(incremental=True)
+                assert server.object_queries[1]['updated_at__gteq'] == ['2022-12-04T18:24:48.942410Z']
+                assert sync_result.batches_processed == 0
+                assert sync_result.files_processed == 0
+        finally:
+            tearDown(self)
+
+    def test_aptrust_incremental__resumes_after_failed_bag(self, db_gateway):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            with mock_aptrust_server() as server:
+                host, port = server.server_address
+                base_url = f'http://{host}:{port}'
+
+                server.fail_files = True
+                sync_result = Sync(self.gateway, self.sync.headers, base_url=base_url).process(incremental=True)
+                assert 'archive0149' in sync_result.skipped_batches
+
+                # The state is the bag before archive0149
+                sync_state = self.gateway.get_sync_state(Sync.SYNC_STATE_PROVIDER)
+                assert sync_state.cursor == '246809'
+
+                server.fail_files = False
+                sync_result = Sync(self.gateway, self.sync.headers, base_url=base_url).process(incremental=True)
+                assert 'archive0149' not in sync_result.skipped_batches
+                assert sync_result.locations_added == 12
+                assert self.gateway.get_sync_state(Sync.SYNC_STATE_PROVIDER).cursor == '249278'
+        finally:
+            tearDown(self)
+
+    def test_parse_timestamp(self):
+        assert parse_timestamp('2022-12-04T18:24:48.94241Z') == datetime(2022, 12, 4, 18, 24, 48, 942410)
+        assert parse_timestamp('2022-12-04T18:24:48Z') == datetime(2022, 12, 4, 18, 24, 48)
+        assert parse_timestamp('2022-12-04T18:24:48.1234567+01:30') == datetime(2022, 12, 4, 16, 54, 48, 123456)
+        assert parse_timestamp('2022-12-04') is None
+        assert parse_timestamp(None) is None
+
+    def test_aptrust_response_cache(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            cache_dir = str(tmpdir.join('cache'))
+            with mock_aptrust_server() as server:
+                host, port = server.server_address
+                base_url = f'http://{host}:{port}'
+
+                # Fresh responses are used without a request
+                sync = Sync(self.gateway, self.sync.headers, base_url=base_url,
+                            response_cache=ResponseCache(cache_dir, ttl=3600))
+                assert sync.process().locations_added == 12
+                sync = Sync(self.gateway, self.sync.headers, base_url=base_url,
+                            response_cache=ResponseCache(cache_dir, ttl=3600))
+                assert sync.process().duplicate_files == 12
+                assert len(server.object_queries) == 1
+
+                # Stale responses are revalidated
+                sync = Sync(self.gateway, self.sync.headers, base_url=base_url,
+                            response_cache=ResponseCache(cache_dir, ttl=0))
+                assert sync.process().duplicate_files == 12
+                assert len(server.object_queries) == 2
+                assert server.not_modified == 7
+
+            # Offline, the cached responses are used without the server
+            sync = Sync(self.gateway, self.sync.headers, base_url=base_url,
+                        response_cache=ResponseCache(cache_dir, ttl=0), offline=True)
+            sync_result = sync.process()
+            assert sync_result.batches_processed == 30
+            assert sync_result.files_processed == 12
+
+            # Responses that are not cached are skipped
+            sync = Sync(self.gateway, self.sync.headers, base_url=base_url,
+                        response_cache=ResponseCache(cache_dir, ttl=0), offline=True)
+            sync_result = sync.process(created_at__gteq='2022-10-01')
+            assert sync_result.batches_processed == 0
+        finally:
+            tearDown(self)
+
+    def test_aptrust_mock_server_timeout(self, db_gateway):
+        try:
+            setUp(self, db_gateway, csv_file='tests/fixtures/sync/Archive149_Alternate.csv', load=True)
+            with mock_aptrust_server(file_delay=1.0) as server:
+                host, port = server.server_address
+                sync = Sync(self.gateway, self.sync.headers, timeout=0.2, base_url=f'http://{host}:{port}')
+                sync_result = sync.process()
+
+                assert sync_result.files_processed == 0
+                assert 'archive0149' in sync_result.skipped_batches
+                sync.http_session.close()
+        finally:
+            tearDown(self)
@@ -1,10 +1,15 @@
+import bz2
+import sys
+
 from argparse import ArgumentParser, Namespace
+from datetime import datetime
 from deepdiff import DeepDiff
 from importlib import import_module
 from patsy.commands.load import Command as LoadCommand
 from patsy.core.db_gateway import DbGateway
 from patsy.core.patsy_record import PatsyRecord
 from patsy.core.update import Update, UpdateArgs, UpdateResult
+from patsy.model import Accession
 from tests import clear_database
 
 
@@ -32,7 +37,7 @@ def setUp(obj, gateway: DbGateway):
 
     args = Namespace()
     for file in test_db_files:
-        args.file = file
+        args.files = [file]
         LoadCommand.__call__(obj, args, obj.gateway)
 
     gateway.session.commit()
@@ -196,6 +201,62 @@ class TestUpdate():
         finally:
             tearDown(self)
 
+    def test_update__sets_updated_at(self, db_gateway: DbGateway):
+        try:
+            setUp(self, db_gateway)
+            db_gateway.session.execute(Accession.__table__.update().values(updated_at=datetime(2000, 1, 1)))
+            db_gateway.session.commit()
+
+            self.update.update(self.update_args)
+
+            accessions = db_gateway.session.query(Accession).order_by(Accession.relpath).all()
+            updated = [a.relpath for a in accessions if a.updated_at > datetime(2000, 1, 1)]
+            assert updated == ['new_dir/colors/UPDATED_blue.jpg', 'new_dir/colors/UPDATED_red.jpg']
+            assert all(a.created_at <= a.updated_at for a in accessions if a.relpath in updated)
+        finally:
+            tearDown(self)
+
+    def test_update__bz2_compressed_file(self, db_gateway: DbGateway, tmpdir):
+        try:
+            setUp(self, db_gateway)
+            updates = tmpdir.join('relpath_updates.csv.bz2')
+            with open(self.update_args.file, 'rb') as f:
+                updates.write_binary(bz2.compress(f.read()))
+            self.update_args.file = str(updates)
+
+            result = self.update.update(self.update_args)
+            assert not result.has_errors()
+            assert result.csv_rows_processed == 2
+            assert result.db_rows_updated == 2
+        finally:
+            tearDown(self)
+
+    def test_update__stdin(self, db_gateway: DbGateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            with open(self.update_args.file) as stdin:
+                monkeypatch.setattr(sys, 'stdin', stdin)
+                self.update_args.file = '-'
+                result = self.update.update(self.update_args)
+            assert not result.has_errors()
+            assert result.csv_rows_processed == 2
+            assert result.db_rows_updated == 2
+        finally:
+            tearDown(self)
+
+    def test_update__stdin_without_csv_compare_column_returns_error(self, db_gateway: DbGateway, monkeypatch):
+        try:
+            setUp(self, db_gateway)
+            with open(self.update_args.file) as stdin:
+                monkeypatch.setattr(sys, 'stdin', stdin)
+                self.update_args.file = '-'
+                self.update_args.csv_compare_column = 'not_a_column'
+                result = self.update.update(self.update_args)
+            assert result.errors == ["CSV compare column 'not_a_column' not found in '-'."]
+            assert result.csv_rows_processed == 0
+        finally:
+            tearDown(self)
+
     def test_update__makes_no_updates_when_run_a_second_time(self, db_gateway: DbGateway):
         try:
             setUp(self, db_gateway)
@@ -0,0 +1,112 @@
+import csv
+import hashlib
+import os
+import pytest
+
+from argparse import Namespace
+from patsy.commands.verify import Command as VerifyCommand
+from patsy.core.load import Load
+from patsy.core.verify import Verify
+from patsy.model import Accession
+from tests import clear_database
+
+FILES = {
+    'a/matched.txt': b'matched',
+    'a/changed.txt': b'original',
+    'b/resized.txt': b'resized',
+    'b/missing.txt': b'missing',
+    'no_checksums.txt': b'no checksums'
+}
+
+
+def setUp(obj, gateway, tmpdir):
+    obj.gateway = gateway
+    obj.root = tmpdir.mkdir('root')
+    inventory_file = tmpdir.join('inventory.csv')
+
+    with open(inventory_file, mode='w') as f:
+        writer = csv.DictWriter(f, fieldnames=Load.ALL_CSV_FIELDS)
+        writer.writeheader()
+        for relpath, content in FILES.items():
+            obj.root.join(relpath).write_binary(content, ensure=True)
+            writer.writerow({
+                'BATCH': 'TEST_VERIFY',
+                'RELPATH': relpath,
+                'FILENAME': os.path.basename(relpath),
+                'EXTENSION': 'txt',
+                'BYTES': len(content),
+                'MODDATE': '2023-01-01T00:00:00',
+                'MD5': hashlib.md5(content).hexdigest(),
+                'SHA1': hashlib.sha1(content).hexdigest(),
+                'SHA256': hashlib.sha256(content).hexdigest()
+            })
+
+    load_result = Load(obj.gateway).process_file(str(inventory_file))
+    assert len(load_result.errors) == 0
+    obj.gateway.session.query(Accession).filter(Accession.relpath == 'no_checksums.txt').update(
+        {'md5': '', 'sha1': None, 'sha256': None}
+    )
+    obj.gateway.session.commit()
+
+    # Change the files after they were inventoried
+    obj.root.join('a/changed.txt').write_binary(b'modified')
+    obj.root.join('b/resized.txt').write_binary(b'resized!')
+    obj.root.join('b/missing.txt').remove()
+
+    obj.report_file = tmpdir.join('report.csv')
+
+
+def tearDown(obj):
+    clear_database(obj)
+
+
+def report_rows(obj):
+    with open(obj.report_file) as f:
+        return [(row['relpath'], row['status'], row['field']) for row in csv.DictReader(f)]
+
+
+class TestVerify:
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_verify(self, db_gateway, tmpdir, jobs):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            batch = self.gateway.get_batch_by_name('TEST_VERIFY')
+            result = Verify(self.gateway).verify(batch, str(self.root), str(self.report_file), jobs=jobs)
+
+            assert result.files_processed == 5
+            assert result.files_matched == 1
+            assert result.files_mismatched == 2
+            assert result.files_missing == 1
+            assert result.files_skipped == 1
+            assert result.files_with_errors == 0
+            assert result.bytes_read == len(b'matched') + len(b'modified')
+
+            assert report_rows(self) == [
+                ('a/changed.txt', Verify.MISMATCH, 'md5'),
+                ('a/changed.txt', Verify.MISMATCH, 'sha1'),
+                ('a/changed.txt', Verify.MISMATCH, 'sha256'),
+                ('b/missing.txt', Verify.MISSING, ''),
+                ('b/resized.txt', Verify.MISMATCH, 'bytes')
+            ]
+        finally:
+            tearDown(self)
+
+    def test_verify_command_with_rate_limit(self, db_gateway, tmpdir):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            args = Namespace(batch='TEST_VERIFY', root=str(self.root), output=str(self.report_file), jobs=1,
+                             max_rate=100.0)
+            VerifyCommand()(args, self.gateway)
+            assert len(report_rows(self)) == 5
+        finally:
+            tearDown(self)
+
+    def test_verify_command_batch_not_found(self, db_gateway, tmpdir, caplog):
+        try:
+            setUp(self, db_gateway, tmpdir)
+            args = Namespace(batch='NOT_A_BATCH', root=str(self.root), output=str(self.report_file))
+            VerifyCommand()(args, self.gateway)
+            assert 'Batch "NOT_A_BATCH" not found' in caplog.text
+            assert not self.report_file.exists()
+        finally:
+            tearDown(self)